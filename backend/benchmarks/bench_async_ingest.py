@@ -0,0 +1,118 @@
+"""
+Concurrent exporter benchmark: blocking Session vs worker-thread writes in async handlers.
+
+Several simulated exporters post execution batches at the same time against
+an in-process ASGI app on a throwaway SQLite file. The "sync" variant is the
+former handler shape (async def calling the blocking Session directly); the
+"async" variant is the /api/ingest/batch/executions endpoint, which runs the
+bulk writers in a worker thread (asyncio.to_thread). Besides throughput, a
+1 ms heartbeat task measures how long the event loop stalls, and a /health
+probe measures the latency other requests see while the exporters are
+writing.
+
+Usage (from backend/):
+    python -m benchmarks.bench_async_ingest --exporters 16 --batches 20 --batch-size 200
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+_tmp = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'bench.db')}"
+
+import httpx  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+
+from src.api.main import app  # noqa: E402
+from src.api.schemas import ExecutionCreate  # noqa: E402
+from src.core import ingest_log  # noqa: E402
+from src.database.connection import SessionLocal, init_db  # noqa: E402
+
+legacy_app = FastAPI()
+
+
+@legacy_app.post("/api/ingest/batch/executions")
+async def legacy_executions_batch(data: list[ExecutionCreate]):
+    db = SessionLocal()
+    try:
+        result = ingest_log.write_logged(db, "executions", data)
+        db.commit()
+        return {"status": "ok", "count": len(data), "inserted": result["inserted"]}
+    finally:
+        db.close()
+
+
+@legacy_app.get("/health")
+def legacy_health():
+    return {"status": "ok"}
+
+
+def make_batches(variant, exporter, batches, batch_size):
+    start = datetime(2024, 1, 1)
+    run_id = f"bench_{variant}_{exporter}"
+    return [
+        [{"run_id": run_id, "execution_id": f"E{b}_{i}", "order_id": f"O{b}_{i}",
+          "exec_utc": (start + timedelta(seconds=b * batch_size + i)).isoformat(),
+          "price": 1.1, "quantity": 1.0} for i in range(batch_size)]
+        for b in range(batches)
+    ]
+
+
+async def run(variant, target_app, exporters, batches, batch_size):
+    payloads = [make_batches(variant, e, batches, batch_size) for e in range(exporters)]
+    transport = httpx.ASGITransport(app=target_app)
+    stalls, probes = [], []
+    done = asyncio.Event()
+
+    async def heartbeat():
+        while not done.is_set():
+            t = time.perf_counter()
+            await asyncio.sleep(0.001)
+            stalls.append(time.perf_counter() - t - 0.001)
+
+    async def probe(client):
+        while not done.is_set():
+            t = time.perf_counter()
+            await client.get("/health")
+            probes.append(time.perf_counter() - t)
+            await asyncio.sleep(0.005)
+
+    async def exporter(client, batches_for_exporter):
+        for batch in batches_for_exporter:
+            resp = await client.post("/api/ingest/batch/executions", json=batch)
+            resp.raise_for_status()
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        side = [asyncio.create_task(heartbeat()), asyncio.create_task(probe(client))]
+        t0 = time.perf_counter()
+        await asyncio.gather(*(exporter(client, p) for p in payloads))
+        elapsed = time.perf_counter() - t0
+        done.set()
+        await asyncio.gather(*side)
+
+    total = exporters * batches * batch_size
+    probes.sort()
+    p99 = probes[int(len(probes) * 0.99) - 1] if probes else float("nan")
+    print(f"{variant:<6} {elapsed:8.3f}s  {total / elapsed:>10,.0f} exec/s  "
+          f"loop stall max {max(stalls) * 1e3:7.1f} ms  mean {statistics.mean(stalls) * 1e3:5.2f} ms  "
+          f"/health p50 {probes[len(probes) // 2] * 1e3:6.1f} ms  p99 {p99 * 1e3:6.1f} ms  ({len(probes)} probes)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--exporters", type=int, default=16)
+    parser.add_argument("--batches", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=200)
+    args = parser.parse_args()
+
+    init_db()
+    asyncio.run(run("sync", legacy_app, args.exporters, args.batches, args.batch_size))
+    asyncio.run(run("async", app, args.exporters, args.batches, args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Throughput benchmark for the /batch/bars write path.
+
+Compares the legacy per-bar SELECT/flush upsert with the set-based writer
+in src.core.bulk_writer on a throwaway SQLite file.
+
+Usage (from backend/):
+    python -m benchmarks.bench_bar_ingest --bars 10000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from src.api.schemas import BarCreate
+from src.core import bulk_writer
+from src.database.models import Base, MarketSeries, MarketBar, RunSubscription
+
+
+def make_session_factory(path):
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragma(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine, autoflush=False)
+
+
+def make_bars(count, symbol="BENCH"):
+    start = datetime(2020, 1, 1)
+    return [
+        BarCreate(
+            run_id="bench_run", symbol=symbol, timeframe="1m", venue="Bench", provider="Bench",
+            ts_utc=start + timedelta(minutes=i),
+            open=100.0, high=101.0, low=99.0, close=100.5, volume=1.0
+        )
+        for i in range(count)
+    ]
+
+
+def legacy_upsert(db, bars):
+    """Per-bar path as it was before the bulk writer (one SELECT per lookup + flush)."""
+    for data in bars:
+        series_id = bulk_writer.market_series_id(data.symbol, data.timeframe, data.venue, data.provider)
+        if not db.query(MarketSeries).filter(MarketSeries.series_id == series_id).first():
+            db.add(MarketSeries(series_id=series_id, symbol=data.symbol, timeframe=data.timeframe,
+                                venue=data.venue, provider=data.provider))
+            db.flush()
+        if not db.query(RunSubscription).filter(RunSubscription.run_id == data.run_id,
+                                                RunSubscription.series_id == series_id).first():
+            db.add(RunSubscription(run_id=data.run_id, series_id=series_id))
+            db.flush()
+        existing = db.query(MarketBar).filter(MarketBar.series_id == series_id,
+                                              MarketBar.ts_utc == data.ts_utc).first()
+        if existing:
+            existing.close = data.close
+        else:
+            db.add(MarketBar(series_id=series_id, ts_utc=data.ts_utc, open=data.open, high=data.high,
+                             low=data.low, close=data.close, volume=data.volume))
+            db.flush()
+
+
+def run(label, writer, bars):
+    with tempfile.TemporaryDirectory() as tmp:
+        Session = make_session_factory(os.path.join(tmp, "bench.db"))
+        db = Session()
+        t0 = time.perf_counter()
+        writer(db, bars)
+        db.commit()
+        elapsed = time.perf_counter() - t0
+        db.close()
+        Session.kw["bind"].dispose()
+    print(f"{label:<10} {len(bars):>9} bars  {elapsed:8.3f}s  {len(bars) / elapsed:>12,.0f} bars/s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--bars", type=int, default=10000)
+    parser.add_argument("--skip-legacy", action="store_true")
+    args = parser.parse_args()
+
+    bars = make_bars(args.bars)
+    if not args.skip_legacy:
+        run("legacy", legacy_upsert, bars)
+    run("bulk", bulk_writer.upsert_bars, bars)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+JSON vs columnar bar ingest benchmark.
+
+Measures the server-side cost of each wire format: parsing the request body
+(json + pydantic validation for /batch/bars, binary decode + vectorized
+validation for /batch/bars/columnar) followed by the bulk write, on a
+throwaway SQLite file. Payload sizes are reported as well.
+
+Usage (from backend/):
+    python -m benchmarks.bench_columnar_ingest --bars 1000000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from typing import List
+
+import numpy as np
+from pydantic import TypeAdapter
+
+from benchmarks.bench_bar_ingest import make_session_factory
+from src.api.schemas import BarCreate
+from src.core import bulk_writer
+from src.core.columnar_bars import BAR_DTYPE, NUMPY_CONTENT_TYPE, encode_numpy_bars, decode_bars
+
+HEADER = {"run_id": "bench_run", "symbol": "BENCH", "timeframe": "1m", "venue": "Bench", "provider": "Bench"}
+
+
+def make_array(count):
+    bars = np.zeros(count, dtype=BAR_DTYPE)
+    bars["ts"] = (np.datetime64("2020-01-01T00:00", "ns") + np.arange(count) * np.timedelta64(1, "m")).view("int64")
+    bars["open"] = 100.0
+    bars["high"] = 101.0
+    bars["low"] = 99.0
+    bars["close"] = 100.5
+    bars["volume"] = 1.0
+    return bars
+
+
+def make_json_body(array):
+    ts = array["ts"].view("datetime64[ns]").astype("datetime64[us]").astype(str)
+    return json.dumps([
+        {**HEADER, "ts_utc": t, "open": o, "high": h, "low": l, "close": c, "volume": v}
+        for t, o, h, l, c, v in zip(ts.tolist(), *(array[f].tolist() for f in ("open", "high", "low", "close", "volume")))
+    ]).encode("utf-8")
+
+
+def ingest_json(db, body):
+    bars = TypeAdapter(List[BarCreate]).validate_python(json.loads(body))
+    return bulk_writer.upsert_bars(db, bars)
+
+
+def ingest_columnar(db, body):
+    return bulk_writer.upsert_bar_columns(db, [decode_bars(body, NUMPY_CONTENT_TYPE)])
+
+
+def run(label, ingest, body, count):
+    with tempfile.TemporaryDirectory() as tmp:
+        Session = make_session_factory(os.path.join(tmp, "bench.db"))
+        db = Session()
+        t0 = time.perf_counter()
+        ingest(db, body)
+        db.commit()
+        elapsed = time.perf_counter() - t0
+        db.close()
+        Session.kw["bind"].dispose()
+    print(f"{label:<9} {len(body) / 1e6:>8.1f} MB  {elapsed:8.3f}s  {count / elapsed:>12,.0f} bars/s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--bars", type=int, default=1000000)
+    args = parser.parse_args()
+
+    array = make_array(args.bars)
+    json_time = run("json", ingest_json, make_json_body(array), args.bars)
+    columnar_time = run("columnar", ingest_columnar, encode_numpy_bars(HEADER, array), args.bars)
+    print(f"speedup   {json_time / columnar_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Throughput benchmark for the bulk execution upsert engine.
+
+Inserts a replay-sized batch of fills into a throwaway SQLite file and then
+re-sends it, which exercises the bulk UPDATE side of the engine.
+
+Usage (from backend/):
+    python -m benchmarks.bench_execution_ingest --executions 200000
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.bench_bar_ingest import make_session_factory
+from src.api.schemas import ExecutionCreate
+from src.core import bulk_writer
+
+
+def make_executions(count, run_id="bench_run"):
+    start = datetime(2020, 1, 1)
+    return [
+        ExecutionCreate(
+            run_id=run_id, execution_id=f"E{i}", order_id=f"O{i // 2}",
+            exec_utc=start + timedelta(seconds=i), price=100.0 + (i % 10), quantity=1.0
+        )
+        for i in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--executions", type=int, default=200000)
+    args = parser.parse_args()
+
+    executions = make_executions(args.executions)
+    with tempfile.TemporaryDirectory() as tmp:
+        Session = make_session_factory(os.path.join(tmp, "bench.db"))
+        db = Session()
+        for label in ("insert", "update"):
+            t0 = time.perf_counter()
+            result = bulk_writer.upsert_executions(db, executions)
+            db.commit()
+            elapsed = time.perf_counter() - t0
+            print(f"{label:<8} {result}  {elapsed:7.3f}s  {len(executions) / elapsed:>10,.0f} executions/s")
+        db.close()
+        Session.kw["bind"].dispose()
+
+
+if __name__ == "__main__":
+    main()
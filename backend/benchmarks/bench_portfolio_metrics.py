@@ -0,0 +1,99 @@
+"""
+Timing of StandardAnalyzer.calculate_portfolio_metrics on a large run.
+
+Seeds a throwaway SQLite file with one run of random trades plus the
+orders and executions its fee / latency / fill metrics read, then times
+the run analysis (load + metrics + equity curve) and a strategy-wide one
+without the execution metrics.
+
+Usage (from backend/):
+    python -m benchmarks.bench_portfolio_metrics --trades 1000000
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+from benchmarks.bench_bar_ingest import make_session_factory
+from src.core.bulk_writer import insert_columns
+from src.database.models import (
+    Execution, Order, OrderStatus, OrderType, PositionImpactType, RunType, Side, Strategy, StrategyInstance,
+    StrategyRun, Trade
+)
+from src.services.analytics.standard_analyzer import StandardAnalyzer
+
+
+def seed(db, trades, fills, seed=0):
+    run_id = "bench_run"
+    db.add(Strategy(strategy_id="bench", name="Bench"))
+    db.add(StrategyInstance(instance_id="bench_instance", strategy_id="bench", parameters_json={}))
+    db.add(StrategyRun(run_id=run_id, instance_id="bench_instance", run_type=RunType.BACKTEST))
+    db.commit()
+
+    rng = np.random.default_rng(seed)
+    start = np.datetime64(datetime(2020, 1, 1), "us")
+    exit_time = start + np.sort(rng.integers(0, 10 ** 13, trades)).astype("timedelta64[us]")
+    entry_price = np.round(100 + rng.normal(0, 5, trades), 2)
+    insert_columns(db, Trade.__table__, {
+        "trade_id": [f"T{i}" for i in range(trades)],
+        "run_id": [run_id] * trades,
+        "symbol": ["BENCH"] * trades,
+        "side": np.where(rng.random(trades) < 0.5, Side.BUY, Side.SELL),
+        "entry_time": exit_time - np.timedelta64(30, "m"),
+        "exit_time": exit_time,
+        "entry_price": entry_price,
+        "exit_price": np.round(entry_price + rng.normal(0, 2, trades), 2),
+        "quantity": rng.choice([1.0, 2.0], trades),
+        "pnl_net": np.round(rng.normal(1, 40, trades), 4),
+        "commission": np.full(trades, 1.25),
+        "mae": rng.uniform(0, 4, trades),
+        "mfe": rng.uniform(-1, 6, trades),
+    })
+
+    submit = start + np.arange(fills) * np.timedelta64(1, "s")
+    order_ids = [f"O{i}" for i in range(fills)]
+    insert_columns(db, Order.__table__, {
+        "run_id": [run_id] * fills, "order_id": order_ids, "symbol": ["BENCH"] * fills,
+        "side": [Side.BUY] * fills, "order_type": [OrderType.MARKET] * fills, "quantity": np.ones(fills),
+        "status": [OrderStatus.FILLED] * fills, "position_impact": [PositionImpactType.UNKNOWN] * fills,
+        "submit_utc": submit,
+    })
+    insert_columns(db, Execution.__table__, {
+        "run_id": [run_id] * fills, "execution_id": [f"E{i}" for i in range(fills)], "order_id": order_ids,
+        "exec_utc": submit + rng.integers(0, 5 * 10 ** 6, fills).astype("timedelta64[us]"),
+        "price": rng.uniform(90, 110, fills), "quantity": np.ones(fills), "fee": np.full(fills, 0.5),
+    })
+    db.commit()
+    return run_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--trades", type=int, default=1000000)
+    parser.add_argument("--fills", type=int, default=None, help="Orders / executions (default: 2 per trade)")
+    parser.add_argument("--repeat", type=int, default=2)
+    args = parser.parse_args()
+    fills = args.fills if args.fills is not None else 2 * args.trades
+
+    with tempfile.TemporaryDirectory() as tmp:
+        Session = make_session_factory(os.path.join(tmp, "bench.db"))
+        db = Session()
+        run_id = seed(db, args.trades, fills)
+        analyzer = StandardAnalyzer(db)
+        for label, kwargs in (("run", {"run_id": run_id}), ("strategy", {"strategy_id": "bench"})):
+            for attempt in range(args.repeat):
+                t0 = time.perf_counter()
+                metrics = analyzer.calculate_portfolio_metrics(**kwargs)
+                elapsed = time.perf_counter() - t0
+                assert metrics["total_trades"] == args.trades and len(metrics["equity_curve"]) == args.trades
+                print(f"{label:<9} #{attempt + 1}  {args.trades:>9,} trades  {elapsed:7.3f}s "
+                      f"({args.trades / elapsed:>10,.0f} trades/s)")
+        db.close()
+        Session.kw["bind"].dispose()
+
+
+if __name__ == "__main__":
+    main()
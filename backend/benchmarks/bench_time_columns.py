@@ -0,0 +1,106 @@
+"""
+DateTime vs int64 epoch-µs time columns on one large market series.
+
+Builds two throwaway SQLite files holding the same series in the
+market_bars layout, one with the DateTime column the models default to and
+one with EpochMicros (TIME_STORAGE=epoch_us), then compares:
+  - full load into a DataFrame (datetime: SQLAlchemy parses every ISO string
+    into a datetime; epoch: raw ints -> datetime64 in one step),
+  - a one-day range scan on the (series_id, ts_utc) key, repeated,
+  - database file size.
+
+Usage (from backend/):
+    python -m benchmarks.bench_time_columns --bars 10000000
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import Column, DateTime, Float, MetaData, String, Table, select
+
+from src.database.connection import make_engine
+from src.database.time_columns import EpochMicros, raw_time, time_array, to_epoch_us
+
+START = datetime(2000, 1, 1)
+CHUNK = 200000
+
+
+def make_table(kind):
+    return Table(
+        "market_bars", MetaData(),
+        Column("series_id", String, primary_key=True),
+        Column("ts_utc", EpochMicros() if kind == "epoch_us" else DateTime(), primary_key=True),
+        *(Column(col, Float) for col in ("open", "high", "low", "close", "volume")),
+    )
+
+
+def populate(engine, table, kind, bars):
+    table.metadata.create_all(engine)
+    rng = np.random.default_rng(7)
+    sql = "INSERT INTO market_bars (series_id, ts_utc, open, high, low, close, volume) VALUES ('S', ?, ?, ?, ?, ?, ?)"
+    with engine.begin() as conn:
+        for lo in range(0, bars, CHUNK):
+            n = min(CHUNK, bars - lo)
+            us = to_epoch_us(START) + (np.arange(lo, lo + n, dtype="int64") * 60 * 10**6)
+            if kind == "epoch_us":
+                ts = us.tolist()
+            else:
+                ts = [str(t) for t in us.astype("datetime64[us]").astype(object)]
+                ts = [t if "." in t else t + ".000000" for t in ts]
+            close = rng.random(n) + 100
+            conn.exec_driver_sql(sql, list(zip(ts, close.tolist(), (close + 1).tolist(), (close - 1).tolist(),
+                                               close.tolist(), rng.random(n).tolist())))
+
+
+def load_full(engine, table):
+    t0 = time.perf_counter()
+    with engine.connect() as conn:
+        rows = conn.execute(select(raw_time(table.c.ts_utc), table.c.close).where(table.c.series_id == "S")).all()
+    frame = pd.DataFrame(rows, columns=["ts_utc", "close"])
+    frame["ts_utc"] = time_array(frame["ts_utc"].to_numpy(), table.c.ts_utc)
+    return time.perf_counter() - t0, len(frame)
+
+
+def range_scans(engine, table, bars, repeats=200):
+    rng = np.random.default_rng(11)
+    days = max(bars // 1440 - 1, 1)
+    t0 = time.perf_counter()
+    total = 0
+    with engine.connect() as conn:
+        for day in rng.integers(0, days, repeats):
+            lo = START + timedelta(days=int(day))
+            rows = conn.execute(select(raw_time(table.c.ts_utc), table.c.close).where(
+                table.c.series_id == "S", table.c.ts_utc >= lo, table.c.ts_utc < lo + timedelta(days=1)
+            )).all()
+            total += len(time_array([r[0] for r in rows], table.c.ts_utc))
+    return (time.perf_counter() - t0) / repeats, total // repeats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--bars", type=int, default=10_000_000)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    print(f"{args.bars:,} one-minute bars, SQLite files in {tmp}")
+    for kind in ("datetime", "epoch_us"):
+        path = os.path.join(tmp, f"{kind}.db")
+        engine = make_engine(f"sqlite:///{path}")
+        table = make_table(kind)
+        t0 = time.perf_counter()
+        populate(engine, table, kind, args.bars)
+        built = time.perf_counter() - t0
+        load_s, n = load_full(engine, table)
+        scan_s, per_day = range_scans(engine, table, args.bars)
+        print(f"{kind:<9} insert {built:7.1f}s  file {os.path.getsize(path) / 2**20:8.1f} MiB  "
+              f"full load {load_s:7.2f}s ({n / load_s:>12,.0f} bars/s)  "
+              f"1-day range {scan_s * 1e3:6.2f} ms ({per_day} bars)")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Timing of a full trade rebuild (TradeService.rebuild_trades_for_run).
+
+Seeds a throwaway SQLite file with a run of alternating fills on one
+symbol plus the market bars its regime and MAE/MFE lookups read, then
+times the rebuild end to end and reports seconds per 100k trades. "written"
+is the time until the trades are committed, before the run analytics.
+
+Usage (from backend/):
+    python -m benchmarks.bench_trade_rebuild --trades 100000
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, insert
+
+from benchmarks.bench_bar_ingest import make_session_factory
+from src.api.schemas import BarCreate
+from src.core import bulk_writer
+from src.core.trade_service import TradeService
+from src.database.models import (
+    Execution, Order, OrderStatus, OrderType, RunType, Side, Strategy, StrategyInstance, StrategyRun, Trade
+)
+
+SYMBOL = "BENCH"
+
+
+def seed(db, trades, bars):
+    run_id = "bench_run"
+    db.add(Strategy(strategy_id="bench", name="Bench"))
+    db.add(StrategyInstance(instance_id="bench_instance", strategy_id="bench", symbol=SYMBOL,
+                            timeframe="1m", parameters_json={}))
+    db.add(StrategyRun(run_id=run_id, instance_id="bench_instance", run_type=RunType.BACKTEST))
+    db.commit()
+
+    start = datetime(2020, 1, 1)
+    bulk_writer.upsert_bars(db, [
+        BarCreate(run_id=run_id, symbol=SYMBOL, timeframe="1m", ts_utc=start + timedelta(minutes=i),
+                  open=100.0 + i % 7, high=101.0 + i % 7, low=99.0 + i % 5, close=100.5 + i % 3, volume=1.0)
+        for i in range(bars)
+    ])
+
+    # Two fills per trade, spread over the bars
+    fills = 2 * trades
+    step = timedelta(minutes=bars) / fills
+    for chunk_start in range(0, fills, 50000):
+        ids = range(chunk_start, min(fills, chunk_start + 50000))
+        db.execute(insert(Order.__table__), [
+            {"run_id": run_id, "order_id": f"O{i}", "symbol": SYMBOL, "side": Side.BUY if i % 2 == 0 else Side.SELL,
+             "order_type": OrderType.MARKET, "quantity": 1.0, "status": OrderStatus.FILLED}
+            for i in ids
+        ])
+        db.execute(insert(Execution.__table__), [
+            {"run_id": run_id, "execution_id": f"E{i}", "order_id": f"O{i}", "exec_utc": start + step * i,
+             "price": 100.0 + (i % 11) * 0.1, "quantity": 1.0}
+            for i in ids
+        ])
+    db.commit()
+    return run_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--trades", type=int, default=100000)
+    parser.add_argument("--bars", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        Session = make_session_factory(os.path.join(tmp, "bench.db"))
+        db = Session()
+        run_id = seed(db, args.trades, args.bars)
+        commits = []
+        event.listen(db, "after_commit", lambda session: commits.append(time.perf_counter()))
+        for attempt in range(args.repeat):
+            commits.clear()
+            t0 = time.perf_counter()
+            count = TradeService(db).rebuild_trades_for_run(run_id)
+            elapsed = time.perf_counter() - t0
+            written = commits[0] - t0
+            assert db.query(Trade).filter(Trade.run_id == run_id).count() == count
+            per_100k = 100000 / max(count, 1)
+            print(f"rebuild #{attempt + 1}  {count:>9,} trades  total {elapsed:7.3f}s ({elapsed * per_100k:7.3f}s "
+                  f"per 100k)  written {written:7.3f}s ({written * per_100k:7.3f}s per 100k)")
+        db.close()
+        Session.kw["bind"].dispose()
+
+
+if __name__ == "__main__":
+    main()
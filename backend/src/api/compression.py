@@ -0,0 +1,319 @@
+"""
+Transparent body compression.
+
+RequestDecompressionMiddleware decodes gzip / zstd request bodies
+(Content-Encoding) on the configured path prefixes, chunk by chunk as they
+arrive, so routers (including the streaming ingest endpoints) only ever see
+plain bytes.
+
+ResponseCompressionMiddleware negotiates Accept-Encoding and compresses
+responses above a size threshold while they stream out, without buffering
+the whole body. Both sides record the ratios they achieve in
+`compression_stats`.
+
+Request bodies are inflated in bounded steps and the decompressed size is
+capped (INGEST_MAX_DECOMPRESSED_BYTES, 64 MiB by default), so a small
+compression bomb is rejected with 413 before it can allocate much more than
+the cap.
+
+zstd requires the `zstandard` package (in requirements.txt); without it
+only gzip is offered and zstd request bodies are rejected with 415.
+"""
+import os
+import zlib
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from fastapi import HTTPException
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+GZIP_ENCODINGS = ("gzip", "x-gzip")
+DEFAULT_MAX_DECOMPRESSED_BYTES = 64 << 20
+# Most plain bytes produced per decompression step
+DECODE_STEP_BYTES = 1 << 20
+# zstd has no output bound per call: it is fed this many compressed bytes at a
+# time instead (at most ~32x128 KiB of output, the format's densest blocks)
+ZSTD_INPUT_STEP = 128
+
+
+def supported_encodings() -> List[str]:
+    return (["zstd"] if zstandard is not None else []) + ["gzip"]
+
+
+class CompressionStats:
+    """Byte counters per direction and encoding; ratio = uncompressed / compressed."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.requests: Dict[str, Dict[str, int]] = {}
+        self.responses: Dict[str, Dict[str, int]] = {}
+        self.responses_below_threshold = 0
+
+    @staticmethod
+    def _add(bucket: Dict[str, Dict[str, int]], encoding: str, plain: int, compressed: int, count: int):
+        entry = bucket.setdefault(encoding, {"count": 0, "plain_bytes": 0, "compressed_bytes": 0})
+        entry["count"] += count
+        entry["plain_bytes"] += plain
+        entry["compressed_bytes"] += compressed
+
+    def record_request(self, encoding: str, plain: int, compressed: int, count: int = 0):
+        self._add(self.requests, encoding, plain, compressed, count)
+
+    def record_response(self, encoding: str, plain: int, compressed: int, count: int = 0):
+        self._add(self.responses, encoding, plain, compressed, count)
+
+    @staticmethod
+    def _with_ratio(bucket: Dict[str, Dict[str, int]]) -> Dict[str, Dict[str, float]]:
+        return {
+            encoding: {**entry, "ratio": round(entry["plain_bytes"] / entry["compressed_bytes"], 3)
+                       if entry["compressed_bytes"] else None}
+            for encoding, entry in bucket.items()
+        }
+
+    def snapshot(self) -> Dict[str, object]:
+        return {
+            "supported_encodings": supported_encodings(),
+            "requests": self._with_ratio(self.requests),
+            "responses": self._with_ratio(self.responses),
+            "responses_below_threshold": self.responses_below_threshold,
+        }
+
+
+compression_stats = CompressionStats()
+
+
+# --- Codecs ---
+
+class _Decoder:
+    """Incremental decoder whose steps each produce a bounded amount of output."""
+
+    def __init__(self, encoding: str):
+        self.gzip = encoding in GZIP_ENCODINGS
+        if self.gzip:
+            self._obj = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+        else:
+            self._obj = zstandard.ZstdDecompressor().decompressobj()
+
+    @property
+    def eof(self) -> bool:
+        return self._obj.eof
+
+    def decompress(self, chunk: bytes) -> Iterator[bytes]:
+        """Yields the plain bytes of `chunk`, piece by piece."""
+        if self.gzip:
+            piece = self._obj.decompress(chunk, DECODE_STEP_BYTES)
+            while True:
+                yield piece
+                if not self._obj.unconsumed_tail:
+                    return
+                piece = self._obj.decompress(self._obj.unconsumed_tail, DECODE_STEP_BYTES)
+        for start in range(0, len(chunk), ZSTD_INPUT_STEP):
+            yield self._obj.decompress(chunk[start:start + ZSTD_INPUT_STEP])
+
+
+def make_decoder(encoding: str) -> Optional[_Decoder]:
+    """Returns a decoder for the encoding; None if the encoding is unsupported."""
+    if encoding in GZIP_ENCODINGS or (encoding == "zstd" and zstandard is not None):
+        return _Decoder(encoding)
+    return None
+
+
+class _Encoder:
+    def __init__(self, encoding: str, gzip_level: int, zstd_level: int):
+        if encoding == "zstd":
+            self._obj = zstandard.ZstdCompressor(level=zstd_level).compressobj()
+            self._sync_flush = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+            self._finish = zstandard.COMPRESSOBJ_FLUSH_FINISH
+        else:
+            self._obj = zlib.compressobj(gzip_level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+            self._sync_flush = zlib.Z_SYNC_FLUSH
+            self._finish = zlib.Z_FINISH
+
+    def compress(self, chunk: bytes, final: bool) -> bytes:
+        # Flush every chunk of a streamed body so the client receives it right away
+        return self._obj.compress(chunk) + self._obj.flush(self._finish if final else self._sync_flush)
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Picks zstd or gzip from an Accept-Encoding header, honouring q=0."""
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[token] = q
+
+    candidates = [
+        (weights.get(enc, weights.get("*", 0.0)), -rank, enc)
+        for rank, enc in enumerate(supported_encodings())
+    ]
+    q, _, encoding = max(candidates)
+    return encoding if q > 0 else None
+
+
+# --- Middleware ---
+
+class RequestDecompressionMiddleware:
+    def __init__(self, app, path_prefixes: Tuple[str, ...] = ("/api/ingest",),
+                 max_decompressed_bytes: Optional[int] = DEFAULT_MAX_DECOMPRESSED_BYTES):
+        self.app = app
+        self.path_prefixes = path_prefixes
+        self.max_decompressed_bytes = max_decompressed_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        encoding = Headers(scope=scope).get("content-encoding", "").strip().lower()
+        if not encoding or encoding == "identity":
+            await self.app(scope, receive, send)
+            return
+
+        decoder = make_decoder(encoding)
+        if decoder is None:
+            response = JSONResponse(
+                status_code=415,
+                content={"detail": f"Unsupported Content-Encoding '{encoding}', supported: {supported_encodings()}"}
+            )
+            await response(scope, receive, send)
+            return
+
+        # The app sees a plain body of unknown length
+        scope = dict(scope)
+        headers = MutableHeaders(scope=scope)
+        del headers["content-encoding"]
+        if "content-length" in headers:
+            del headers["content-length"]
+
+        stats_key = "gzip" if encoding in GZIP_ENCODINGS else encoding
+        limit = self.max_decompressed_bytes
+        totals = {"plain": 0, "compressed": 0}
+
+        async def decoding_receive():
+            message = await receive()
+            if message["type"] != "http.request":
+                return message
+            chunk = message.get("body", b"")
+            pieces = []
+            try:
+                for piece in decoder.decompress(chunk):
+                    totals["plain"] += len(piece)
+                    if limit and totals["plain"] > limit:
+                        raise HTTPException(status_code=413, detail=f"Decompressed body exceeds {limit} bytes")
+                    pieces.append(piece)
+            except HTTPException:
+                raise
+            except Exception as e:
+                raise HTTPException(status_code=400, detail=f"Malformed {encoding} request body: {e}")
+            if not message.get("more_body", False) and not decoder.eof:
+                raise HTTPException(status_code=400, detail=f"Truncated {encoding} request body")
+            plain = b"".join(pieces)
+            totals["compressed"] += len(chunk)
+            compression_stats.record_request(stats_key, len(plain), len(chunk),
+                                             count=0 if message.get("more_body", False) else 1)
+            return {**message, "body": plain}
+
+        await self.app(scope, decoding_receive, send)
+
+
+class ResponseCompressionMiddleware:
+    def __init__(self, app, minimum_size: int = 4096, gzip_level: int = 6, zstd_level: int = 3):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.zstd_level = zstd_level
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressingResponder(send, encoding, self.minimum_size, self.gzip_level, self.zstd_level)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressingResponder:
+    def __init__(self, send, encoding: str, minimum_size: int, gzip_level: int, zstd_level: int):
+        self._send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.zstd_level = zstd_level
+        self.start_message = None
+        self.encoder: Optional[_Encoder] = None
+        self.passthrough = False
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            # Held back until the first body chunk tells us whether to compress
+            self.start_message = message
+            headers = Headers(raw=message["headers"])
+            length = headers.get("content-length")
+            if "content-encoding" in headers or (length is not None and int(length) < self.minimum_size):
+                self.passthrough = True
+                if length is not None and "content-encoding" not in headers:
+                    compression_stats.responses_below_threshold += 1
+            return
+
+        if message["type"] != "http.response.body":
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.start_message is not None:
+            start, self.start_message = self.start_message, None
+            if not self.passthrough and not more_body and len(body) < self.minimum_size:
+                self.passthrough = True
+                compression_stats.responses_below_threshold += 1
+            if not self.passthrough:
+                self.encoder = _Encoder(self.encoding, self.gzip_level, self.zstd_level)
+                headers = MutableHeaders(raw=start["headers"])
+                if "content-length" in headers:
+                    del headers["content-length"]
+                headers["Content-Encoding"] = self.encoding
+                headers.add_vary_header("Accept-Encoding")
+            await self._send(start)
+
+        if self.passthrough:
+            await self._send(message)
+            return
+
+        compressed = self.encoder.compress(body, final=not more_body)
+        compression_stats.record_response(self.encoding, len(body), len(compressed), count=0 if more_body else 1)
+        await self._send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+
+
+def install(app):
+    """Registers both middlewares on the app using env configuration."""
+    app.add_middleware(
+        ResponseCompressionMiddleware,
+        minimum_size=int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "4096")),
+        gzip_level=int(os.getenv("RESPONSE_COMPRESSION_GZIP_LEVEL", "6")),
+        zstd_level=int(os.getenv("RESPONSE_COMPRESSION_ZSTD_LEVEL", "3")),
+    )
+    app.add_middleware(
+        RequestDecompressionMiddleware,
+        path_prefixes=("/api/ingest",),
+        max_decompressed_bytes=int(os.getenv("INGEST_MAX_DECOMPRESSED_BYTES", str(DEFAULT_MAX_DECOMPRESSED_BYTES))),
+    )
@@ -1,6 +1,10 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from src.database.connection import init_db
+from src.database.connection import init_db, async_engine
+from src.core.ingest_queue import ingest_queue
+from src.core.sqlite_writer import single_writer
+from src.core.metrics_cache import metrics_cache
+from src.api import compression
 import sys
 import asyncio
 
@@ -12,6 +16,7 @@ if sys.platform == 'win32':
 # Routers
 from src.api.routers import executions
 from src.api.routers import bars
+from src.api.routers import market
 from src.api.routers import setups
 from src.api.routers import ingest
 from src.api.routers import strategies
@@ -37,12 +42,28 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# gzip/zstd request decoding on /api/ingest, negotiated response compression
+compression.install(app)
+
 @app.on_event("startup")
-def on_startup():
+async def on_startup():
     init_db()
+    single_writer.start()
+    await ingest_queue.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    # Flush whatever the write-behind queue already acknowledged
+    await ingest_queue.stop()
+    # Background metrics refreshes may still write through the single writer
+    await asyncio.to_thread(metrics_cache.shutdown)
+    await asyncio.to_thread(single_writer.stop)
+    if async_engine is not None:
+        await async_engine.dispose()
 
 app.include_router(executions.router, prefix="/api/executions", tags=["executions"])
 app.include_router(bars.router, prefix="/api/bars", tags=["bars"])
+app.include_router(market.router, prefix="/api/market", tags=["market"])
 app.include_router(setups.router, prefix="/api/setups", tags=["setups"])
 app.include_router(ingest.router, prefix="/api/ingest", tags=["ingest"])
 app.include_router(strategies.router, prefix="/api/strategies", tags=["strategies"])
@@ -57,3 +78,8 @@ app.include_router(ml_studio.router, prefix="/api", tags=["ml-studio"]) # Fix in
 @app.get("/health")
 def health_check():
     return {"status": "ok", "system": "Strategy Analysis Platform v2"}
+
+@app.get("/api/compression/stats")
+def compression_stats():
+    """Bytes in/out and ratio per encoding for request and response compression."""
+    return compression.compression_stats.snapshot()
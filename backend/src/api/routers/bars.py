@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from src.database.connection import get_db
 from src.database.models import Bar, RunSeries
 from src.api.schemas import BarResponse 
+from src.core.series_cache import series_cache
+from src.core import bar_archive, rollups
 from datetime import datetime
 
 router = APIRouter()
@@ -35,17 +37,23 @@ def read_bars(
         return query.order_by(Bar.ts_utc.asc()).limit(limit).all()
 
     # 2. Fallback to Shared Market Data
-    from src.database.models import MarketSeries, MarketBar
+    from src.database.models import MarketBar
     
-    m_series = db.query(MarketSeries).filter(
-        MarketSeries.symbol == symbol,
-        MarketSeries.timeframe == timeframe
-    ).first()
+    series_id = series_cache.resolve(db, symbol, timeframe)
     
-    if not m_series:
-        return []
+    if not series_id:
+        # No stored series at this timeframe: aggregate the nearest finer one (rollup or base)
+        df = rollups.read_timeframe(db, symbol, timeframe, start_utc, end_utc, limit=limit)
+        if df is None:
+            return []
+        return df[["ts_utc", "open", "high", "low", "close", "volume"]].to_dict("records")
         
-    query = db.query(MarketBar).filter(MarketBar.series_id == m_series.series_id)
+    if bar_archive.has_archive(series_id):
+        # Part of the history lives in the Parquet tier
+        df = bar_archive.read_series(db, series_id, start_utc, end_utc, limit=limit)
+        return df[["ts_utc", "open", "high", "low", "close", "volume"]].to_dict("records")
+
+    query = db.query(MarketBar).filter(MarketBar.series_id == series_id)
     
     if start_utc:
         query = query.filter(MarketBar.ts_utc >= start_utc)
@@ -53,3 +61,23 @@ def read_bars(
         query = query.filter(MarketBar.ts_utc <= end_utc)
         
     return query.order_by(MarketBar.ts_utc.asc()).limit(limit).all()
+
+
+@router.post("/rollups")
+def build_rollups(
+    symbol: str,
+    timeframe: str,
+    targets: List[str] = Query(list(rollups.DEFAULT_TIMEFRAMES)),
+    db: Session = Depends(get_db)
+):
+    """Materializes coarser rollups of the (symbol, timeframe) market series; ingest keeps them current."""
+    series_id = series_cache.resolve(db, symbol, timeframe)
+    if not series_id:
+        raise HTTPException(status_code=404, detail="Market series not found")
+    try:
+        written = rollups.build(db, series_id, targets)
+        db.commit()
+    except ValueError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"series_id": series_id, "bars": written}
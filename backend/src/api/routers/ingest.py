@@ -1,15 +1,18 @@
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, Request, WebSocket, WebSocketDisconnect, Header
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
+import asyncio
+import json
 import logging
+import os
 from datetime import datetime
+from typing import Optional
 import uuid
-import hashlib
 
-from src.database.connection import get_db
+from src.database.connection import get_db, SessionLocal
 from src.database.models import (
     Strategy, StrategyInstance, StrategyRun, 
     Order, Execution, RunSeries, Bar,
-    MarketSeries, MarketBar, RunSubscription,
     Side, OrderType, OrderStatus, PositionImpactType, RunType, RunStatus
 )
 from src.api.schemas import (
@@ -17,10 +20,21 @@ from src.api.schemas import (
     OrderCreate, OrderUpdate, ExecutionCreate, BarCreate, StreamIngestRequest
 )
 from src.core.trade_service import TradeService
+from src.core import ingest_log, ndjson_ingest
+from src.core.ws_ingest import WebSocketIngestBuffer
+from src.core.ingest_queue import ingest_queue, IngestQueueFull
+from src.core.sqlite_writer import single_writer
+from src.database.shards import run_session, shard_router
+from src.core.series_cache import series_cache
+from src.core.idempotency import idempotency_filter, batch_keys
+from src.core.columnar_bars import decode_bars, ColumnarBarError
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# "manual" (rebuild via /api/trades/rebuild) or "incremental" (on execution ingest)
+TRADE_RECONSTRUCTION = os.getenv("TRADE_RECONSTRUCTION", "manual").lower()
+
 # --- Helper Functions ---
 
 def upsert_strategy(db: Session, data: StrategyCreate):
@@ -69,6 +83,47 @@ def upsert_instance(db: Session, data: StrategyInstanceCreate):
     db.refresh(inst)
     return inst
 
+def schedule_incremental_trades(background_tasks: BackgroundTasks, run_ids: set):
+    """TRADE_RECONSTRUCTION=incremental: extend the trades of the runs after the response."""
+    if TRADE_RECONSTRUCTION != "incremental":
+        return
+    for rid in run_ids:
+        background_tasks.add_task(rebuild_trades_task, rid, True)
+
+async def enqueue_ingest(parts: list, endpoint: Optional[str] = None, idempotency_key: Optional[str] = None) -> JSONResponse:
+    """
+    Queued ingest mode: hand the validated payload to the write-behind queue.
+    The Idempotency-Key is only remembered once the writer has committed the
+    batch, so a retry after a dropped batch is written again.
+    """
+    on_commit = None
+    if endpoint and idempotency_key:
+        on_commit = lambda seq: batch_keys.put(endpoint, idempotency_key, {"status": "queued", "seq": seq})
+    try:
+        seq = await ingest_queue.put(parts, on_commit=on_commit)
+    except IngestQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    return JSONResponse(status_code=202, content={"status": "queued", "seq": seq})
+
+async def write_inline(parts: list) -> list:
+    """
+    Inline ingest: commits the parts through per-run shards, the SQLite single
+    writer or a sync session of their own. The bulk writers are CPU and file
+    heavy (validation, bar store), so they always run off the event loop.
+    """
+    if shard_router.enabled:
+        return await asyncio.to_thread(ingest_log.write_sharded, parts)
+    if single_writer.enabled:
+        return await single_writer.run_async(ingest_log.write_parts, parts)
+    return await asyncio.to_thread(ingest_log.write_committed, parts)
+
+def replayed_batch(endpoint: str, idempotency_key: Optional[str]) -> Optional[JSONResponse]:
+    """Response of an already committed batch with the same Idempotency-Key, if any."""
+    cached = batch_keys.get(endpoint, idempotency_key)
+    if cached is None:
+        return None
+    return JSONResponse(content=cached, headers={"Idempotent-Replay": "true"})
+
 # --- Endpoints ---
 
 @router.post("/event/strategy_create")
@@ -122,129 +177,178 @@ def on_run_start(data: StrategyRunCreate, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/event/order")
-async def on_order(data: OrderCreate, db: Session = Depends(get_db)):
+async def on_order(data: OrderCreate):
     logger.info(f"Received Order Event: {data.order_id} (Status: {data.status})")
+    if ingest_queue.enabled:
+        return await enqueue_ingest([("orders", [data])])
     try:
-        await upsert_order_logic(db, data)
-        db.commit()
+        await write_inline([("orders", [data])])
         return {"status": "ok", "id": data.order_id}
     except Exception as e:
-        db.rollback()
         logger.error(f"Error processing order: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/batch/orders")
-async def on_orders_batch(data: list[OrderCreate], db: Session = Depends(get_db)):
+async def on_orders_batch(data: list[OrderCreate], idempotency_key: Optional[str] = Header(None)):
+    if (replay := replayed_batch("orders", idempotency_key)) is not None:
+        return replay
+    if ingest_queue.enabled:
+        return await enqueue_ingest([("orders", data)], "orders", idempotency_key)
     try:
-        for item in data:
-            await upsert_order_logic(db, item)
-        db.commit()
-        return {"status": "ok", "count": len(data)}
+        (result,) = await write_inline([("orders", data)])
+        response = {"status": "ok", "count": len(data), "inserted": result["inserted"], "updated": result["updated"]}
+        batch_keys.put("orders", idempotency_key, response)
+        return response
     except Exception as e:
-        db.rollback()
         logger.error(f"Error processing order batch: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-async def upsert_order_logic(db: Session, data: OrderCreate):
-    existing = db.query(Order).filter(Order.run_id == data.run_id, Order.order_id == data.order_id).first()
-    if existing:
-        existing.status = OrderStatus(data.status.value)
-        existing.quantity = data.quantity 
-        existing.price = data.price
-        existing.update_utc = data.submit_utc
-        if data.position_impact:
-            existing.position_impact = PositionImpactType(data.position_impact.value)
-    else:
-        new_order = Order(
-            run_id=data.run_id,
-            strategy_id=data.strategy_id,
-            order_id=data.order_id,
-            parent_order_id=data.parent_order_id,
-            symbol=data.symbol,
-            account_id=data.account_id,
-            side=Side(data.side.value),
-            order_type=OrderType(data.order_type.value),
-            time_in_force=data.time_in_force,
-            quantity=data.quantity,
-            price=data.price,
-            stop_price=data.stop_price,
-            status=OrderStatus(data.status.value),
-            submit_utc=data.submit_utc,
-            client_tag=data.client_tag,
-            position_impact=PositionImpactType(data.position_impact.value) if data.position_impact else PositionImpactType.UNKNOWN,
-            extra_json=data.extra_json
-        )
-        db.add(new_order)
-        db.flush() # Ensure visible for next iter in batch
-
 @router.post("/event/execution")
-async def on_execution(data: ExecutionCreate, db: Session = Depends(get_db)):
+async def on_execution(data: ExecutionCreate, background_tasks: BackgroundTasks):
     logger.info(f"Received Execution Event: {data.execution_id} for Order {data.order_id}")
+    if ingest_queue.enabled:
+        return await enqueue_ingest([("executions", [data])])
     try:
-        await upsert_execution_logic(db, data)
-        db.commit()
+        await write_inline([("executions", [data])])
+        schedule_incremental_trades(background_tasks, {data.run_id})
         return {"status": "ok", "id": data.execution_id}
     except Exception as e:
-        db.rollback()
         logger.error(f"Error processing execution: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/batch/executions")
-async def on_executions_batch(data: list[ExecutionCreate], background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+async def on_executions_batch(data: list[ExecutionCreate], background_tasks: BackgroundTasks,
+                              idempotency_key: Optional[str] = Header(None)):
+    if (replay := replayed_batch("executions", idempotency_key)) is not None:
+        return replay
+    if ingest_queue.enabled:
+        return await enqueue_ingest([("executions", data)], "executions", idempotency_key)
     try:
-        run_ids = set()
-        for item in data:
-            await upsert_execution_logic(db, item)
-            run_ids.add(item.run_id)
-        db.commit()
+        run_ids = {item.run_id for item in data}
+        (result,) = await write_inline([("executions", data)])
         
-        # Trigger Trade Reconstruction for affected runs - DISABLED for Manual Trigger
+        # Trigger Trade Reconstruction for affected runs - full rebuild DISABLED for Manual Trigger
         # trade_service = TradeService(db)
         # for rid in run_ids:
         #     background_tasks.add_task(rebuild_trades_task, rid)
-            
-        return {"status": "ok", "count": len(data)}
+        schedule_incremental_trades(background_tasks, run_ids)
+
+        response = {"status": "ok", "count": len(data), "inserted": result["inserted"], "updated": result["updated"],
+                    "duplicates": result["duplicates"]}
+        batch_keys.put("executions", idempotency_key, response)
+        return response
     except Exception as e:
-        db.rollback()
         logger.error(f"Error processing execution batch: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/stream")
-async def ingest_stream(data: StreamIngestRequest, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+async def ingest_stream(data: StreamIngestRequest, background_tasks: BackgroundTasks,
+                        idempotency_key: Optional[str] = Header(None)):
+    if (replay := replayed_batch("stream", idempotency_key)) is not None:
+        return replay
+    if ingest_queue.enabled:
+        return await enqueue_ingest([("orders", data.orders or []), ("executions", data.executions or [])],
+                                    "stream", idempotency_key)
     try:
-        run_ids = set()
+        run_ids = {item.run_id for item in (data.orders or []) + (data.executions or [])}
         
-        # Process Orders
-        if data.orders:
-            for order in data.orders:
-                await upsert_order_logic(db, order)
-                run_ids.add(order.run_id)
-        
-        # Process Executions
-        if data.executions:
-            for exposure in data.executions:
-                await upsert_execution_logic(db, exposure)
-                run_ids.add(exposure.run_id)
-                
-        db.commit()
+        # Orders first so executions of the same payload can reference them
+        await write_inline([(kind, items) for kind, items in (("orders", data.orders), ("executions", data.executions))
+                                if items])
         
-        # Trigger reconstruction for involved runs - DISABLED for Manual Trigger
+        # Trigger reconstruction for involved runs - full rebuild DISABLED for Manual Trigger
         # trade_service = TradeService(db)
         # for rid in run_ids:
         #     background_tasks.add_task(rebuild_trades_task, rid)
-            
-        return {"status": "ok", "orders_processed": len(data.orders), "executions_processed": len(data.executions)}
+        schedule_incremental_trades(background_tasks, run_ids)
+
+        response = {"status": "ok", "orders_processed": len(data.orders), "executions_processed": len(data.executions)}
+        batch_keys.put("stream", idempotency_key, response)
+        return response
         
     except Exception as e:
-        db.rollback()
         logger.error(f"Error processing stream: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-def rebuild_trades_task(run_id: str):
+@router.post("/stream/ndjson")
+async def ingest_stream_ndjson(request: Request, chunk_lines: int = ndjson_ingest.DEFAULT_CHUNK_LINES,
+                               db: Session = Depends(get_db)):
+    """
+    Streaming variant of /stream: newline-delimited order/execution/bar events
+    read as the body arrives and committed every `chunk_lines` events (see
+    src.core.ndjson_ingest). Bad lines are skipped and reported by line number.
+    """
+    if chunk_lines < 1:
+        raise HTTPException(status_code=422, detail="chunk_lines must be >= 1")
+    enqueue = ingest_queue.put if ingest_queue.enabled else None
+    report = await ndjson_ingest.ingest_ndjson(request.stream(), db, chunk_lines=chunk_lines, enqueue=enqueue)
+    if report["failed_count"]:
+        logger.warning(f"NDJSON stream: {report['failed_count']} of {report['lines']} lines failed")
+    return report
+
+@router.websocket("/ws/{run_id}")
+async def ingest_websocket(websocket: WebSocket, run_id: str):
+    """
+    Persistent ingest channel for one live run: seq-numbered order/execution/bar
+    messages, committed in short time/size windows and acknowledged by seq
+    (see src.core.ws_ingest).
+    """
+    await websocket.accept()
+    enqueue = ingest_queue.put if ingest_queue.enabled else None
+    session_factory = (lambda: run_session(run_id)) if shard_router.enabled else SessionLocal
+    buffer = WebSocketIngestBuffer(run_id, session_factory, enqueue=enqueue)
+
+    async def flush():
+        reply = await buffer.flush()
+        if reply is None:
+            return None
+        if reply["type"] == "error":
+            logger.error(f"WebSocket ingest for run {run_id}: batch {reply['seq_from']}-{reply['seq_to']} failed: {reply['error']}")
+        elif "executions" in buffer.flushed_kinds and TRADE_RECONSTRUCTION == "incremental" and enqueue is None:
+            asyncio.get_running_loop().run_in_executor(None, rebuild_trades_task, run_id, True)
+        return reply
+
+    try:
+        while True:
+            try:
+                message = await asyncio.wait_for(websocket.receive_json(), timeout=buffer.seconds_until_due())
+            except asyncio.TimeoutError:
+                reply = await flush()
+                if reply is not None:
+                    await websocket.send_json(reply)
+                continue
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                await websocket.send_json({"type": "error", "seq": None, "error": "frame is not valid JSON"})
+                continue
+            for item in (message if isinstance(message, list) else [message]):
+                reply = buffer.accept(item)
+                if reply is not None:
+                    await websocket.send_json(reply)
+            if buffer.due():
+                reply = await flush()
+                if reply is not None:
+                    await websocket.send_json(reply)
+    except WebSocketDisconnect:
+        # Commit what already arrived; the client resends anything it saw no ack for
+        await flush()
+
+def _rebuild_trades(db: Session, run_id: str, incremental: bool) -> int:
+    service = TradeService(db)
+    return service.update_trades_incremental(run_id) if incremental else service.rebuild_trades_for_run(run_id)
+
+def rebuild_trades_task(run_id: str, incremental: bool = False):
     import time
-    # Helper to open a fresh session for the background task
-    db_gen = get_db()
-    db = next(db_gen)
+    if single_writer.enabled and not shard_router.enabled:
+        # Rebuilds commit on their own: run alone on the writer thread, no lock to retry on
+        try:
+            count = single_writer.run(_rebuild_trades, run_id, incremental, isolated=True)
+            logger.info(f"Reconstructed {count} trades for run {run_id}")
+        except Exception as e:
+            logger.error(f"Error rebuilding trades for {run_id}: {e}")
+        return
+
+    # Fresh session for the background task, on the run's shard when sharding
+    db = run_session(run_id)
     
     
     try:
@@ -253,132 +357,86 @@ def rebuild_trades_task(run_id: str):
         
         for attempt in range(max_retries):
             try:
-                service = TradeService(db)
-                count = service.rebuild_trades_for_run(run_id)
+                count = _rebuild_trades(db, run_id, incremental)
                 logger.info(f"Reconstructed {count} trades for run {run_id}")
                 break # Success
             except Exception as e:
                 if "database is locked" in str(e) and attempt < max_retries - 1:
+                    db.rollback()
                     logger.warning(f"Database locked during trade rebuild for {run_id}, retrying ({attempt+1}/{max_retries})...")
                     time.sleep(retry_delay)
                     retry_delay *= 2 # Exponential backoff
                 else:
+                    db.rollback()
                     logger.error(f"Error rebuilding trades for {run_id}: {e}")
                     break
     finally:
         db.close()
 
-async def upsert_execution_logic(db: Session, data: ExecutionCreate):
-    existing = db.query(Execution).filter(Execution.run_id == data.run_id, Execution.execution_id == data.execution_id).first()
-    if existing:
-        existing.order_id = data.order_id
-        existing.exec_utc = data.exec_utc
-        existing.price = data.price
-        existing.quantity = data.quantity
-        existing.fee = data.fee
-        existing.fee_currency = data.fee_currency
-        existing.liquidity = data.liquidity
-        if data.position_impact:
-            existing.position_impact = PositionImpactType(data.position_impact.value)
-        existing.extra_json = data.extra_json
-    else:
-        exec_obj = Execution(
-            run_id=data.run_id,
-            execution_id=data.execution_id,
-            order_id=data.order_id,
-            exec_utc=data.exec_utc,
-            price=data.price,
-            quantity=data.quantity,
-            fee=data.fee,
-            fee_currency=data.fee_currency,
-            liquidity=data.liquidity,
-            position_impact=PositionImpactType(data.position_impact.value) if data.position_impact else PositionImpactType.UNKNOWN,
-            extra_json=data.extra_json
-
-        )
-        db.add(exec_obj)
-        db.flush() # Ensure visible for next iter in batch
-
 @router.post("/event/bar")
-async def on_bar(data: BarCreate, db: Session = Depends(get_db)):
+async def on_bar(data: BarCreate):
+    if ingest_queue.enabled:
+        return await enqueue_ingest([("bars", [data])])
     try:
-        await upsert_bar_logic(db, data)
-        db.commit()
+        await write_inline([("bars", [data])])
         return {"status": "ok"}
     except Exception as e:
-        db.rollback()
         logger.error(f"Error processing bar: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/batch/bars")
-async def on_bars_batch(data: list[BarCreate], db: Session = Depends(get_db)):
+async def on_bars_batch(data: list[BarCreate], idempotency_key: Optional[str] = Header(None)):
+    if (replay := replayed_batch("bars", idempotency_key)) is not None:
+        return replay
+    if ingest_queue.enabled:
+        return await enqueue_ingest([("bars", data)], "bars", idempotency_key)
     try:
-        for item in data:
-            await upsert_bar_logic(db, item)
-        db.commit()
-        return {"status": "ok", "count": len(data)}
+        (result,) = await write_inline([("bars", data)])
+        response = {"status": "ok", "count": len(data), "inserted": result["inserted"], "updated": result["updated"]}
+        batch_keys.put("bars", idempotency_key, response)
+        return response
     except Exception as e:
-        db.rollback()
         logger.error(f"Error processing bar batch: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-async def upsert_bar_logic(db: Session, data: BarCreate):
-    # "Unified Market Data Layer" Logic
-    
-    # 1. Calculate MarketSeries ID (Hash)
-    series_key = f"{data.symbol}_{data.timeframe}_{data.venue}_{data.provider}"
-    series_id = hashlib.md5(series_key.encode()).hexdigest()
-    
-    # 2. Ensure MarketSeries Exists
-    market_series = db.query(MarketSeries).filter(MarketSeries.series_id == series_id).first()
-    if not market_series:
-        market_series = MarketSeries(
-            series_id=series_id,
-            symbol=data.symbol,
-            timeframe=data.timeframe,
-            venue=data.venue,
-            provider=data.provider,
-            created_utc=datetime.utcnow()
-        )
-        db.add(market_series)
-        db.flush() # Flush to make ID available, but don't commit yet if in batch
-
-    # 3. Ensure Run Subscription (Run -> MarketSeries)
-    sub = db.query(RunSubscription).filter(
-        RunSubscription.run_id == data.run_id,
-        RunSubscription.series_id == series_id
-    ).first()
-    
-    if not sub:
-        sub = RunSubscription(run_id=data.run_id, series_id=series_id)
-        db.add(sub)
-        db.flush() # Ensure visible for next iter in batch
-    
-    # 4. Upsert Bar in MarketBar
-    existing = db.query(MarketBar).filter(
-        MarketBar.series_id == series_id,
-        MarketBar.ts_utc == data.ts_utc
-    ).first()
-    
-    if existing:
-        # Update
-        existing.open = data.open
-        existing.high = data.high
-        existing.low = data.low
-        existing.close = data.close
-        existing.volume = data.volume
-        existing.volumetric_json = data.volumetric_json
-    else:
-        new_bar = MarketBar(
-            series_id=series_id,
-            ts_utc=data.ts_utc,
-            open=data.open,
-            high=data.high,
-            low=data.low,
-            close=data.close,
-            volume=data.volume,
-            volumetric_json=data.volumetric_json
+@router.post("/batch/bars/columnar")
+async def on_bars_columnar(request: Request):
+    """
+    Binary bar batch for bulk history loads: a NumPy structured array with a
+    small JSON header, or an Arrow IPC stream (see src.core.columnar_bars).
+    Skips per-bar JSON parsing and pydantic validation entirely.
+    """
+    body = await request.body()
+    try:
+        bars = decode_bars(body, request.headers.get("content-type"))
+    except ColumnarBarError as e:
+        raise HTTPException(status_code=422, detail=str(e))
 
-        )
-        db.add(new_bar)
-        db.flush() # Ensure visible for next iter in batch
+    if ingest_queue.enabled:
+        return await enqueue_ingest([("bar_columns", [bars])])
+    try:
+        (result,) = await write_inline([("bar_columns", [bars])])
+        return {"status": "ok", "count": len(bars), "inserted": result["inserted"], "updated": result["updated"]}
+    except Exception as e:
+        logger.error(f"Error processing columnar bar batch: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/series-cache/status")
+def series_cache_status():
+    """Size and hit/miss counters of the series-identity cache."""
+    return series_cache.stats()
+
+@router.get("/idempotency/status")
+def idempotency_status():
+    """Duplicate rates of the execution replay filter and Idempotency-Key batch cache."""
+    return {"executions": idempotency_filter.stats(), "batch_keys": batch_keys.stats()}
+
+@router.get("/queue/status")
+def ingest_queue_status():
+    """Depth and progress of the write-behind queue (INGEST_MODE=queued)."""
+    return ingest_queue.status()
+
+@router.get("/writer/status")
+def single_writer_status():
+    """Queue depth, grouping and latency of the SQLite single writer (SQLITE_SINGLE_WRITER=on)."""
+    return single_writer.status()
@@ -0,0 +1,54 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from src.database.connection import get_db
+from src.database.models import Execution, MarketSeries, MarketSeriesCoverage, StrategyRun
+from src.database.shards import run_session
+from src.core import coverage
+
+router = APIRouter()
+
+@router.get("/coverage")
+def get_coverage(
+    series_id: Optional[List[str]] = Query(None),
+    symbol: Optional[str] = None,
+    timeframe: Optional[str] = None,
+    run_id: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Coverage of market series from the ingest-time catalog: first/last bar,
+    bar count and gaps. Select by series_id (repeatable) or symbol/timeframe;
+    with run_id, each entry also says whether it covers the run's executions.
+    """
+    query = select(MarketSeriesCoverage, MarketSeries.symbol, MarketSeries.timeframe).join(
+        MarketSeries, MarketSeries.series_id == MarketSeriesCoverage.series_id
+    )
+    if series_id:
+        query = query.where(MarketSeriesCoverage.series_id.in_(series_id))
+    if symbol:
+        query = query.where(MarketSeries.symbol == symbol)
+    if timeframe:
+        query = query.where(MarketSeries.timeframe == timeframe)
+
+    run_range = None
+    if run_id:
+        run = db.get(StrategyRun, run_id)
+        if not run:
+            raise HTTPException(status_code=404, detail="Run not found")
+        # Index range scan on (run_id, exec_utc), in the run's shard when it has one
+        with run_session(run_id, write=False) as run_db:
+            first, last = run_db.execute(
+                select(func.min(Execution.exec_utc), func.max(Execution.exec_utc)).where(Execution.run_id == run_id)
+            ).one()
+        run_range = (first, last) if first is not None else (run.start_utc, run.end_utc or run.start_utc)
+
+    results = []
+    for row, sym, tf in db.execute(query).all():
+        entry = coverage.as_dict(row)
+        entry.update(symbol=sym, timeframe=tf)
+        if run_range:
+            entry["covers_run"] = coverage.covers(row, *run_range)
+        results.append(entry)
+    return results
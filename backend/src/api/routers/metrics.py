@@ -1,12 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from src.database.connection import get_db
+from src.database.shards import get_run_db, shard_router
 from src.services.analytics import StandardAnalyzer
 
 router = APIRouter()
 
 @router.get("/run/{run_id}")
-def get_run_metrics(run_id: str, db: Session = Depends(get_db)):
+def get_run_metrics(run_id: str, db: Session = Depends(get_run_db)):
     """
     Get aggregated metrics (PnL, Drawdown, Equity Curve) for a specific run.
     """
@@ -36,24 +37,20 @@ class CompareRequest(BaseModel):
     run_ids: List[str]
 
 @router.post("/compare")
-def compare_runs(request: CompareRequest, db: Session = Depends(get_db)):
+def compare_runs(request: CompareRequest):
     """
     Get aggregated metrics for multiple runs for comparison.
+    Fans out over the runs (each on its own session / shard) in a thread pool.
     """
-    analyzer = StandardAnalyzer(db)
-    results = []
-    
-    # Optimization: Could change StandardAnalyzer to accept list, 
-    # but individual queries are fine for 2-10 runs.
-    for run_id in request.run_ids:
+    def run_metrics(db: Session, run_id: str) -> dict:
         try:
-            metrics = analyzer.calculate_portfolio_metrics(run_id=run_id)
+            metrics = StandardAnalyzer(db).calculate_portfolio_metrics(run_id=run_id)
             # Add run_id to response for easier mapping frontend-side
             metrics["run_id"] = run_id 
-            results.append(metrics)
+            return metrics
         except Exception as e:
             # Don't fail entire batch, just log/skip
             print(f"Error calculating metrics for {run_id}: {e}")
-            results.append({"run_id": run_id, "error": str(e)})
-            
-    return results
+            return {"run_id": run_id, "error": str(e)}
+
+    return shard_router.fan_out(request.run_ids, run_metrics)
@@ -1,9 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
 from typing import List
-from src.database.connection import get_db
+from src.database.connection import SessionLocal, get_db
 from src.database.models import StrategyRun
 from src.api.schemas import StrategyRunResponse, StartRunRequest
+from src.core.metrics_cache import metrics_cache, run_version
+from src.core.sqlite_writer import single_writer
+from src.database.shards import get_run_db, run_session
 
 router = APIRouter()
 
@@ -38,18 +42,15 @@ def list_runs(skip: int = 0, limit: int = 50, db: Session = Depends(get_db)):
     return runs_data
 
 @router.get("/{run_id}", response_model=StrategyRunResponse)
-def get_run(run_id: str, db: Session = Depends(get_db)):
+def get_run(run_id: str, db: Session = Depends(get_run_db)):
     run = db.query(StrategyRun).filter(StrategyRun.run_id == run_id).first()
     if not run:
         raise HTTPException(status_code=404, detail="Run not found")
 
-    # [NEW] Calculate metrics on the fly using Analytics Service
-    # This aggregates existing trades (fast) vs rebuilding from executions (slow)
-    from src.services.analytics import AnalyticsRouter
+    # Metrics come from the versioned cache: recomputed (and written back to
+    # metrics_json) only when the run's orders, executions or trades changed
     from src.database.models import Strategy
     
-    router = AnalyticsRouter(db)
-    
     # Determine strategy type
     strategy_type = 'DEFAULT'
     if run.instance and run.instance.strategy_id:
@@ -58,15 +59,31 @@ def get_run(run_id: str, db: Session = Depends(get_db)):
         sType = getattr(strategy, 'type', None)
         if strategy and sType:
             strategy_type = sType
-            
-    # Calculate and update
-    metrics = router.route_analysis(run_id=run_id, strategy_type=strategy_type)
-    run.metrics_json = metrics
-    db.commit()
-    db.refresh(run)
 
+    metrics = metrics_cache.get(
+        ("run", run_id, strategy_type), run_version(db, run_id),
+        lambda: _compute_run_metrics(run_id, strategy_type)
+    )
+    # Already stored by the computation: keep the request session clean
+    set_committed_value(run, "metrics_json", metrics)
     return run
 
+def _compute_run_metrics(run_id: str, strategy_type: str) -> dict:
+    from src.services.analytics import AnalyticsRouter
+
+    with run_session(run_id, write=False) as db:
+        metrics = AnalyticsRouter(db).route_analysis(run_id=run_id, strategy_type=strategy_type)
+    if single_writer.enabled:
+        single_writer.run(_store_run_metrics, run_id, metrics)
+    else:
+        with SessionLocal() as db:
+            _store_run_metrics(db, run_id, metrics)
+            db.commit()
+    return metrics
+
+def _store_run_metrics(db: Session, run_id: str, metrics: dict):
+    db.query(StrategyRun).filter(StrategyRun.run_id == run_id).update({StrategyRun.metrics_json: metrics})
+
 @router.get("/instance/{instance_id}", response_model=List[StrategyRunResponse])
 def get_runs_by_instance(instance_id: str, db: Session = Depends(get_db)):
     return db.query(StrategyRun).filter(StrategyRun.instance_id == instance_id).all()
@@ -137,7 +154,7 @@ def start_run(request: StartRunRequest, db: Session = Depends(get_db)):
     return run
 
 @router.get("/{run_id}/trades", response_model=List[dict])
-def get_run_trades(run_id: str, db: Session = Depends(get_db)):
+def get_run_trades(run_id: str, db: Session = Depends(get_run_db)):
     """
     Returns the list of trades for a run.
     Prioritizes persistent 'trades' table. Fallback to on-the-fly reconstruction.
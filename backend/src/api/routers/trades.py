@@ -3,6 +3,9 @@ from sqlalchemy.orm import Session
 from typing import List, Optional
 from src.database.connection import get_db
 from src.database.models import Trade
+from src.core.metrics_cache import metrics_cache, run_version, strategy_version
+from src.core.sqlite_writer import single_writer
+from src.database.shards import get_run_db, run_session, shard_router
 from pydantic import BaseModel
 from datetime import datetime
 
@@ -48,8 +51,25 @@ def read_trades(
     strategy_id: Optional[str] = None, 
     run_id: Optional[str] = None,
     symbol: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_run_db)
 ):
+    if shard_router.enabled and not run_id:
+        # Trades live in per-run shards: fan out over the matching runs
+        from src.database.models import StrategyRun, StrategyInstance
+        runs = db.query(StrategyRun.run_id)
+        if strategy_id:
+            runs = runs.join(StrategyInstance, StrategyRun.instance_id == StrategyInstance.instance_id)\
+                       .filter(StrategyInstance.strategy_id == strategy_id)
+
+        def run_trades(run_db: Session, rid: str):
+            query = run_db.query(Trade).filter(Trade.run_id == rid)
+            if symbol:
+                query = query.filter(Trade.symbol == symbol)
+            return query.limit(skip + limit).all()
+
+        trades = [t for chunk in shard_router.fan_out([r for (r,) in runs.all()], run_trades) for t in chunk]
+        return [TradeResponse.model_validate(t) for t in trades[skip:skip + limit]]
+
     query = db.query(Trade)
     
     if strategy_id:
@@ -66,12 +86,9 @@ def read_trades(
     return [TradeResponse.model_validate(t) for t in trades]
 
 @router.get("/stats")
-def get_stats(strategy_id: str, run_id: Optional[str] = None, db: Session = Depends(get_db)):
-    from src.services.analytics import AnalyticsRouter
+def get_stats(strategy_id: str, run_id: Optional[str] = None, db: Session = Depends(get_run_db)):
     from src.database.models import Strategy
     
-    router = AnalyticsRouter(db)
-    
     # Determine strategy type
     strategy_type = 'DEFAULT'
     if strategy_id:
@@ -79,17 +96,41 @@ def get_stats(strategy_id: str, run_id: Optional[str] = None, db: Session = Depe
         sType = getattr(strat, 'type', None)
         if strat and sType:
             strategy_type = sType
-            
-    return router.route_analysis(strategy_id=strategy_id, run_id=run_id, strategy_type=strategy_type)
+
+    # Cached per run (or per strategy: its runs and their versions) until the data changes
+    version = run_version(db, run_id) if run_id else strategy_version(db, strategy_id)
+    return metrics_cache.get(
+        ("stats", strategy_id, run_id, strategy_type), version,
+        lambda: _compute_stats(strategy_id, run_id, strategy_type)
+    )
+
+def _compute_stats(strategy_id: str, run_id: Optional[str], strategy_type: str) -> dict:
+    from src.services.analytics import AnalyticsRouter
+
+    with run_session(run_id, write=False) as db:
+        return AnalyticsRouter(db).route_analysis(strategy_id=strategy_id, run_id=run_id, strategy_type=strategy_type)
 
 @router.get("/{trade_id}", response_model=TradeResponse)
 def read_trade(trade_id: str, db: Session = Depends(get_db)):
     from src.database.models import StrategyRun, StrategyInstance
     
     trade = db.query(Trade).filter(Trade.trade_id == trade_id).first()
+    if not trade and shard_router.enabled:
+        # Not in the central tables: find the run shard holding it
+        def owner(run_db: Session, rid: str):
+            found = run_db.query(Trade.trade_id).filter(Trade.run_id == rid, Trade.trade_id == trade_id).first()
+            return rid if found else None
+
+        owners = shard_router.fan_out([r for (r,) in db.query(StrategyRun.run_id).all()], owner)
+        rid = next((r for r in owners if r), None)
+        if rid:
+            with run_session(rid, write=False) as run_db:
+                return _trade_response(run_db.query(Trade).filter(Trade.trade_id == trade_id).first())
     if not trade:
         raise HTTPException(status_code=404, detail="Trade not found")
-        
+    return _trade_response(trade)
+
+def _trade_response(trade: Trade) -> TradeResponse:
     # Manually attach timeframe from relations if available
     # Trade -> Run -> Instance -> Timeframe
     tf = None
@@ -111,12 +152,15 @@ def read_trade(trade_id: str, db: Session = Depends(get_db)):
     return TradeResponse(**resp_data)
 
 @router.post("/rebuild/{run_id}")
-def rebuild_trades(run_id: str, db: Session = Depends(get_db)):
+def rebuild_trades(run_id: str, db: Session = Depends(get_run_db)):
     from src.core.trade_service import TradeService
     
     try:
-        service = TradeService(db)
-        count = service.rebuild_trades_for_run(run_id)
+        if single_writer.enabled and not shard_router.enabled:
+            # Commits on its own: runs alone on the writer thread
+            count = single_writer.run(lambda w: TradeService(w).rebuild_trades_for_run(run_id), isolated=True)
+        else:
+            count = TradeService(db).rebuild_trades_for_run(run_id)
         return {"status": "ok", "message": f"Rebuilt {count} trades", "count": count}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
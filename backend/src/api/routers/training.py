@@ -1,13 +1,13 @@
 import httpx
 from fastapi import APIRouter, HTTPException, BackgroundTasks, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
 import os
 import pandas as pd
 import json
 
-from src.database.connection import get_db
+from src.database.connection import get_async_db
 from src.database.models import StrategyRun, StrategyInstance, MarketSeries, MarketBar, MlIteration, MlTrainingSession, MlTrainingProcess, MlModelArchitecture, Dataset
 from src.training_node.job_manager import job_manager
 
@@ -38,12 +38,12 @@ class StartTrainingRequest(BaseModel):
     training_params: TrainingConfig
 
 @router.post("/start")
-async def start_training(request: StartTrainingRequest, db: Session = Depends(get_db)):
+async def start_training(request: StartTrainingRequest, db: AsyncSession = Depends(get_async_db)):
     """
     Starts a training job using the local JobManager (Multiprocessing).
     """
     # 1. Validation
-    dataset = db.query(Dataset).get(request.dataset_id)
+    dataset = await db.get(Dataset, request.dataset_id)
     if not dataset:
         raise HTTPException(status_code=404, detail="Dataset not found")
 
@@ -95,7 +95,7 @@ async def start_training(request: StartTrainingRequest, db: Session = Depends(ge
         start_utc=pd.Timestamp.utcnow()
     )
     db.add(iteration)
-    db.commit()
+    await db.commit()
     
     # 3. Start Job via Manager
     try:
@@ -107,9 +107,9 @@ async def start_training(request: StartTrainingRequest, db: Session = Depends(ge
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/status/{job_id}")
-async def check_status(job_id: str, db: Session = Depends(get_db)):
+async def check_status(job_id: str, db: AsyncSession = Depends(get_async_db)):
     # Check DB first for truth
-    iteration = db.query(MlIteration).get(job_id)
+    iteration = await db.get(MlIteration, job_id)
     if not iteration:
         raise HTTPException(status_code=404, detail="Job not found")
         
@@ -131,15 +131,15 @@ async def check_status(job_id: str, db: Session = Depends(get_db)):
     }
 
 @router.post("/stop/{job_id}")
-async def stop_training(job_id: str, db: Session = Depends(get_db)):
+async def stop_training(job_id: str, db: AsyncSession = Depends(get_async_db)):
     # 1. Check DB
-    iteration = db.query(MlIteration).get(job_id)
+    iteration = await db.get(MlIteration, job_id)
     if not iteration:
         raise HTTPException(status_code=404, detail="Job not found")
         
     # 2. Update DB to help runner exit gracefully
     iteration.status = "CANCELLING"
-    db.commit()
+    await db.commit()
     
     # 3. Force Kill via Manager
     was_running = job_manager.stop_job(job_id)
@@ -0,0 +1,297 @@
+"""
+Parquet cold tier for market_bars.
+
+Closed months of a series are moved out of SQL into one Parquet file per
+month:
+
+    {BAR_ARCHIVE_DIR}/{series_id}/{year}/{month:02d}.parquet
+
+BAR_ARCHIVE_DIR defaults to `<database file>.archive` next to a SQLite
+database, so the archive does not depend on the working directory.
+
+Readers go through `read_series`, which prunes month files by the requested
+time range, pushes the range down to the Parquet row groups and merges the
+result with the rows still in SQL. SQL wins on duplicate timestamps, so bars
+re-ingested into an archived month are visible immediately and are folded
+into the file by the next tiering run.
+
+Tiering (the most recent BAR_HOT_MONTHS months, the current one included,
+stay in SQL):
+
+    python -m src.core.bar_archive [--series SERIES_ID ...] [--hot-months 1] [--vacuum]
+
+Requires pyarrow.
+"""
+import argparse
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+from sqlalchemy import select, delete, func
+from sqlalchemy.orm import Session
+
+from src.core.bulk_writer import to_utc_naive
+from src.database.connection import DATABASE_URL
+from src.database.models import MarketBar
+from src.database.time_columns import raw_time, time_array
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+
+
+def _default_root() -> str:
+    explicit = os.getenv("BAR_ARCHIVE_DIR")
+    if explicit:
+        return explicit
+    if DATABASE_URL.startswith("sqlite:///") and DATABASE_URL != "sqlite:///:memory:":
+        return DATABASE_URL[len("sqlite:///"):] + ".archive"
+    return "bar_archive"
+
+
+ARCHIVE_DIR = _default_root()
+HOT_MONTHS = int(os.getenv("BAR_HOT_MONTHS", "1"))
+ROW_GROUP_SIZE = 50000
+DELETE_CHUNK = 500  # bound parameters per DELETE ... IN (...)
+
+VALUE_COLUMNS = ("open", "high", "low", "close", "volume")
+COLUMNS = ("ts_utc",) + VALUE_COLUMNS + ("volumetric_json",)
+
+
+def _schema():
+    return pa.schema(
+        [("ts_utc", pa.timestamp("us"))]
+        + [(col, pa.float64()) for col in VALUE_COLUMNS]
+        + [("volumetric_json", pa.string())]
+    )
+
+
+def _root(root: Optional[str]) -> str:
+    return root or ARCHIVE_DIR
+
+
+def _add_months(year: int, month: int, n: int) -> Tuple[int, int]:
+    index = year * 12 + (month - 1) + n
+    return index // 12, index % 12 + 1
+
+
+def _month_bounds(year: int, month: int) -> Tuple[datetime, datetime]:
+    next_year, next_month = _add_months(year, month, 1)
+    return datetime(year, month, 1), datetime(next_year, next_month, 1)
+
+
+def month_path(series_id: str, year: int, month: int, root: Optional[str] = None) -> str:
+    return os.path.join(_root(root), series_id, f"{year:04d}", f"{month:02d}.parquet")
+
+
+def archived_months(series_id: str, root: Optional[str] = None) -> List[Tuple[int, int]]:
+    """(year, month) of the series' archive files, oldest first."""
+    series_dir = os.path.join(_root(root), series_id)
+    if not os.path.isdir(series_dir):
+        return []
+    months = []
+    for year in os.listdir(series_dir):
+        year_dir = os.path.join(series_dir, year)
+        if not (year.isdigit() and os.path.isdir(year_dir)):
+            continue
+        for name in os.listdir(year_dir):
+            if name.endswith(".parquet") and name[:-8].isdigit():
+                months.append((int(year), int(name[:-8])))
+    return sorted(months)
+
+
+def has_archive(series_id: str, root: Optional[str] = None) -> bool:
+    return bool(archived_months(series_id, root))
+
+
+# --- Reads ---
+
+def _empty_frame() -> pd.DataFrame:
+    frame = pd.DataFrame({col: pd.Series(dtype="float64") for col in COLUMNS})
+    frame["ts_utc"] = pd.Series(dtype="datetime64[ns]")
+    frame["volumetric_json"] = pd.Series(dtype="object")
+    return frame
+
+
+def read_cold(series_id: str, start: Optional[datetime] = None, end: Optional[datetime] = None,
+              root: Optional[str] = None) -> pd.DataFrame:
+    """Archived bars of a series in [start, end], in time order."""
+    start = to_utc_naive(start) if start else None
+    end = to_utc_naive(end) if end else None
+    filters = []
+    if start:
+        filters.append(("ts_utc", ">=", pd.Timestamp(start)))
+    if end:
+        filters.append(("ts_utc", "<=", pd.Timestamp(end)))
+
+    tables = []
+    for year, month in archived_months(series_id, root):
+        month_start, month_end = _month_bounds(year, month)
+        # Partition pruning: skip files entirely outside the range
+        if (start and month_end <= start) or (end and month_start > end):
+            continue
+        tables.append(pq.read_table(month_path(series_id, year, month, root), filters=filters or None))
+    if not tables:
+        return _empty_frame()
+    frame = pa.concat_tables(tables).to_pandas()
+    frame["ts_utc"] = frame["ts_utc"].astype("datetime64[ns]")
+    if frame["volumetric_json"].notna().any():
+        frame["volumetric_json"] = [None if v is None else json.loads(v) for v in frame["volumetric_json"]]
+    return frame
+
+
+def read_hot(db: Session, series_id: str, start: Optional[datetime] = None, end: Optional[datetime] = None,
+             limit: Optional[int] = None) -> pd.DataFrame:
+    query = select(raw_time(MarketBar.ts_utc), *(getattr(MarketBar, col) for col in COLUMNS[1:])).where(
+        MarketBar.series_id == series_id
+    )
+    if start:
+        query = query.where(MarketBar.ts_utc >= to_utc_naive(start))
+    if end:
+        query = query.where(MarketBar.ts_utc <= to_utc_naive(end))
+    query = query.order_by(MarketBar.ts_utc.asc())
+    if limit:
+        query = query.limit(limit)
+    rows = db.execute(query).all()
+    if not rows:
+        return _empty_frame()
+    frame = pd.DataFrame(rows, columns=list(COLUMNS))
+    frame["ts_utc"] = time_array(frame["ts_utc"].to_numpy(), MarketBar.ts_utc)
+    return frame
+
+
+def read_series(db: Session, series_id: str, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                limit: Optional[int] = None, root: Optional[str] = None) -> pd.DataFrame:
+    """
+    Bars of a market series in [start, end] from both tiers, in time order,
+    with columns ts_utc, open, high, low, close, volume, volumetric_json.
+    """
+    hot = read_hot(db, series_id, start, end, limit)
+    if pq is None or not has_archive(series_id, root):
+        return hot
+    cold = read_cold(series_id, start, end, root)
+    if limit:
+        cold = cold.head(limit)
+    if cold.empty:
+        return hot
+    merged = pd.concat([cold, hot], ignore_index=True) if not hot.empty else cold
+    merged = merged.drop_duplicates(subset="ts_utc", keep="last").sort_values("ts_utc", kind="stable")
+    if limit:
+        merged = merged.head(limit)
+    return merged.reset_index(drop=True)
+
+
+# --- Tiering ---
+
+def _write_month(series_id: str, year: int, month: int, frame: pd.DataFrame, root: Optional[str]):
+    path = month_path(series_id, year, month, root)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    table = pa.Table.from_pandas(frame[list(COLUMNS)], schema=_schema(), preserve_index=False)
+    tmp = path + ".tmp"
+    pq.write_table(table, tmp, row_group_size=ROW_GROUP_SIZE, compression="zstd")
+    os.replace(tmp, path)
+
+
+def archive_month(db: Session, series_id: str, year: int, month: int, root: Optional[str] = None) -> int:
+    """
+    Moves one month of a series from SQL into its Parquet file (merged with
+    what the file already holds) and deletes the rows. Commits. Returns the
+    number of rows moved.
+    """
+    month_start, month_end = _month_bounds(year, month)
+    hot = read_hot(db, series_id, month_start, month_end - timedelta(microseconds=1))
+    if hot.empty:
+        return 0
+    moved = len(hot)
+    moved_ts = list(hot["ts_utc"].dt.to_pydatetime())
+    hot["volumetric_json"] = [None if v is None else (v if isinstance(v, str) else json.dumps(v))
+                              for v in hot["volumetric_json"]]
+
+    path = month_path(series_id, year, month, root)
+    if os.path.exists(path):
+        existing = pq.read_table(path).to_pandas()
+        existing["ts_utc"] = existing["ts_utc"].astype("datetime64[ns]")
+        hot = pd.concat([existing, hot], ignore_index=True).drop_duplicates(subset="ts_utc", keep="last")
+    _write_month(series_id, year, month, hot.sort_values("ts_utc", kind="stable"), root)
+
+    # The file is in place before the rows go: readers see a bar in both tiers, never in neither.
+    # Only the bars that were read are deleted; one upserted meanwhile stays hot for the next run.
+    try:
+        for i in range(0, moved, DELETE_CHUNK):
+            db.execute(delete(MarketBar).where(
+                MarketBar.series_id == series_id,
+                MarketBar.ts_utc.in_(moved_ts[i:i + DELETE_CHUNK])
+            ))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return moved
+
+
+def archive_closed_months(db: Session, hot_months: int = HOT_MONTHS, now: Optional[datetime] = None,
+                          series_ids: Optional[Iterable[str]] = None, root: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Archives every month older than the `hot_months` most recent ones, per series."""
+    if pq is None:
+        raise RuntimeError("The Parquet bar archive requires pyarrow, which is not installed")
+    now = now or datetime.utcnow()
+    cutoff = datetime(*_add_months(now.year, now.month, -(max(hot_months, 1) - 1)), 1)
+
+    if series_ids is None:
+        series_ids = db.execute(
+            select(MarketBar.series_id).where(MarketBar.ts_utc < cutoff).distinct()
+        ).scalars().all()
+
+    results = []
+    for series_id in series_ids:
+        first = db.execute(
+            select(func.min(MarketBar.ts_utc)).where(MarketBar.series_id == series_id, MarketBar.ts_utc < cutoff)
+        ).scalar()
+        if first is None:
+            continue
+        first = pd.Timestamp(first)
+        year, month = first.year, first.month
+        moved = {}
+        while datetime(year, month, 1) < cutoff:
+            rows = archive_month(db, series_id, year, month, root)
+            if rows:
+                moved[f"{year:04d}-{month:02d}"] = rows
+            year, month = _add_months(year, month, 1)
+        results.append({"series_id": series_id, "months": moved, "rows": sum(moved.values())})
+        logger.info(f"Archived {sum(moved.values())} bars of series {series_id} into {len(moved)} month files")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move closed months of market_bars into the Parquet archive")
+    parser.add_argument("--series", action="append", default=None, help="Series id to archive (repeatable, default all)")
+    parser.add_argument("--hot-months", type=int, default=HOT_MONTHS, help="Recent months kept in SQL, current included")
+    parser.add_argument("--root", default=None, help=f"Archive directory (default {ARCHIVE_DIR})")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM the SQLite file afterwards")
+    args = parser.parse_args()
+
+    from src.database.connection import SessionLocal, engine, init_db
+    init_db()
+    db = SessionLocal()
+    try:
+        for result in archive_closed_months(db, hot_months=args.hot_months, series_ids=args.series, root=args.root):
+            print(json.dumps(result))
+    finally:
+        db.close()
+    if args.vacuum and engine.dialect.name == "sqlite":
+        with engine.connect() as conn:
+            conn.exec_driver_sql("VACUUM")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()
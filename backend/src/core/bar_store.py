@@ -0,0 +1,352 @@
+"""
+Memory-mapped columnar store for hot market series.
+
+Each series is kept as flat binary columns, one file per field:
+
+    {BAR_STORE_DIR}/{series_id}/g{generation}/ts.bin       int64 epoch-ns
+    {BAR_STORE_DIR}/{series_id}/g{generation}/open.bin     float64 (high, low, close, volume alike)
+    {BAR_STORE_DIR}/{series_id}/meta.json                  {"generation": g, "count": n}
+
+Readers map the files read-only and get zero-copy NumPy views of a time range
+via binary search on ts, so API workers and training processes share one
+page-cached copy of a series instead of decoding it from SQL each time.
+
+A series enters the store the first time it is read (built from SQL plus the
+Parquet archive). From then on bar ingest keeps it current: bars written by
+the bulk writers are staged on the session and applied when it commits, as
+a plain file append when they are newer than the stored tail, otherwise by
+writing a merged new generation. Writers serialize per series across
+processes (flock on POSIX, msvcrt.locking on Windows). A build reads through
+its own session, inside the series lock, so it sees every commit whose
+append found no store yet.
+
+On by default where flock exists (BAR_STORE=on|off overrides). Windows keeps
+it off unless asked for: generations still mapped by a reader cannot be
+deleted there and are only swept later. When off, the readers fall back to
+SQL/Parquet.
+"""
+import json
+import logging
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("BAR_STORE", "on" if fcntl is not None else "off").lower() not in ("off", "0", "false")
+
+FIELDS = ("open", "high", "low", "close", "volume")
+_PENDING_KEY = "bar_store_pending"
+
+
+def _default_root() -> str:
+    explicit = os.getenv("BAR_STORE_DIR")
+    if explicit:
+        return explicit
+    # Next to a SQLite file, so every database gets its own store
+    from src.database.connection import DATABASE_URL
+    if DATABASE_URL.startswith("sqlite:///") and DATABASE_URL != "sqlite:///:memory:":
+        return DATABASE_URL[len("sqlite:///"):] + ".barstore"
+    return "bar_store"
+
+
+class SeriesView:
+    """Time range of a stored series: read-only views into the mapped files."""
+
+    def __init__(self, ts: np.ndarray, columns: Dict[str, np.ndarray]):
+        self.ts = ts
+        self.columns = columns
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+    def __getitem__(self, field: str) -> np.ndarray:
+        return self.columns[field]
+
+    def to_frame(self) -> pd.DataFrame:
+        frame = pd.DataFrame({field: self.columns[field] for field in FIELDS})
+        frame.insert(0, "ts_utc", self.ts.view("datetime64[ns]"))
+        return frame
+
+
+def _dedupe_last(ts: np.ndarray, values: Dict[str, np.ndarray]) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """Sorts by ts keeping the last occurrence of duplicate timestamps."""
+    _, first_in_reversed = np.unique(ts[::-1], return_index=True)
+    keep = len(ts) - 1 - first_in_reversed
+    return ts[keep], {f: values[f][keep] for f in FIELDS}
+
+
+class BarStore:
+    def __init__(self, root: Optional[str] = None):
+        self._root = root
+        self._maps: Dict[str, Tuple[Tuple[int, int], np.ndarray, Dict[str, np.ndarray]]] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._guard = threading.Lock()
+
+    @property
+    def root(self) -> str:
+        if self._root is None:
+            self._root = _default_root()
+        return self._root
+
+    # --- Layout ---
+
+    def _series_dir(self, series_id: str) -> str:
+        return os.path.join(self.root, series_id)
+
+    def _gen_dir(self, series_id: str, generation: int) -> str:
+        return os.path.join(self._series_dir(series_id), f"g{generation}")
+
+    def _read_meta(self, series_id: str) -> Optional[Dict[str, int]]:
+        try:
+            with open(os.path.join(self._series_dir(series_id), "meta.json")) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _write_meta(self, series_id: str, meta: Dict[str, int]):
+        path = os.path.join(self._series_dir(series_id), "meta.json")
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, path)
+
+    @contextmanager
+    def _locked(self, series_id: str):
+        with self._guard:
+            lock = self._locks.setdefault(series_id, threading.Lock())
+        with lock:
+            os.makedirs(self._series_dir(series_id), exist_ok=True)
+            with open(os.path.join(self._series_dir(series_id), ".lock"), "a+") as handle:
+                _lock_file(handle)
+                try:
+                    yield
+                finally:
+                    _unlock_file(handle)
+
+    def exists(self, series_id: str) -> bool:
+        return self._read_meta(series_id) is not None
+
+    # --- Reads ---
+
+    def _mapped(self, series_id: str):
+        meta = self._read_meta(series_id)
+        if meta is None:
+            return None
+        key = (meta["generation"], meta["count"])
+        cached = self._maps.get(series_id)
+        if cached is not None and cached[0] == key:
+            return cached
+        count = meta["count"]
+        gen_dir = self._gen_dir(series_id, meta["generation"])
+        if count == 0:
+            ts = np.empty(0, dtype="int64")
+            columns = {f: np.empty(0, dtype="float64") for f in FIELDS}
+        else:
+            ts = np.memmap(os.path.join(gen_dir, "ts.bin"), dtype="int64", mode="r", shape=(count,))
+            columns = {f: np.memmap(os.path.join(gen_dir, f"{f}.bin"), dtype="float64", mode="r", shape=(count,))
+                       for f in FIELDS}
+        cached = (key, ts, columns)
+        self._maps[series_id] = cached
+        return cached
+
+    def read(self, series_id: str, start=None, end=None) -> Optional[SeriesView]:
+        """Zero-copy view of [start, end] (datetimes, inclusive), or None if the series is not stored."""
+        mapped = self._mapped(series_id)
+        if mapped is None:
+            return None
+        _, ts, columns = mapped
+        lo = 0 if start is None else int(np.searchsorted(ts, _to_ns(start), side="left"))
+        hi = len(ts) if end is None else int(np.searchsorted(ts, _to_ns(end), side="right"))
+        return SeriesView(ts[lo:hi], {f: columns[f][lo:hi] for f in FIELDS})
+
+    def load(self, db: Session, series_id: str, start=None, end=None) -> SeriesView:
+        """Like `read`, building the series from the database first if it is not stored yet."""
+        view = self.read(series_id, start, end)
+        if view is None:
+            self.build(db, series_id)
+            view = self.read(series_id, start, end)
+        return view
+
+    # --- Writes ---
+
+    def _write_generation(self, series_id: str, generation: int, ts: np.ndarray, values: Dict[str, np.ndarray]):
+        gen_dir = self._gen_dir(series_id, generation)
+        os.makedirs(gen_dir, exist_ok=True)
+        np.ascontiguousarray(ts, dtype="int64").tofile(os.path.join(gen_dir, "ts.bin"))
+        for f in FIELDS:
+            np.ascontiguousarray(values[f], dtype="float64").tofile(os.path.join(gen_dir, f"{f}.bin"))
+
+    def _replace(self, series_id: str, ts: np.ndarray, values: Dict[str, np.ndarray], meta: Optional[Dict[str, int]]):
+        generation = (meta["generation"] + 1) if meta else 1
+        self._write_generation(series_id, generation, ts, values)
+        self._write_meta(series_id, {"generation": generation, "count": len(ts)})
+        self._maps.pop(series_id, None)
+        self._sweep(series_id, generation)
+
+    def _sweep(self, series_id: str, current: int):
+        """
+        Deletes the generations before `current`. Open maps stay valid on
+        POSIX; on Windows a still-mapped generation survives and is retried
+        by the next sweep.
+        """
+        series_dir = self._series_dir(series_id)
+        for name in os.listdir(series_dir):
+            if name.startswith("g") and name[1:].isdigit() and int(name[1:]) < current:
+                shutil.rmtree(os.path.join(series_dir, name), ignore_errors=True)
+
+    def build(self, db: Session, series_id: str):
+        """
+        (Re)builds a series from SQL plus the Parquet archive. Reads through a
+        new session on the same database, opened under the series lock: the
+        caller's transaction may predate commits whose append found no store.
+        """
+        from src.core import bar_archive
+        from src.database.models import MarketBar
+        with self._locked(series_id):
+            fresh = Session(bind=db.get_bind(MarketBar), autoflush=False)
+            try:
+                frame = bar_archive.read_series(fresh, series_id)
+            finally:
+                fresh.close()
+            ts = frame["ts_utc"].to_numpy(dtype="datetime64[ns]").view("int64")
+            values = {f: frame[f].to_numpy(dtype="float64", na_value=np.nan) for f in FIELDS}
+            self._replace(series_id, ts, values, self._read_meta(series_id))
+
+    def append(self, series_id: str, ts: np.ndarray, values: Dict[str, np.ndarray]) -> bool:
+        """
+        Applies new or updated bars (int64 epoch-ns ts) to a stored series.
+        Returns False if the series is not stored (nothing to keep current).
+        """
+        with self._locked(series_id):
+            meta = self._read_meta(series_id)
+            if meta is None:
+                return False
+            ts, values = _dedupe_last(np.asarray(ts, dtype="int64"), values)
+            mapped = self._mapped(series_id)
+            _, old_ts, old_columns = mapped
+            if len(old_ts) == 0 or ts[0] > old_ts[-1]:
+                # Tail append: extend the files in place, then publish the new count
+                gen_dir = self._gen_dir(series_id, meta["generation"])
+                os.makedirs(gen_dir, exist_ok=True)
+                _append_column(os.path.join(gen_dir, "ts.bin"), meta["count"], ts.astype("int64", copy=False))
+                for field in FIELDS:
+                    _append_column(os.path.join(gen_dir, f"{field}.bin"), meta["count"],
+                                   np.asarray(values[field], dtype="float64"))
+                self._write_meta(series_id, {"generation": meta["generation"], "count": meta["count"] + len(ts)})
+            else:
+                merged_ts = np.concatenate([np.asarray(old_ts), ts])
+                merged = {f: np.concatenate([np.asarray(old_columns[f]), values[f]]) for f in FIELDS}
+                merged_ts, merged = _dedupe_last(merged_ts, merged)
+                self._replace(series_id, merged_ts, merged, meta)
+            return True
+
+    def drop(self, series_id: str):
+        self._maps.pop(series_id, None)
+        shutil.rmtree(self._series_dir(series_id), ignore_errors=True)
+
+    # --- Ingest hook ---
+
+    def stage(self, db: Session, series_id: str, rows: List[Tuple]):
+        """Queues bar rows (BAR_COLUMNS layout) written in the session's transaction."""
+        if not ENABLED or not rows:
+            return
+        pending = db.info.setdefault(_PENDING_KEY, {})
+        pending.setdefault(series_id, []).extend(rows)
+
+    def apply_pending(self, pending: Dict[str, List[Tuple]]):
+        for series_id, rows in pending.items():
+            try:
+                ts = np.array([row[0] for row in rows], dtype="datetime64[ns]").view("int64")
+                values = {f: np.array([row[i + 1] for row in rows], dtype="float64") for i, f in enumerate(FIELDS)}
+                self.append(series_id, ts, values)
+            except Exception as e:
+                # The data is committed in SQL: drop the stale copy, the next read rebuilds it
+                logger.error(f"Bar store update of series {series_id} failed, dropping it: {e}")
+                self.drop(series_id)
+
+
+def _lock_file(handle):
+    """Exclusive cross-process lock on an open file (blocks until granted)."""
+    if fcntl is not None:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+    elif msvcrt is not None:
+        handle.seek(0)
+        while True:
+            try:
+                msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)  # itself retries for ~10s
+                return
+            except OSError:
+                continue
+
+
+def _unlock_file(handle):
+    if fcntl is not None:
+        fcntl.flock(handle, fcntl.LOCK_UN)
+    elif msvcrt is not None:
+        handle.seek(0)
+        msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _append_column(path: str, count: int, values: np.ndarray):
+    """
+    Writes `values` right after the first `count` stored items. Bytes past
+    them (an append whose meta update never happened) are cut off first.
+    """
+    with open(path, "r+b" if os.path.exists(path) else "w+b") as f:
+        size = count * values.itemsize
+        if os.fstat(f.fileno()).st_size < size:
+            raise ValueError(f"{path} holds fewer than {count} items")
+        f.truncate(size)
+        f.seek(size)
+        f.write(values.tobytes())
+
+
+def _to_ns(value) -> int:
+    stamp = pd.Timestamp(value)
+    if stamp.tzinfo is not None:
+        stamp = stamp.tz_convert("UTC").tz_localize(None)
+    return stamp.as_unit("ns").value
+
+
+def read_frame(db: Session, series_id: str, start=None, end=None) -> pd.DataFrame:
+    """
+    Bars of a market series as a DataFrame (ts_utc, OHLCV): from the mapped
+    store when enabled, otherwise from SQL plus the Parquet archive.
+    """
+    if ENABLED:
+        return bar_store.load(db, series_id, start, end).to_frame()
+    from src.core import bar_archive
+    return bar_archive.read_series(db, series_id, start, end)[["ts_utc", *FIELDS]]
+
+
+def _on_commit(session: Session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending:
+        bar_store.apply_pending(pending)
+
+
+def _on_rollback(session: Session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+bar_store = BarStore()
+
+event.listen(Session, "after_commit", _on_commit)
+event.listen(Session, "after_rollback", _on_rollback)
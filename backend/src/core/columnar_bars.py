@@ -0,0 +1,172 @@
+"""
+Columnar bar payloads for /api/ingest/batch/bars/columnar.
+
+Two wire formats are accepted:
+
+* NumPy (Content-Type: application/x-numpy-bars)
+      uint32 little-endian header length
+      UTF-8 JSON header {"run_id", "symbol", "timeframe", "venue", "provider"}
+      .npy structured array with fields ts (int64 epoch-ns or datetime64),
+      open, high, low, close, volume
+* Arrow IPC stream (Content-Type: application/vnd.apache.arrow.stream)
+      one table with the same columns; the header fields travel as schema
+      metadata. Requires pyarrow.
+
+Decoding and validation are vectorized: no per-bar Python objects are built
+before the rows reach the bulk writer.
+"""
+import io
+import json
+import struct
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+NUMPY_CONTENT_TYPE = "application/x-numpy-bars"
+ARROW_CONTENT_TYPE = "application/vnd.apache.arrow.stream"
+
+HEADER_FIELDS = ("run_id", "symbol", "timeframe", "venue", "provider")
+VALUE_FIELDS = ("open", "high", "low", "close", "volume")
+
+BAR_DTYPE = np.dtype([
+    ("ts", "<i8"),
+    ("open", "<f8"), ("high", "<f8"), ("low", "<f8"), ("close", "<f8"), ("volume", "<f8"),
+])
+
+
+class ColumnarBarError(ValueError):
+    """Payload could not be decoded or failed validation."""
+
+
+class ColumnarBars:
+    """Header plus one contiguous array per column; `ts` is datetime64[ns]."""
+
+    def __init__(self, header: Dict[str, Any], ts: np.ndarray, values: Dict[str, np.ndarray]):
+        self.header = header
+        self.ts = ts
+        self.values = values
+
+    def __len__(self):
+        return len(self.ts)
+
+    @property
+    def run_id(self) -> str:
+        return self.header["run_id"]
+
+    def series_definition(self):
+        return (
+            self.header["symbol"], self.header["timeframe"],
+            self.header.get("venue") or "Unknown", self.header.get("provider") or "Unknown",
+        )
+
+
+def _check_header(header: Dict[str, Any]) -> Dict[str, Any]:
+    missing = [f for f in ("run_id", "symbol", "timeframe") if not header.get(f)]
+    if missing:
+        raise ColumnarBarError(f"Header is missing required fields: {missing}")
+    return {f: header.get(f) for f in HEADER_FIELDS}
+
+
+def _as_datetime64(ts: np.ndarray) -> np.ndarray:
+    if np.issubdtype(ts.dtype, np.datetime64):
+        return ts.astype("datetime64[ns]")
+    if np.issubdtype(ts.dtype, np.integer):
+        return ts.astype("int64").view("datetime64[ns]")
+    raise ColumnarBarError(f"Column 'ts' must be int64 epoch-ns or datetime64, got {ts.dtype}")
+
+
+def encode_numpy_bars(header: Dict[str, Any], bars: np.ndarray) -> bytes:
+    """Builds a NumPy-format payload (used by clients and the benchmark)."""
+    header_bytes = json.dumps(header).encode("utf-8")
+    buf = io.BytesIO()
+    np.save(buf, bars, allow_pickle=False)
+    return struct.pack("<I", len(header_bytes)) + header_bytes + buf.getvalue()
+
+
+def decode_numpy_bars(body: bytes) -> ColumnarBars:
+    if len(body) < 4:
+        raise ColumnarBarError("Payload too short")
+    (header_len,) = struct.unpack_from("<I", body, 0)
+    try:
+        header = json.loads(body[4:4 + header_len].decode("utf-8"))
+        array = np.load(io.BytesIO(body[4 + header_len:]), allow_pickle=False)
+    except Exception as e:
+        raise ColumnarBarError(f"Malformed NumPy bar payload: {e}")
+
+    names = array.dtype.names or ()
+    missing = [f for f in ("ts",) + VALUE_FIELDS if f not in names]
+    if missing:
+        raise ColumnarBarError(f"Structured array is missing fields: {missing}")
+
+    return ColumnarBars(
+        _check_header(header),
+        _as_datetime64(array["ts"]),
+        {f: np.ascontiguousarray(array[f], dtype="float64") for f in VALUE_FIELDS},
+    )
+
+
+def decode_arrow_bars(body: bytes) -> ColumnarBars:
+    if pa is None:
+        raise ColumnarBarError("Arrow payloads require pyarrow, which is not installed")
+    try:
+        table = pa.ipc.open_stream(body).read_all()
+    except Exception as e:
+        raise ColumnarBarError(f"Malformed Arrow IPC stream: {e}")
+
+    metadata = {k.decode(): v.decode() for k, v in (table.schema.metadata or {}).items()}
+    missing = [f for f in ("ts",) + VALUE_FIELDS if f not in table.column_names]
+    if missing:
+        raise ColumnarBarError(f"Arrow table is missing columns: {missing}")
+
+    ts_col = table.column("ts")
+    if pa.types.is_timestamp(ts_col.type):
+        ts_col = ts_col.cast(pa.timestamp("ns"))
+    ts = _as_datetime64(ts_col.to_numpy())
+    return ColumnarBars(
+        _check_header(metadata),
+        ts,
+        {f: table.column(f).to_numpy().astype("float64", copy=False) for f in VALUE_FIELDS},
+    )
+
+
+def decode_bars(body: bytes, content_type: Optional[str]) -> ColumnarBars:
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type == ARROW_CONTENT_TYPE:
+        bars = decode_arrow_bars(body)
+    elif media_type in (NUMPY_CONTENT_TYPE, "application/octet-stream"):
+        bars = decode_numpy_bars(body)
+    else:
+        raise ColumnarBarError(
+            f"Unsupported content type '{content_type}', expected {NUMPY_CONTENT_TYPE} or {ARROW_CONTENT_TYPE}"
+        )
+    validate_bars(bars)
+    return bars
+
+
+def validate_bars(bars: ColumnarBars):
+    """Vectorized sanity checks; raises ColumnarBarError listing every failed rule."""
+    n = len(bars.ts)
+    lengths = {f: len(a) for f, a in bars.values.items()}
+    if any(length != n for length in lengths.values()):
+        raise ColumnarBarError(f"Column lengths differ: ts={n}, {lengths}")
+
+    o, h, l, c, v = (bars.values[f] for f in VALUE_FIELDS)
+    rules = {
+        "null_timestamp": np.isnat(bars.ts),
+        "non_finite": ~(np.isfinite(o) & np.isfinite(h) & np.isfinite(l) & np.isfinite(c) & np.isfinite(v)),
+        "high_below_open_close_low": h < np.maximum(np.maximum(o, c), l),
+        "low_above_open_close": l > np.minimum(o, c),
+        "negative_volume": v < 0,
+    }
+    failures = {}
+    for rule, mask in rules.items():
+        count = int(np.count_nonzero(mask))
+        if count:
+            failures[rule] = {"count": count, "first_index": int(np.argmax(mask))}
+    if failures:
+        raise ColumnarBarError(f"Invalid bars: {json.dumps(failures)}")
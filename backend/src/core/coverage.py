@@ -0,0 +1,164 @@
+"""
+Coverage catalog of market series, maintained at ingest time.
+
+For every series, market_series_coverage holds the first and last bar, the
+bar count and the gaps: holes where consecutive bars are further apart than
+the timeframe's interval, stored as the epoch-µs timestamps of the two bars
+bounding each hole. The bulk bar writer folds every batch into it in the
+same transaction (only bars that did not exist yet change it), so readers
+answer "what data is there" with one primary-key lookup instead of scanning
+market_bars.
+
+The catalog describes both storage tiers (archiving moves bars, it does not
+remove them). Series ingested before the catalog existed, or after manual
+deletes, are rebuilt from the bars:
+
+    python -m src.core.coverage [--series SERIES_ID ...]
+"""
+import argparse
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Any, Dict, Iterable, List
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from src.database.models import MarketSeries, MarketSeriesCoverage
+from src.database.time_columns import from_epoch_us, to_epoch_us
+
+logger = logging.getLogger(__name__)
+
+# Beyond this many gaps the oldest ones are dropped (and counted in gaps_dropped)
+MAX_GAPS = int(os.getenv("COVERAGE_MAX_GAPS", "1000"))
+
+
+def _gaps_between(points: np.ndarray, step: int) -> List[List[int]]:
+    """[a, b] pairs of consecutive sorted epoch-µs points more than `step` apart."""
+    if len(points) < 2:
+        return []
+    holes = np.flatnonzero(np.diff(points) > step)
+    return [[int(points[i]), int(points[i + 1])] for i in holes]
+
+
+def _fold(row: MarketSeriesCoverage, new_us: np.ndarray):
+    """Folds sorted, previously missing bar timestamps (epoch µs) into the coverage row."""
+    step = (row.interval_seconds or 0) * 1000000
+    if row.first_utc is None:
+        row.first_utc, row.last_utc = from_epoch_us(new_us[0]), from_epoch_us(new_us[-1])
+        row.bar_count = len(new_us)
+        row.gaps_json = _gaps_between(new_us, step) if step else None
+        return
+
+    first, last = to_epoch_us(row.first_utc), to_epoch_us(row.last_utc)
+    if step:
+        gaps = []
+        # Every new bar lands before the first, after the last, or inside a known hole
+        for a, b in [[None, first]] + (row.gaps_json or []) + [[last, None]]:
+            lo = 0 if a is None else int(np.searchsorted(new_us, a, side="right"))
+            hi = len(new_us) if b is None else int(np.searchsorted(new_us, b, side="left"))
+            if lo == hi:
+                if a is not None and b is not None:
+                    gaps.append([a, b])
+                continue
+            points = new_us[lo:hi]
+            if a is not None:
+                points = np.r_[a, points]
+            if b is not None:
+                points = np.r_[points, b]
+            gaps.extend(_gaps_between(points, step))
+        if len(gaps) > MAX_GAPS:
+            row.gaps_dropped = (row.gaps_dropped or 0) + len(gaps) - MAX_GAPS
+            gaps = gaps[-MAX_GAPS:]
+        row.gaps_json = gaps
+    row.first_utc = from_epoch_us(min(first, int(new_us[0])))
+    row.last_utc = from_epoch_us(max(last, int(new_us[-1])))
+    row.bar_count = (row.bar_count or 0) + len(new_us)
+
+
+def _coverage_row(db: Session, series_id: str) -> MarketSeriesCoverage:
+    row = db.get(MarketSeriesCoverage, series_id, with_for_update=True)
+    if row is None:
+        from src.core.rollups import timeframe_seconds
+        timeframe = db.execute(
+            select(MarketSeries.timeframe).where(MarketSeries.series_id == series_id)
+        ).scalar()
+        row = MarketSeriesCoverage(series_id=series_id, bar_count=0, gaps_dropped=0,
+                                   interval_seconds=timeframe_seconds(timeframe))
+        db.add(row)
+        db.flush()
+    return row
+
+
+def record_bars(db: Session, series_id: str, new_timestamps: Iterable[datetime]):
+    """Adds bars that did not exist before (naive UTC timestamps) to the series' coverage. Does not commit."""
+    new_us = np.unique(np.fromiter((to_epoch_us(ts) for ts in new_timestamps), dtype="int64"))
+    if not len(new_us):
+        return
+    row = _coverage_row(db, series_id)
+    _fold(row, new_us)
+    row.updated_utc = datetime.utcnow()
+
+
+def rebuild(db: Session, series_id: str) -> MarketSeriesCoverage:
+    """Recomputes a series' coverage from its bars in both tiers. Does not commit."""
+    from src.core import bar_archive
+    ts = bar_archive.read_series(db, series_id)["ts_utc"].to_numpy(dtype="datetime64[us]").view("int64")
+    row = _coverage_row(db, series_id)
+    row.first_utc = row.last_utc = None
+    row.bar_count, row.gaps_dropped, row.gaps_json = 0, 0, None
+    if len(ts):
+        _fold(row, np.unique(ts))
+    row.updated_utc = datetime.utcnow()
+    return row
+
+
+# --- Reads ---
+
+def covers(row: MarketSeriesCoverage, start: datetime, end: datetime) -> bool:
+    """True when the series has bars over all of [start, end] with no known gap inside it."""
+    if row.first_utc is None or row.first_utc > start or row.last_utc < end:
+        return False
+    lo, hi = to_epoch_us(start), to_epoch_us(end)
+    return not any(a < hi and b > lo for a, b in (row.gaps_json or []))
+
+
+def as_dict(row: MarketSeriesCoverage) -> Dict[str, Any]:
+    return {
+        "series_id": row.series_id,
+        "first_utc": row.first_utc,
+        "last_utc": row.last_utc,
+        "bar_count": row.bar_count,
+        "interval_seconds": row.interval_seconds,
+        "gaps": [
+            {"from_utc": from_epoch_us(a), "to_utc": from_epoch_us(b)} for a, b in (row.gaps_json or [])
+        ],
+        "gaps_dropped": row.gaps_dropped,
+        "updated_utc": row.updated_utc,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the market series coverage catalog from the bars")
+    parser.add_argument("--series", action="append", default=None, help="Series id (repeatable, default all)")
+    args = parser.parse_args()
+
+    from src.database.connection import SessionLocal, init_db
+    init_db()
+    db = SessionLocal()
+    try:
+        series_ids = args.series or db.execute(select(MarketSeries.series_id)).scalars().all()
+        for series_id in series_ids:
+            row = rebuild(db, series_id)
+            db.commit()
+            print(json.dumps({"series_id": series_id, "bar_count": row.bar_count,
+                              "gaps": len(row.gaps_json or [])}))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()
@@ -0,0 +1,208 @@
+"""
+Duplicate suppression for replayed exporter batches.
+
+The exporter's ExportBuffer retries failed posts, so the same execution batch
+often arrives two or three times. Two layers keep those replays away from the
+database:
+
+* IdempotencyFilter: per run, execution_id -> fingerprint of the stored row,
+  seeded once per process from the run's uq_run_execution keys. Executions
+  whose fingerprint matches are exact replays and are dropped before the bulk
+  write; new ids and changed payloads go through as before. Entries only
+  change when a transaction commits (a rollback discards them).
+* BatchKeyCache: responses of committed batches by Idempotency-Key header, so
+  a retried request is answered from memory.
+
+Both are in-process and bounded (IDEMPOTENCY_MAX_RUNS runs,
+IDEMPOTENCY_MAX_BATCH_KEYS keys). Set IDEMPOTENCY_FILTER=off to disable the
+execution filter.
+"""
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from src.core.bulk_writer import to_utc_naive
+from src.core.series_cache import LRUCache, _scope
+from src.database.models import Execution
+
+_PENDING_KEY = "idempotency_pending"
+
+ENABLED = os.getenv("IDEMPOTENCY_FILTER", "on").lower() not in ("off", "0", "false")
+MAX_RUNS = int(os.getenv("IDEMPOTENCY_MAX_RUNS", "32"))
+MAX_BATCH_KEYS = int(os.getenv("IDEMPOTENCY_MAX_BATCH_KEYS", "10000"))
+
+
+def _fingerprint(order_id, exec_utc, price, quantity, fee, fee_currency, liquidity, position_impact, extra_json) -> int:
+    extra = json.dumps(extra_json, sort_keys=True, default=str) if extra_json is not None else None
+    return hash((order_id, to_utc_naive(exec_utc), price, quantity, fee, fee_currency, liquidity, position_impact, extra))
+
+
+def execution_fingerprint(data) -> int:
+    """Fingerprint of an ExecutionCreate, comparable with `_row_fingerprint` of the stored row."""
+    impact = data.position_impact.value if data.position_impact else None
+    return _fingerprint(data.order_id, data.exec_utc, data.price, data.quantity, data.fee,
+                        data.fee_currency, data.liquidity, impact, data.extra_json)
+
+
+def _row_fingerprint(row) -> int:
+    impact = row.position_impact.value if row.position_impact else None
+    return _fingerprint(row.order_id, row.exec_utc, row.price, row.quantity, row.fee,
+                        row.fee_currency, row.liquidity, impact, row.extra_json)
+
+
+class _RunKeys:
+    __slots__ = ("fingerprints", "seeded", "seen", "duplicates")
+
+    def __init__(self):
+        self.fingerprints: Dict[str, int] = {}
+        self.seeded = False
+        self.seen = 0
+        self.duplicates = 0
+
+
+class IdempotencyFilter:
+    def __init__(self, max_runs: int = MAX_RUNS, enabled: bool = ENABLED):
+        self.enabled = enabled
+        self.runs = LRUCache(max_runs)   # (scope, run_id) -> _RunKeys
+        self._lock = threading.Lock()
+        self.seen = 0
+        self.duplicates = 0
+
+    def _run(self, scope: str, run_id: str) -> _RunKeys:
+        with self._lock:
+            keys = self.runs.get((scope, run_id))
+            if keys is None:
+                keys = _RunKeys()
+                self.runs.put((scope, run_id), keys)
+            return keys
+
+    def _seed(self, db: Session, run_id: str, keys: _RunKeys):
+        rows = db.execute(
+            select(Execution.execution_id, Execution.order_id, Execution.exec_utc, Execution.price,
+                   Execution.quantity, Execution.fee, Execution.fee_currency, Execution.liquidity,
+                   Execution.position_impact, Execution.extra_json)
+            .where(Execution.run_id == run_id)
+        ).all()
+        seeded = {row.execution_id: _row_fingerprint(row) for row in rows}
+        with self._lock:
+            # Fingerprints promoted by commits since the read are newer: keep them
+            for execution_id, fp in seeded.items():
+                keys.fingerprints.setdefault(execution_id, fp)
+            keys.seeded = True
+
+    def filter_executions(self, db: Session, executions: List[Any]) -> Tuple[List[Any], int]:
+        """
+        Drops exact replays of already committed executions. Returns the
+        executions still to write and the number dropped; the written ones are
+        remembered once the session commits.
+        """
+        if not self.enabled or not executions:
+            return executions, 0
+        scope = _scope(db)
+        by_run: Dict[str, _RunKeys] = {}
+        fresh: List[Any] = []
+        written: List[Tuple[str, str, int]] = []
+        for item in executions:
+            keys = by_run.get(item.run_id)
+            if keys is None:
+                keys = by_run[item.run_id] = self._run(scope, item.run_id)
+                if not keys.seeded:
+                    self._seed(db, item.run_id, keys)
+            fp = execution_fingerprint(item)
+            keys.seen += 1
+            if keys.fingerprints.get(item.execution_id) == fp:
+                keys.duplicates += 1
+                continue
+            fresh.append(item)
+            written.append((item.run_id, item.execution_id, fp))
+
+        dropped = len(executions) - len(fresh)
+        with self._lock:
+            self.seen += len(executions)
+            self.duplicates += dropped
+        if written:
+            self._pending(db).extend(written)
+        return fresh, dropped
+
+    def forget(self, db: Session, run_id: str):
+        """Drops the run's keys, e.g. after its executions were rewritten outside the filter."""
+        self.runs.pop((_scope(db), run_id))
+
+    def _pending(self, db: Session) -> List[Tuple[str, str, int]]:
+        pending = db.info.get(_PENDING_KEY)
+        if pending is None:
+            pending = db.info[_PENDING_KEY] = {"scope": _scope(db), "items": []}
+        return pending["items"]
+
+    def _on_commit(self, session: Session):
+        pending = session.info.pop(_PENDING_KEY, None)
+        if not pending:
+            return
+        scope = pending["scope"]
+        for run_id, execution_id, fp in pending["items"]:
+            self._run(scope, run_id).fingerprints[execution_id] = fp
+
+    def _on_rollback(self, session: Session):
+        session.info.pop(_PENDING_KEY, None)
+
+    def clear(self):
+        self.runs.clear()
+        with self._lock:
+            self.seen = self.duplicates = 0
+
+    def stats(self) -> Dict[str, Any]:
+        runs = []
+        for (_, run_id), keys in self.runs.items():
+            runs.append({
+                "run_id": run_id,
+                "keys": len(keys.fingerprints),
+                "seen": keys.seen,
+                "duplicates": keys.duplicates,
+                "duplicate_rate": round(keys.duplicates / keys.seen, 4) if keys.seen else None,
+            })
+        runs.sort(key=lambda r: r["duplicates"], reverse=True)
+        return {
+            "enabled": self.enabled,
+            "seen": self.seen,
+            "duplicates": self.duplicates,
+            "duplicate_rate": round(self.duplicates / self.seen, 4) if self.seen else None,
+            "runs_tracked": len(runs),
+            "max_runs": self.runs.maxsize,
+            "runs": runs[:20],
+        }
+
+
+class BatchKeyCache:
+    """Committed batch responses by (endpoint, Idempotency-Key)."""
+
+    def __init__(self, maxsize: int = MAX_BATCH_KEYS):
+        self.responses = LRUCache(maxsize)
+        self.replays = 0
+
+    def get(self, endpoint: str, key: Optional[str]) -> Optional[Dict[str, Any]]:
+        if not key:
+            return None
+        response = self.responses.get((endpoint, key))
+        if response is not None:
+            self.replays += 1
+        return response
+
+    def put(self, endpoint: str, key: Optional[str], response: Dict[str, Any]):
+        if key:
+            self.responses.put((endpoint, key), response)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.responses.stats()
+        stats["replays"] = self.replays
+        return stats
+
+
+idempotency_filter = IdempotencyFilter()
+batch_keys = BatchKeyCache()
+
+event.listen(Session, "after_commit", idempotency_filter._on_commit)
+event.listen(Session, "after_rollback", idempotency_filter._on_rollback)
@@ -0,0 +1,314 @@
+"""
+Append-only raw ingest log (ingest_events) and replay.
+
+Every ingest call appends its payload items to ingest_events inside the same
+transaction as the bulk write: one executemany per batch, no commit of its
+own. Replaying a run's log through the bulk writers restores its orders,
+executions and bars, after which trades are rebuilt. Independent runs can be
+replayed in parallel:
+
+    python -m src.core.ingest_log --run RUN_ID [--run RUN_ID ...] [--workers 4]
+    python -m src.core.ingest_log --all
+
+Set INGEST_EVENT_LOG=off to stop appending.
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+from sqlalchemy import insert, select, delete, cast, Text
+from sqlalchemy.orm import Session
+
+from src.api.schemas import OrderCreate, ExecutionCreate, BarCreate
+from src.core import bulk_writer
+from src.core.columnar_bars import ColumnarBars, VALUE_FIELDS
+from src.core.idempotency import idempotency_filter
+from src.database.models import (
+    IngestEvent, Order, Execution, Trade, TradeReconstructionState, TradeReconstructionCheckpoint
+)
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("INGEST_EVENT_LOG", "on").lower() not in ("off", "0", "false")
+
+# Large columnar uploads are logged as several events of at most this many bars
+BAR_COLUMNS_PER_EVENT = 50000
+# Big chunks: each writer call scans the run's existing keys once
+REPLAY_CHUNK_EVENTS = 50000
+
+# writer kind -> (event_type, schema, event time attribute)
+EVENT_KINDS: Dict[str, Tuple[str, Any, str]] = {
+    "orders": ("order", OrderCreate, "submit_utc"),
+    "executions": ("execution", ExecutionCreate, "exec_utc"),
+    "bars": ("bar", BarCreate, "ts_utc"),
+}
+KIND_BY_EVENT_TYPE = {event_type: kind for kind, (event_type, _, _) in EVENT_KINDS.items()}
+KIND_BY_EVENT_TYPE["bar_columns"] = "bar_columns"
+
+
+# --- Append ---
+
+def _bar_column_events(batch: ColumnarBars) -> Iterator[Tuple[str, datetime, str]]:
+    ts_ns = batch.ts.astype("datetime64[ns]").view("int64")
+    for start in range(0, len(batch), BAR_COLUMNS_PER_EVENT):
+        sl = slice(start, start + BAR_COLUMNS_PER_EVENT)
+        payload = {"header": batch.header, "ts": ts_ns[sl].tolist()}
+        payload.update({f: batch.values[f][sl].tolist() for f in VALUE_FIELDS})
+        event_utc = batch.ts[start].astype("datetime64[us]").item()
+        yield batch.run_id, event_utc, json.dumps(payload)
+
+
+def _event_rows(kind: str, items: Iterable[Any]) -> Iterator[Tuple[str, datetime, str]]:
+    """(run_id, event_utc, payload json) per logged event."""
+    if kind == "bar_columns":
+        for batch in items:
+            if len(batch):
+                yield from _bar_column_events(batch)
+        return
+    _, _, time_attr = EVENT_KINDS[kind]
+    for item in items:
+        yield item.run_id, bulk_writer.to_utc_naive(getattr(item, time_attr)), item.model_dump_json()
+
+
+def append_events(db: Session, kind: str, items: Iterable[Any]) -> int:
+    """
+    Appends the items of one ingest batch to the log in the caller's
+    transaction. `kind` is a writer kind (orders / executions / bars /
+    bar_columns). Returns the number of events written.
+    """
+    if not ENABLED:
+        return 0
+    event_type = "bar_columns" if kind == "bar_columns" else EVENT_KINDS[kind][0]
+    received = datetime.utcnow()
+    rows = [(run_id, event_type, event_utc, payload, received)
+            for run_id, event_utc, payload in _event_rows(kind, items)]
+    if not rows:
+        return 0
+
+    table = IngestEvent.__table__
+    if db.get_bind(clause=table).dialect.name == "sqlite":
+        received_text = bulk_writer._sqlite_datetime(received)
+        db.connection(bind_arguments={"clause": table}).exec_driver_sql(
+            "INSERT INTO ingest_events (run_id, event_type, event_utc, payload_json, received_utc) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [(r, t, bulk_writer._sqlite_datetime(ts), p, received_text) for r, t, ts, p, _ in rows]
+        )
+    else:
+        db.execute(insert(table), [
+            {"run_id": r, "event_type": t, "event_utc": ts, "payload_json": json.loads(p), "received_utc": rc}
+            for r, t, ts, p, rc in rows
+        ])
+    return len(rows)
+
+
+def write_logged(db: Session, kind: str, items: List[Any]) -> Dict[str, int]:
+    """
+    Bulk write plus log append for one ingest batch; the caller commits.
+    Exact replays of committed executions are dropped first and counted
+    under "duplicates".
+    """
+    from src.core.ingest_queue import WRITERS
+    duplicates = None
+    if kind == "executions":
+        items, duplicates = idempotency_filter.filter_executions(db, items)
+    result = WRITERS[kind](db, items) if items else {"inserted": 0, "updated": 0}
+    append_events(db, kind, items)
+    if duplicates is not None:
+        result["duplicates"] = duplicates
+    return result
+
+
+def write_parts(db: Session, parts: List[Tuple[str, List[Any]]]) -> List[Dict[str, int]]:
+    """write_logged for each (kind, items) part, in order; the caller commits."""
+    return [write_logged(db, kind, items) for kind, items in parts]
+
+
+def write_committed(parts: List[Tuple[str, List[Any]]]) -> List[Dict[str, int]]:
+    """
+    write_parts on a central session of its own, then commits. Blocking:
+    async callers run it with asyncio.to_thread, like write_sharded.
+    """
+    from src.database.connection import SessionLocal
+    db = SessionLocal()
+    try:
+        results = write_parts(db, parts)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    return results
+
+
+def write_sharded(parts: List[Tuple[str, List[Any]]]) -> List[Dict[str, int]]:
+    """
+    Per-run shards (src.database.shards): writes each run's slice of the
+    parts through that run's session and commits it. Returns the per-part
+    results summed over the runs.
+    """
+    from src.database.shards import run_session
+    by_run: Dict[str, List[Tuple[int, str, List[Any]]]] = {}
+    for i, (kind, items) in enumerate(parts):
+        for item in items:
+            slices = by_run.setdefault(item.run_id, [])
+            if not slices or slices[-1][0] != i:
+                slices.append((i, kind, []))
+            slices[-1][2].append(item)
+
+    totals: List[Dict[str, int]] = [
+        {"inserted": 0, "updated": 0, **({"duplicates": 0} if kind == "executions" else {})} for kind, _ in parts
+    ]
+    for run_id, slices in by_run.items():
+        db = run_session(run_id)
+        try:
+            results = write_parts(db, [(kind, items) for _, kind, items in slices])
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        for (i, _, _), result in zip(slices, results):
+            for key, value in result.items():
+                totals[i][key] = totals[i].get(key, 0) + value
+    return totals
+
+
+# --- Replay ---
+
+def _decode(event_type: str, payload: str) -> Any:
+    if event_type == "bar_columns":
+        payload = json.loads(payload)
+        ts = np.asarray(payload["ts"], dtype="int64").view("datetime64[ns]")
+        values = {f: np.asarray(payload[f], dtype="float64") for f in VALUE_FIELDS}
+        return ColumnarBars(payload["header"], ts, values)
+    _, schema, _ = EVENT_KINDS[KIND_BY_EVENT_TYPE[event_type]]
+    return schema.model_validate_json(payload)
+
+
+def iter_run_events(db: Session, run_id: str, chunk_size: int = REPLAY_CHUNK_EVENTS) -> Iterator[List[Tuple[str, Any]]]:
+    """Yields the run's events in append order as chunks of (writer kind, item)."""
+    table = IngestEvent.__table__
+    last_id = 0
+    while True:
+        rows = db.execute(
+            # Raw JSON text: pydantic parses it directly, skipping the JSON type's decode
+            select(table.c.id, table.c.event_type, cast(table.c.payload_json, Text))
+            .where(table.c.run_id == run_id, table.c.id > last_id)
+            .order_by(table.c.id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        yield [(KIND_BY_EVENT_TYPE[event_type], _decode(event_type, payload)) for _, event_type, payload in rows]
+
+
+def replay_run(db: Session, run_id: str, rebuild_trades: bool = True) -> Dict[str, Any]:
+    """
+    Restores a run from its event log: deletes its orders, executions, trades
+    and reconstruction state, re-applies every logged event in order through
+    the bulk writers in one transaction, then rebuilds the trades.
+    Shared market bars are upserted (last logged value wins), not deleted.
+    """
+    t0 = time.perf_counter()
+    counts: Dict[str, int] = {}
+    try:
+        for model in (Trade, TradeReconstructionCheckpoint, TradeReconstructionState, Execution, Order):
+            db.execute(delete(model).where(model.run_id == run_id))
+
+        from src.core.ingest_queue import WRITERS
+        for chunk in iter_run_events(db, run_id):
+            parts: List[Tuple[str, List[Any]]] = []
+            for kind, item in chunk:
+                if parts and parts[-1][0] == kind:
+                    parts[-1][1].append(item)
+                else:
+                    parts.append((kind, [item]))
+            for kind, items in parts:
+                WRITERS[kind](db, items)
+                counts[kind] = counts.get(kind, 0) + (sum(len(b) for b in items) if kind == "bar_columns" else len(items))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    # Rows were rewritten behind the duplicate filter's back
+    idempotency_filter.forget(db, run_id)
+
+    trades = 0
+    if rebuild_trades and (counts.get("executions") or counts.get("orders")):
+        from src.core.trade_service import TradeService
+        trades = TradeService(db).rebuild_trades_for_run(run_id)
+
+    return {"run_id": run_id, "replayed": counts, "trades": trades, "seconds": round(time.perf_counter() - t0, 3)}
+
+
+def replay_runs(run_ids: Iterable[str], session_factory: Callable[[], Session], workers: int = 4,
+                rebuild_trades: bool = True, max_retries: int = 5) -> List[Dict[str, Any]]:
+    """Replays independent runs in parallel, one session per run."""
+    def replay_one(run_id: str) -> Dict[str, Any]:
+        retry_delay = 0.2
+        from src.database.shards import run_session, shard_router
+        for attempt in range(max_retries):
+            db = run_session(run_id) if shard_router.enabled else session_factory()
+            try:
+                return replay_run(db, run_id, rebuild_trades=rebuild_trades)
+            except Exception as e:
+                if "database is locked" in str(e) and attempt < max_retries - 1:
+                    logger.warning(f"Database locked while replaying {run_id}, retrying ({attempt+1}/{max_retries})...")
+                    time.sleep(retry_delay)
+                    retry_delay *= 2
+                    continue
+                logger.error(f"Replay of run {run_id} failed: {e}")
+                return {"run_id": run_id, "error": str(e)}
+            finally:
+                db.close()
+
+    run_ids = list(run_ids)
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(run_ids) or 1))) as pool:
+        futures = [pool.submit(replay_one, rid) for rid in run_ids]
+        return [f.result() for f in as_completed(futures)]
+
+
+def logged_run_ids(db: Session) -> List[str]:
+    """Runs with events in the log: the central table plus every run shard."""
+    from src.database.shards import shard_router
+    run_ids = list(db.execute(select(IngestEvent.run_id).distinct()).scalars())
+    run_ids.extend(rid for rid in shard_router.shard_run_ids(IngestEvent.__table__) if rid not in run_ids)
+    return run_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay runs from the raw ingest log")
+    parser.add_argument("--run", action="append", default=[], help="Run id to restore (repeatable)")
+    parser.add_argument("--all", action="store_true", help="Replay every run present in the log")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--skip-trades", action="store_true", help="Do not rebuild trades after replay")
+    args = parser.parse_args()
+
+    from src.database.connection import SessionLocal, init_db
+    init_db()
+    run_ids = list(args.run)
+    if args.all:
+        db = SessionLocal()
+        try:
+            run_ids.extend(rid for rid in logged_run_ids(db) if rid not in run_ids)
+        finally:
+            db.close()
+    if not run_ids:
+        parser.error("nothing to replay: pass --run or --all")
+
+    for result in replay_runs(run_ids, SessionLocal, workers=args.workers, rebuild_trades=not args.skip_trades):
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()
@@ -0,0 +1,245 @@
+"""
+Write-behind ingest queue.
+
+Opt-in mode (INGEST_MODE=queued) where the ingest endpoints validate the
+payload, enqueue it and answer 202 with a sequence number. A single writer
+task drains the queue, merges adjacent batches of the same table and commits
+them through the bulk writers in bounded transactions, so request handlers
+never hold the SQLite write lock.
+"""
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.core import bulk_writer, ingest_log
+from src.core.sqlite_writer import single_writer
+from src.database.shards import shard_router
+
+logger = logging.getLogger(__name__)
+
+# kind -> writer(db, items). Orders before executions is the caller's responsibility.
+WRITERS: Dict[str, Callable] = {
+    "orders": bulk_writer.upsert_orders,
+    "executions": bulk_writer.upsert_executions,
+    "bars": bulk_writer.upsert_bars,
+    "bar_columns": bulk_writer.upsert_bar_columns,
+}
+
+
+class IngestQueueFull(Exception):
+    """Raised when the queue stays full for longer than the put timeout."""
+
+
+class IngestQueue:
+    def __init__(self, session_factory: Callable, enabled: bool = False, maxsize: int = 1000,
+                 max_rows_per_txn: int = 50000, put_timeout: float = 2.0, max_retries: int = 5):
+        self.session_factory = session_factory
+        self.enabled = enabled
+        self.maxsize = maxsize
+        self.max_rows_per_txn = max_rows_per_txn
+        self.put_timeout = put_timeout
+        self.max_retries = max_retries
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._put_lock: Optional[asyncio.Lock] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self._on_commit: Dict[int, Callable[[], None]] = {}
+
+        self.last_enqueued_seq = 0
+        self.last_committed_seq = 0
+        self.last_processed_seq = 0  # committed or dropped after failing
+        self.committed_rows = 0
+        self.failed_batches = 0
+        self.last_error: Optional[str] = None
+        self.last_commit_utc: Optional[datetime] = None
+
+    @property
+    def running(self) -> bool:
+        return self._writer_task is not None and not self._writer_task.done()
+
+    async def start(self):
+        """Starts the writer task. No-op unless the queued mode is enabled."""
+        if not self.enabled or self.running:
+            return
+        # Created here so the queue binds to the serving event loop
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._put_lock = asyncio.Lock()
+        self._writer_task = asyncio.create_task(self._writer_loop())
+        logger.info(f"Ingest queue started (maxsize={self.maxsize}, max_rows_per_txn={self.max_rows_per_txn})")
+
+    async def stop(self):
+        """Flush-on-shutdown: drains everything already accepted, then stops the writer."""
+        if not self.running:
+            return
+        await self.flush()
+        self._writer_task.cancel()
+        try:
+            await self._writer_task
+        except asyncio.CancelledError:
+            pass
+        self._writer_task = None
+        logger.info(f"Ingest queue stopped (last committed seq {self.last_committed_seq})")
+
+    async def flush(self):
+        """Waits until every accepted entry has been committed (or dropped)."""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def put(self, parts: List[Tuple[str, List[Any]]],
+                  on_commit: Optional[Callable[[int], None]] = None) -> int:
+        """
+        Enqueues one request payload as [(kind, items), ...] and returns its
+        sequence number. Applies back-pressure: waits up to `put_timeout`
+        for room, then raises IngestQueueFull. `on_commit(seq)` runs on the
+        writer thread once the entry is committed; not at all if it is dropped.
+        """
+        if not self.running:
+            raise RuntimeError("Ingest queue is not running")
+        for kind, _ in parts:
+            if kind not in WRITERS:
+                raise ValueError(f"Unknown ingest kind: {kind}")
+
+        try:
+            return await asyncio.wait_for(self._put_in_order(parts, on_commit), timeout=self.put_timeout)
+        except asyncio.TimeoutError:
+            raise IngestQueueFull(f"Ingest queue full ({self.maxsize} pending batches)")
+
+    async def _put_in_order(self, parts: List[Tuple[str, List[Any]]],
+                            on_commit: Optional[Callable[[int], None]]) -> int:
+        # Serialized so sequence numbers enter the queue in order while waiting for room
+        async with self._put_lock:
+            seq = self.last_enqueued_seq + 1
+            if on_commit is not None:
+                # Registered first: the writer may commit the entry before put() returns
+                self._on_commit[seq] = lambda: on_commit(seq)
+            try:
+                await self._queue.put((seq, parts))
+            except BaseException:
+                self._on_commit.pop(seq, None)
+                raise
+            self.last_enqueued_seq = seq
+            return seq
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "mode": "queued" if self.enabled else "inline",
+            "running": self.running,
+            "depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_depth": self.maxsize,
+            "last_enqueued_seq": self.last_enqueued_seq,
+            "last_committed_seq": self.last_committed_seq,
+            "last_processed_seq": self.last_processed_seq,
+            "committed_rows": self.committed_rows,
+            "failed_batches": self.failed_batches,
+            "last_error": self.last_error,
+            "last_commit_utc": self.last_commit_utc.isoformat() if self.last_commit_utc else None,
+        }
+
+    # --- Writer side ---
+
+    async def _writer_loop(self):
+        while True:
+            entries = [await self._queue.get()]
+            # Take whatever else is already waiting so it can be coalesced
+            while not self._queue.empty() and len(entries) < self.maxsize:
+                entries.append(self._queue.get_nowait())
+            try:
+                await asyncio.to_thread(self._write_entries, entries)
+            except Exception as e:
+                logger.error(f"Ingest writer failed: {e}")
+            finally:
+                for _ in entries:
+                    self._queue.task_done()
+
+    def _write_entries(self, entries: List[Tuple[int, List[Tuple[str, List[Any]]]]]):
+        """Splits drained entries into bounded transactions (whole entries only)."""
+        txn: List[Tuple[int, List[Tuple[str, List[Any]]]]] = []
+        rows = 0
+        for entry in entries:
+            txn.append(entry)
+            rows += sum(len(items) for _, items in entry[1])
+            if rows >= self.max_rows_per_txn:
+                self._commit(txn)
+                txn, rows = [], 0
+        if txn:
+            self._commit(txn)
+
+    @staticmethod
+    def coalesce(entries: List[Tuple[int, List[Tuple[str, List[Any]]]]]) -> List[Tuple[str, List[Any]]]:
+        """Merges adjacent parts of the same kind, preserving arrival order."""
+        merged: List[Tuple[str, List[Any]]] = []
+        for _, parts in entries:
+            for kind, items in parts:
+                if not items:
+                    continue
+                if merged and merged[-1][0] == kind:
+                    merged[-1][1].extend(items)
+                else:
+                    merged.append((kind, list(items)))
+        return merged
+
+    def _commit(self, txn: List[Tuple[int, List[Tuple[str, List[Any]]]]]):
+        merged = self.coalesce(txn)
+        last_seq = txn[-1][0]
+        callbacks = [cb for cb in (self._on_commit.pop(seq, None) for seq, _ in txn) if cb is not None]
+        try:
+            self._write_merged(merged, last_seq)
+        except Exception as e:
+            # Entries were already acknowledged with 202: record and move on
+            self.failed_batches += len(txn)
+            self.last_error = f"seq {txn[0][0]}-{last_seq}: {e}"
+            self.last_processed_seq = last_seq
+            logger.error(f"Dropping ingest seq {txn[0][0]}-{last_seq}: {e}")
+            return
+        self.last_committed_seq = last_seq
+        self.last_processed_seq = last_seq
+        self.committed_rows += sum(len(items) for _, items in merged)
+        self.last_commit_utc = datetime.utcnow()
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Ingest commit callback failed: {e}")
+
+    def _write_merged(self, merged: List[Tuple[str, List[Any]]], last_seq: int):
+        if shard_router.enabled:
+            ingest_log.write_sharded(merged)
+            return
+        if single_writer.enabled:
+            # The writer thread is the only SQLite writer: nothing to retry on
+            single_writer.run(ingest_log.write_parts, merged)
+            return
+        retry_delay = 0.2
+        for attempt in range(self.max_retries):
+            db = self.session_factory()
+            try:
+                ingest_log.write_parts(db, merged)
+                db.commit()
+                return
+            except Exception as e:
+                db.rollback()
+                if "database is locked" in str(e) and attempt < self.max_retries - 1:
+                    logger.warning(f"Database locked while committing ingest seq <= {last_seq}, retrying ({attempt+1}/{self.max_retries})...")
+                    time.sleep(retry_delay)
+                    retry_delay *= 2
+                    continue
+                raise
+            finally:
+                db.close()
+
+
+def _build_default_queue() -> IngestQueue:
+    from src.database.connection import SessionLocal
+    return IngestQueue(
+        SessionLocal,
+        enabled=os.getenv("INGEST_MODE", "inline").lower() == "queued",
+        maxsize=int(os.getenv("INGEST_QUEUE_MAXSIZE", "1000")),
+        max_rows_per_txn=int(os.getenv("INGEST_QUEUE_MAX_ROWS_PER_TXN", "50000")),
+        put_timeout=float(os.getenv("INGEST_QUEUE_PUT_TIMEOUT", "2.0")),
+    )
+
+
+ingest_queue = _build_default_queue()
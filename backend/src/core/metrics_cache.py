@@ -0,0 +1,173 @@
+"""
+Versioned cache of run analytics.
+
+GET /api/runs/{run_id} and /api/trades/stats used to run the full analysis
+(trade and execution load, pandas work, equity curve) on every read. Each
+run now carries a data version in run_data_versions, bumped in the same
+transaction as every write that can change its metrics: order and execution
+upserts (src.core.bulk_writer), trade reconstruction (TradeService) and
+MAE/MFE updates. Cached metrics are keyed by the request and remember the
+version they were computed at:
+
+* same version: returned as-is (one primary-key lookup for the version)
+* older version: the stale metrics are returned and one background refresh
+  is queued for the key; concurrent reads do not queue more
+* not cached yet: computed inline
+
+Entries are in-process (bounded LRU); versions live in the database, so
+every worker process sees writes made by the others. METRICS_CACHE=off
+computes every read inline, as before.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from src.core.series_cache import LRUCache
+from src.database.models import RunDataVersion, StrategyInstance, StrategyRun
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("METRICS_CACHE", "on").lower() != "off"
+MAX_ENTRIES = int(os.getenv("METRICS_CACHE_SIZE", "1024"))
+WORKERS = int(os.getenv("METRICS_CACHE_WORKERS", "2"))
+
+_MISSING = object()
+
+
+# --- Data versions ---
+
+def bump_versions(db: Session, run_ids: Iterable[str]):
+    """Marks the runs' data as changed; part of the caller's transaction."""
+    from src.core.bulk_writer import dialect_insert
+
+    run_ids = sorted({rid for rid in run_ids if rid})
+    if not run_ids:
+        return
+    table = RunDataVersion.__table__
+    now = datetime.utcnow()
+    rows = [{"run_id": rid, "version": 1, "updated_utc": now} for rid in run_ids]
+    stmt = dialect_insert(db, table)
+    if stmt is not None:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.run_id],
+            set_={"version": table.c.version + 1, "updated_utc": stmt.excluded.updated_utc}
+        )
+        db.execute(stmt, rows)
+        return
+    existing = set(db.execute(select(table.c.run_id).where(table.c.run_id.in_(run_ids))).scalars())
+    if existing:
+        db.execute(update(table).where(table.c.run_id.in_(existing)).values(
+            version=table.c.version + 1, updated_utc=now
+        ))
+    missing = [row for row in rows if row["run_id"] not in existing]
+    if missing:
+        db.execute(table.insert(), missing)
+
+
+def run_version(db: Session, run_id: str) -> int:
+    return db.execute(select(RunDataVersion.version).where(RunDataVersion.run_id == run_id)).scalar() or 0
+
+
+def strategy_version(db: Session, strategy_id: str) -> tuple:
+    """Version token of a strategy-wide analysis: its runs and their versions."""
+    rows = db.execute(
+        select(StrategyRun.run_id, RunDataVersion.version)
+        .join(StrategyInstance, StrategyRun.instance_id == StrategyInstance.instance_id)
+        .outerjoin(RunDataVersion, RunDataVersion.run_id == StrategyRun.run_id)
+        .where(StrategyInstance.strategy_id == strategy_id)
+    ).all()
+    return tuple(sorted((rid, version or 0) for rid, version in rows))
+
+
+# --- Cache ---
+
+class MetricsCache:
+    def __init__(self, enabled: bool = True, max_entries: int = 1024, workers: int = 2):
+        self.enabled = enabled
+        self._entries = LRUCache(max_entries)
+        self._workers = workers
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._inflight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+        self.computed = 0
+        self.stale_served = 0
+        self.refresh_errors = 0
+
+    def get(self, key: Hashable, version: Any, compute: Callable[[], Any]) -> Any:
+        """
+        Metrics for `key` at data `version`. `compute` must be callable from
+        any thread (it opens its own session). Read `version` before calling,
+        so a write racing the computation can only make the entry look older.
+        """
+        if not self.enabled:
+            return compute()
+        entry = self._entries.get(key, _MISSING)
+        if entry is _MISSING:
+            return self._compute(key, version, compute)
+        cached_version, value = entry
+        if cached_version != version:
+            self.stale_served += 1
+            self._schedule(key, version, compute)
+        return value
+
+    def _compute(self, key: Hashable, version: Any, compute: Callable[[], Any]) -> Any:
+        value = compute()
+        self.computed += 1
+        self._entries.put(key, (version, value))
+        return value
+
+    def _schedule(self, key: Hashable, version: Any, compute: Callable[[], Any]):
+        with self._lock:
+            if key in self._inflight:
+                return
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="metrics-cache")
+            future = self._pool.submit(self._refresh, key, version, compute)
+            self._inflight[key] = future
+
+    def _refresh(self, key: Hashable, version: Any, compute: Callable[[], Any]):
+        try:
+            value = compute()
+            self.computed += 1
+            self._entries.put(key, (version, value))
+        except Exception as e:
+            self.refresh_errors += 1
+            logger.error(f"Metrics refresh failed for {key}: {e}")
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def invalidate(self, key: Hashable):
+        self._entries.pop(key)
+
+    def join(self, timeout: Optional[float] = None):
+        """Waits for the queued background refreshes."""
+        with self._lock:
+            futures = list(self._inflight.values())
+        wait(futures, timeout=timeout)
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            **self._entries.stats(),
+            "computed": self.computed,
+            "stale_served": self.stale_served,
+            "refreshing": len(self._inflight),
+            "refresh_errors": self.refresh_errors,
+        }
+
+
+metrics_cache = MetricsCache(enabled=ENABLED, max_entries=MAX_ENTRIES, workers=WORKERS)
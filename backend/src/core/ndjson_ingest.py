@@ -0,0 +1,198 @@
+"""
+Streaming NDJSON ingest.
+
+The request body is read incrementally as newline-delimited JSON events:
+
+    {"type": "order", "data": {...OrderCreate...}}
+    {"type": "execution", "data": {...ExecutionCreate...}}
+    {"type": "bar", "data": {...BarCreate...}}
+
+Lines are parsed in fixed-size chunks and every chunk is written through the
+bulk writers and committed on its own (or handed to the write-behind queue),
+so memory stays bounded by the chunk size rather than the payload size.
+"""
+import asyncio
+import json
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from src.api.schemas import OrderCreate, ExecutionCreate, BarCreate
+from src.core import ingest_log
+from src.core.sqlite_writer import single_writer
+from src.database.shards import shard_router
+
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+
+# event type -> (schema, queue/writer kind); write order within a chunk follows this order
+EVENT_TYPES: Dict[str, Tuple[Any, str]] = {
+    "order": (OrderCreate, "orders"),
+    "execution": (ExecutionCreate, "executions"),
+    "bar": (BarCreate, "bars"),
+}
+
+DEFAULT_CHUNK_LINES = 5000
+MAX_LINE_BYTES = 1 << 20
+MAX_REPORTED_FAILURES = 1000
+
+
+async def iter_lines(stream: AsyncIterator[bytes], max_line_bytes: int = MAX_LINE_BYTES) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """
+    Yields (line_number, line) from a byte stream, 1-based. Lines longer than
+    `max_line_bytes` are discarded and yielded as None so they can be reported.
+    """
+    buffer = b""
+    line_no = 0
+    oversized = False
+    async for piece in stream:
+        buffer += piece
+        pos = 0
+        while True:
+            idx = buffer.find(b"\n", pos)
+            if idx < 0:
+                break
+            line_no += 1
+            yield line_no, (None if oversized else buffer[pos:idx])
+            oversized = False
+            pos = idx + 1
+        buffer = buffer[pos:]  # one copy of the leftover per piece
+        if len(buffer) > max_line_bytes:
+            # Keep reading until the newline, but drop the content
+            buffer = b""
+            oversized = True
+    if buffer or oversized:
+        line_no += 1
+        yield line_no, (None if oversized else buffer)
+
+
+def parse_line(line: bytes) -> Tuple[str, Any]:
+    """Returns (kind, model) or raises ValueError with a readable message."""
+    try:
+        event = json.loads(line)
+    except ValueError as e:
+        raise ValueError(f"invalid JSON: {e}")
+    if not isinstance(event, dict):
+        raise ValueError("event must be a JSON object")
+    event_type = event.get("type")
+    if event_type not in EVENT_TYPES:
+        raise ValueError(f"unknown event type {event_type!r}, expected one of {list(EVENT_TYPES)}")
+    schema, kind = EVENT_TYPES[event_type]
+    try:
+        return kind, schema.model_validate(event.get("data") or {})
+    except ValidationError as e:
+        raise ValueError(f"invalid {event_type}: {e.errors(include_url=False)}")
+
+
+class NdjsonIngestReport:
+    """Accumulates per-chunk counts and failed line numbers for the response."""
+
+    def __init__(self, max_reported_failures: int = MAX_REPORTED_FAILURES):
+        self.max_reported_failures = max_reported_failures
+        self.lines = 0
+        self.chunks: List[Dict[str, Any]] = []
+        self.failed_count = 0
+        self.failed_lines: List[Dict[str, Any]] = []
+
+    def fail(self, line_no: int, error: str):
+        self.failed_count += 1
+        if len(self.failed_lines) < self.max_reported_failures:
+            self.failed_lines.append({"line": line_no, "error": error})
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "status": "ok" if self.failed_count == 0 else "partial",
+            "lines": self.lines,
+            "chunks": self.chunks,
+            "failed_count": self.failed_count,
+            "failed_lines": self.failed_lines,
+            "failed_lines_truncated": self.failed_count > len(self.failed_lines),
+        }
+
+
+def write_parts(db, parts: List[Tuple[str, List[Any]]]) -> Dict[str, int]:
+    """Writes one chunk through the bulk writers; the caller commits."""
+    totals = {"inserted": 0, "updated": 0}
+    for result in ingest_log.write_parts(db, [(kind, items) for kind, items in parts if items]):
+        totals["inserted"] += result["inserted"]
+        totals["updated"] += result["updated"]
+    return totals
+
+
+def write_chunk(db, parts: List[Tuple[str, List[Any]]]) -> Dict[str, int]:
+    """Writes one chunk through the bulk writers and commits it."""
+    try:
+        totals = write_parts(db, parts)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return totals
+
+
+async def _write(db, parts: List[Tuple[str, List[Any]]]) -> Dict[str, int]:
+    if shard_router.enabled:
+        results = await asyncio.to_thread(ingest_log.write_sharded, [(kind, items) for kind, items in parts if items])
+        return {"inserted": sum(r["inserted"] for r in results), "updated": sum(r["updated"] for r in results)}
+    if single_writer.enabled:
+        return await single_writer.run_async(write_parts, parts)
+    # Off the event loop: the bulk writers are CPU and file heavy
+    return await asyncio.to_thread(write_chunk, db, parts)
+
+
+async def ingest_ndjson(stream: AsyncIterator[bytes], db, chunk_lines: int = DEFAULT_CHUNK_LINES,
+                        enqueue: Optional[Callable] = None) -> Dict[str, Any]:
+    """
+    Consumes an NDJSON byte stream chunk by chunk. Each chunk is committed
+    independently; with `enqueue` (queued ingest mode) chunks are handed to
+    the write-behind queue instead and the chunk summary carries its seq.
+    """
+    report = NdjsonIngestReport()
+    pending: Dict[str, List[Any]] = {kind: [] for _, kind in EVENT_TYPES.values()}
+    pending_lines: List[int] = []
+
+    async def flush():
+        if not pending_lines:
+            return
+        parts = [(kind, items) for kind, items in pending.items() if items]
+        summary = {
+            "chunk": len(report.chunks) + 1,
+            "first_line": pending_lines[0],
+            "last_line": pending_lines[-1],
+            **{kind: len(items) for kind, items in pending.items()},
+        }
+        try:
+            if enqueue is not None:
+                summary["seq"] = await enqueue(parts)
+            else:
+                summary.update(await _write(db, parts))
+            summary["status"] = "ok"
+        except Exception as e:
+            summary["status"] = "failed"
+            summary["error"] = str(e)
+            for line_no in pending_lines:
+                report.fail(line_no, f"chunk {summary['chunk']} failed: {e}")
+        report.chunks.append(summary)
+        # Fresh lists: queued parts keep referencing the old ones
+        for kind in pending:
+            pending[kind] = []
+        pending_lines.clear()
+
+    async for line_no, line in iter_lines(stream):
+        report.lines = line_no
+        if line is None:
+            report.fail(line_no, f"line exceeds {MAX_LINE_BYTES} bytes")
+            continue
+        if not line.strip():
+            continue
+        try:
+            kind, item = parse_line(line)
+        except ValueError as e:
+            report.fail(line_no, str(e))
+            continue
+        pending[kind].append(item)
+        pending_lines.append(line_no)
+        if len(pending_lines) >= chunk_lines:
+            await flush()
+    await flush()
+
+    return report.as_dict()
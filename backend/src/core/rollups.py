@@ -0,0 +1,252 @@
+"""
+Materialized multi-timeframe rollups of market series.
+
+A rollup is a derived MarketSeries (provider "rollup:<base provider>",
+catalogued in market_rollups) whose bars are the OHLCV aggregation of a base
+series into coarser buckets aligned to the Unix epoch (5m, 15m, 1h, 1d, ...).
+Buckets are labelled by their start; open/close are the first/last base bar,
+high/low the extremes, volume the sum.
+
+Build them once per base series:
+
+    python -m src.core.rollups --series SERIES_ID [--timeframes 5m 15m 1h 1d]
+
+From then on every write to the base series through the bulk bar writer
+re-aggregates the buckets it touched, in the same transaction. Readers ask
+`read_timeframe` for any timeframe: it serves the coarsest stored series
+(base or rollup) whose interval divides the requested one, resampling on the
+fly when there is no exact match.
+"""
+import argparse
+import json
+import logging
+import re
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from src.core.series_cache import series_cache
+from src.database.models import MarketRollup, MarketSeries
+from src.database.time_columns import from_epoch_us, to_epoch_us
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEFRAMES = ("5m", "15m", "1h", "1d")
+OHLCV = ("open", "high", "low", "close", "volume")
+ROLLUP_PROVIDER_PREFIX = "rollup:"
+
+WRITE_CHUNK = 50000
+
+_UNITS = {"s": 1, "m": 60, "min": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+def timeframe_seconds(timeframe: Optional[str]) -> Optional[int]:
+    """Bar interval of a timeframe string ("5m", "1h", "1d", "M1", "H4", ...), None if unknown."""
+    if not timeframe:
+        return None
+    tf = timeframe.strip().lower()
+    match = re.fullmatch(r"(\d+)\s*([a-z]+)", tf) or re.fullmatch(r"([a-z]+)(\d+)", tf)
+    if not match:
+        return None
+    count, unit = match.groups()
+    if not count.isdigit():
+        count, unit = unit, count
+    seconds = _UNITS.get(unit)
+    return int(count) * seconds if seconds and int(count) > 0 else None
+
+
+def _floor(ts: datetime, seconds: int) -> datetime:
+    step = seconds * 1000000
+    return from_epoch_us(to_epoch_us(ts) // step * step)
+
+
+def _buckets_span(first_ts: datetime, last_ts: datetime, seconds: int) -> Tuple[datetime, datetime]:
+    """First and last instant of the buckets covering [first_ts, last_ts]."""
+    step = seconds * 1000000
+    return _floor(first_ts, seconds), from_epoch_us(to_epoch_us(last_ts) // step * step + step - 1)
+
+
+# --- Aggregation ---
+
+def resample(frame: pd.DataFrame, seconds: int) -> pd.DataFrame:
+    """
+    Aggregates time-ordered bars (ts_utc, open, high, low, close, volume)
+    into `seconds` buckets aligned to the epoch.
+    """
+    if frame.empty:
+        return pd.DataFrame({"ts_utc": pd.Series(dtype="datetime64[ns]"),
+                             **{col: pd.Series(dtype="float64") for col in OHLCV}})
+    ts = frame["ts_utc"].to_numpy(dtype="datetime64[ns]").view("int64")
+    step = seconds * 1000000000
+    buckets = ts // step * step
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(ts)] - 1
+
+    def column(name):
+        return frame[name].to_numpy(dtype="float64", na_value=np.nan)
+
+    return pd.DataFrame({
+        "ts_utc": buckets[starts].view("datetime64[ns]"),
+        "open": column("open")[starts],
+        "high": np.maximum.reduceat(column("high"), starts),
+        "low": np.minimum.reduceat(column("low"), starts),
+        "close": column("close")[ends],
+        "volume": np.add.reduceat(np.nan_to_num(column("volume")), starts),
+    })
+
+
+def _bar_rows(frame: pd.DataFrame) -> List[Tuple]:
+    """Resampled frame -> BAR_COLUMNS tuples for the bulk writer."""
+    ts = frame["ts_utc"].to_numpy(dtype="datetime64[us]").astype(object)
+    return list(zip(ts, *(frame[col].tolist() for col in OHLCV),
+                    [None] * len(frame)))
+
+
+def _write(db: Session, series_id: str, frame: pd.DataFrame):
+    from src.core import bulk_writer
+    rows = _bar_rows(frame)
+    for i in range(0, len(rows), WRITE_CHUNK):
+        bulk_writer.write_market_bars(db, series_id, rows[i:i + WRITE_CHUNK])
+
+
+# --- Catalog ---
+
+def rollups_of(db: Session, base_series_id: str) -> List[Tuple[str, int]]:
+    """
+    (rollup series_id, interval seconds) of a base series. Not cached: the
+    writers read it inside their transaction (one lookup on the
+    (base_series_id, timeframe) index), so a rollup created by another
+    process is refreshed by the very next write.
+    """
+    return [tuple(row) for row in db.execute(
+        select(MarketRollup.series_id, MarketRollup.interval_seconds)
+        .where(MarketRollup.base_series_id == base_series_id)
+    ).all()]
+
+
+def ensure_rollup(db: Session, base: MarketSeries, timeframe: str) -> str:
+    """Creates (if needed) the derived series of `base` for `timeframe`. Returns its series_id."""
+    from src.core import bulk_writer
+    base_seconds = timeframe_seconds(base.timeframe)
+    seconds = timeframe_seconds(timeframe)
+    if base_seconds is None:
+        raise ValueError(f"Unknown timeframe {base.timeframe!r} of series {base.series_id}")
+    if seconds is None or seconds <= base_seconds or seconds % base_seconds:
+        raise ValueError(f"{timeframe!r} is not a multiple of the base timeframe {base.timeframe!r}")
+
+    provider = ROLLUP_PROVIDER_PREFIX + (base.provider or "Unknown")
+    venue = base.venue or "Unknown"
+    series_id = series_cache.series_id(base.symbol, timeframe, venue, provider)
+    bulk_writer.ensure_market_series(db, {series_id: (base.symbol, timeframe, venue, provider)})
+    if db.get(MarketRollup, series_id) is None:
+        db.add(MarketRollup(series_id=series_id, base_series_id=base.series_id,
+                            timeframe=timeframe, interval_seconds=seconds))
+        db.flush()
+    return series_id
+
+
+def build(db: Session, base_series_id: str, timeframes: Iterable[str] = DEFAULT_TIMEFRAMES) -> Dict[str, int]:
+    """
+    (Re)builds the rollups of a base series from its full history (SQL plus
+    the Parquet archive). Does not commit. Returns bars written per timeframe.
+    """
+    from src.core import bar_archive
+    base = db.get(MarketSeries, base_series_id)
+    if base is None:
+        raise ValueError(f"Market series {base_series_id} not found")
+    if db.get(MarketRollup, base_series_id) is not None:
+        raise ValueError(f"Series {base_series_id} is itself a rollup")
+
+    targets = [(tf, ensure_rollup(db, base, tf)) for tf in timeframes]
+    history = bar_archive.read_series(db, base_series_id)
+    written = {}
+    for tf, series_id in targets:
+        frame = resample(history, timeframe_seconds(tf))
+        _write(db, series_id, frame)
+        written[tf] = len(frame)
+    return written
+
+
+def refresh(db: Session, base_series_id: str, first_ts: datetime, last_ts: datetime) -> int:
+    """
+    Re-aggregates the rollup buckets of a base series touched by bars in
+    [first_ts, last_ts]. Called by the bulk bar writer after each write, in
+    the same transaction. Returns the number of rollup bars written.
+    """
+    rollups = rollups_of(db, base_series_id)
+    if not rollups:
+        return 0
+    from src.core import bar_archive
+    spans = {seconds: _buckets_span(first_ts, last_ts, seconds) for _, seconds in rollups}
+    window = bar_archive.read_series(db, base_series_id, min(lo for lo, _ in spans.values()),
+                                     max(hi for _, hi in spans.values()))
+    ts = window["ts_utc"]
+    written = 0
+    for series_id, seconds in rollups:
+        lo, hi = spans[seconds]
+        frame = resample(window[(ts >= lo) & (ts <= hi)], seconds)
+        _write(db, series_id, frame)
+        written += len(frame)
+    return written
+
+
+# --- Reads ---
+
+def read_timeframe(db: Session, symbol: str, timeframe: str, start: Optional[datetime] = None,
+                   end: Optional[datetime] = None, limit: Optional[int] = None) -> Optional[pd.DataFrame]:
+    """
+    Bars of `symbol` at `timeframe` from the nearest stored series: the
+    coarsest one (base or rollup) whose interval divides the requested one,
+    resampled when it is finer. None when no stored series can produce it.
+    """
+    from src.core import bar_archive
+    target = timeframe_seconds(timeframe)
+    if target is None:
+        return None
+    candidates = []
+    for series_id, tf in db.execute(
+        select(MarketSeries.series_id, MarketSeries.timeframe).where(MarketSeries.symbol == symbol)
+    ).all():
+        seconds = timeframe_seconds(tf)
+        if seconds and seconds <= target and target % seconds == 0:
+            candidates.append((seconds, series_id))
+    if not candidates:
+        return None
+    seconds, series_id = max(candidates)
+
+    if seconds == target:
+        return bar_archive.read_series(db, series_id, start, end, limit=limit)
+    if start is not None:
+        # Whole first bucket, and no more history than `limit` buckets need
+        start = _floor(start, target)
+        if limit and end is None:
+            end = from_epoch_us(to_epoch_us(start) + limit * target * 1000000 - 1)
+    frame = resample(bar_archive.read_series(db, series_id, start, end), target)
+    return frame.head(limit) if limit else frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build multi-timeframe rollups of market series")
+    parser.add_argument("--series", action="append", required=True, help="Base series id (repeatable)")
+    parser.add_argument("--timeframes", nargs="+", default=list(DEFAULT_TIMEFRAMES), help="Rollup timeframes")
+    args = parser.parse_args()
+
+    from src.database.connection import SessionLocal, init_db
+    init_db()
+    db = SessionLocal()
+    try:
+        for series_id in args.series:
+            written = build(db, series_id, args.timeframes)
+            db.commit()
+            print(json.dumps({"series_id": series_id, "bars": written}))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()
@@ -0,0 +1,191 @@
+"""
+In-process series-identity cache for the unified market data layer.
+
+The set of live MarketSeries (and of run subscriptions to them) is tiny and
+changes rarely, yet every ingest batch and every bar/regime read used to
+resolve it again. This module keeps bounded LRU maps of:
+
+* series definition (symbol, timeframe, venue, provider) -> series_id
+* series_ids known to exist
+* (symbol, timeframe) -> series_id, the lookup used by the read paths
+* (run_id, series_id) subscriptions known to exist
+
+Entries are scoped per database URL. Rows created by the ingest writers only
+enter the cache once their transaction commits (a rollback discards them),
+and creating a series invalidates the (symbol, timeframe) lookups for it.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+_PENDING_KEY = "series_cache_pending"
+_MISSING = object()
+
+
+class LRUCache:
+    """Small thread-safe LRU map with hit/miss counters."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def put(self, key: Hashable, value: Any = True):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def items(self) -> List[Tuple[Hashable, Any]]:
+        """Snapshot of the entries, least recently used first (no hit/miss accounting)."""
+        with self._lock:
+            return list(self._data.items())
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else None,
+        }
+
+
+def _scope(db: Session) -> str:
+    # Driver-independent, so sync and async sessions on one database share entries
+    url = db.get_bind().url
+    return str(url.set(drivername=url.get_backend_name()))
+
+
+class SeriesIdentityCache:
+    def __init__(self, maxsize: int = 4096):
+        self.series_ids = LRUCache(maxsize)      # definition -> series_id
+        self.known_series = LRUCache(maxsize)    # (scope, series_id)
+        self.lookups = LRUCache(maxsize)         # (scope, symbol, timeframe) -> series_id
+        self.subscriptions = LRUCache(maxsize)   # (scope, run_id, series_id)
+
+    # --- Identity ---
+
+    def series_id(self, symbol: str, timeframe: str, venue: Optional[str], provider: Optional[str]) -> str:
+        """Deterministic MarketSeries id (md5 of the definition), memoized."""
+        key = (symbol, timeframe, venue, provider)
+        series_id = self.series_ids.get(key)
+        if series_id is None:
+            series_id = hashlib.md5(f"{symbol}_{timeframe}_{venue}_{provider}".encode()).hexdigest()
+            self.series_ids.put(key, series_id)
+        return series_id
+
+    # --- Ingest side ---
+
+    def unknown_series(self, db: Session, series_ids: Iterable[str]) -> List[str]:
+        scope = _scope(db)
+        return [sid for sid in series_ids if (scope, sid) not in self.known_series]
+
+    def unknown_subscriptions(self, db: Session, pairs: Iterable[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        scope = _scope(db)
+        return [(run_id, sid) for run_id, sid in pairs if (scope, run_id, sid) not in self.subscriptions]
+
+    def remember_series(self, db: Session, series_ids: Iterable[str], created: Iterable[Tuple[str, str]] = ()):
+        """
+        Records series confirmed in the session's transaction; they become
+        visible to other callers once it commits. `created` carries the
+        (symbol, timeframe) of newly inserted series for lookup invalidation.
+        """
+        pending = self._pending(db)
+        pending["series"].update(series_ids)
+        pending["created"].update(created)
+
+    def remember_subscriptions(self, db: Session, pairs: Iterable[Tuple[str, str]]):
+        self._pending(db)["subscriptions"].update(pairs)
+
+    def _pending(self, db: Session) -> Dict[str, Any]:
+        pending = db.info.get(_PENDING_KEY)
+        if pending is None:
+            pending = db.info[_PENDING_KEY] = {
+                "scope": _scope(db), "series": set(), "created": set(), "subscriptions": set()
+            }
+        return pending
+
+    def _on_commit(self, session: Session):
+        pending = session.info.pop(_PENDING_KEY, None)
+        if not pending:
+            return
+        scope = pending["scope"]
+        for symbol, timeframe in pending["created"]:
+            self.lookups.pop((scope, symbol, timeframe))
+        for sid in pending["series"]:
+            self.known_series.put((scope, sid))
+        for run_id, sid in pending["subscriptions"]:
+            self.subscriptions.put((scope, run_id, sid))
+
+    def _on_rollback(self, session: Session):
+        session.info.pop(_PENDING_KEY, None)
+
+    # --- Read side ---
+
+    def resolve(self, db: Session, symbol: str, timeframe: str) -> Optional[str]:
+        """
+        series_id of the MarketSeries for (symbol, timeframe), or None.
+        Misses are not cached, so a series created by another process shows
+        up on the next call.
+        """
+        key = (_scope(db), symbol, timeframe)
+        series_id = self.lookups.get(key)
+        if series_id is None:
+            from src.database.models import MarketSeries
+            series_id = db.query(MarketSeries.series_id).filter(
+                MarketSeries.symbol == symbol,
+                MarketSeries.timeframe == timeframe
+            ).limit(1).scalar()
+            if series_id is not None:
+                self.lookups.put(key, series_id)
+        return series_id
+
+    # --- Maintenance ---
+
+    def clear(self):
+        for cache in (self.series_ids, self.known_series, self.lookups, self.subscriptions):
+            cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "series_ids": self.series_ids.stats(),
+            "known_series": self.known_series.stats(),
+            "lookups": self.lookups.stats(),
+            "subscriptions": self.subscriptions.stats(),
+        }
+
+
+series_cache = SeriesIdentityCache(maxsize=int(os.getenv("SERIES_CACHE_MAXSIZE", "4096")))
+
+event.listen(Session, "after_commit", series_cache._on_commit)
+event.listen(Session, "after_rollback", series_cache._on_rollback)
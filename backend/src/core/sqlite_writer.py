@@ -0,0 +1,217 @@
+"""
+Single-writer service for SQLite deployments.
+
+SQLite admits one writer at a time. Ingest, trade rebuilds and run metrics
+write from different threads, so their connections wait on the file lock
+and fall back to "database is locked" retries. With SQLITE_SINGLE_WRITER=on
+every write unit of work of the API process is handed to one dedicated
+thread owning one session: it takes whatever is waiting, runs the units
+back to back in a single transaction and commits once. Readers keep their
+own sessions on the WAL snapshot. Training jobs run in their own processes
+(src.training_node.job_manager) and keep writing through their own
+sessions; the writer thread does not serialize with them.
+
+A unit is a callable fn(db, *args) that writes through the given session
+and does not commit; its return value is the caller's result. When a unit
+of a group fails the group is rolled back and its units re-run one
+transaction each, so only the failing unit sees the error. Units that
+commit on their own (trade rebuilds) are submitted with isolated=True and
+always run alone.
+"""
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# (fn, args, isolated, future, enqueued perf_counter)
+_Unit = Tuple[Callable, tuple, bool, Future, float]
+_STOP = object()
+
+
+class SingleWriter:
+    def __init__(self, session_factory: Callable, enabled: bool = False, max_group: int = 256,
+                 latency_window: int = 2048):
+        self.session_factory = session_factory
+        self.enabled = enabled
+        self.max_group = max_group
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._db = None
+
+        self.units = 0
+        self.failed_units = 0
+        self.transactions = 0
+        self.last_error: Optional[str] = None
+        self.last_commit_utc: Optional[datetime] = None
+        self._wait_ms: deque = deque(maxlen=latency_window)
+        self._txn_ms: deque = deque(maxlen=latency_window)
+        self._group_sizes: deque = deque(maxlen=latency_window)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Starts the writer thread. No-op unless enabled."""
+        if not self.enabled:
+            return
+        with self._start_lock:
+            if self.running:
+                return
+            self._thread = threading.Thread(target=self._loop, name="sqlite-writer", daemon=True)
+            self._thread.start()
+        logger.info(f"SQLite single writer started (max_group={self.max_group})")
+
+    def stop(self, timeout: Optional[float] = 30.0):
+        """Runs everything already submitted, then stops the thread."""
+        if not self.running:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+        logger.info(f"SQLite single writer stopped ({self.units} units in {self.transactions} transactions)")
+
+    # --- Producer side ---
+
+    def submit(self, fn: Callable, *args, isolated: bool = False) -> Future:
+        """Queues fn(db, *args) for the writer thread; the future resolves once it is committed."""
+        if not self.enabled:
+            raise RuntimeError("Single writer is not enabled")
+        if not self.running:
+            self.start()
+        future: Future = Future()
+        self._queue.put((fn, args, isolated, future, time.perf_counter()))
+        return future
+
+    def run(self, fn: Callable, *args, isolated: bool = False, timeout: Optional[float] = None) -> Any:
+        """Blocking submit: returns fn's result after commit, or raises its exception."""
+        if threading.current_thread() is self._thread:
+            # A unit writing more: part of the same transaction
+            return fn(self._db, *args)
+        return self.submit(fn, *args, isolated=isolated).result(timeout)
+
+    async def run_async(self, fn: Callable, *args, isolated: bool = False) -> Any:
+        return await asyncio.wrap_future(self.submit(fn, *args, isolated=isolated))
+
+    def status(self) -> Dict[str, Any]:
+        def percentiles(values: deque) -> Dict[str, Optional[float]]:
+            if not values:
+                return {"p50": None, "p95": None, "p99": None, "max": None}
+            arr = np.fromiter(values, dtype="float64")
+            p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+            return {"p50": round(p50, 3), "p95": round(p95, 3), "p99": round(p99, 3), "max": round(arr.max(), 3)}
+
+        return {
+            "mode": "single_writer" if self.enabled else "off",
+            "running": self.running,
+            "depth": self._queue.qsize(),
+            "units": self.units,
+            "transactions": self.transactions,
+            "failed_units": self.failed_units,
+            "avg_units_per_transaction": round(float(np.mean(self._group_sizes)), 2) if self._group_sizes else None,
+            "queue_wait_ms": percentiles(self._wait_ms),
+            "transaction_ms": percentiles(self._txn_ms),
+            "last_error": self.last_error,
+            "last_commit_utc": self.last_commit_utc.isoformat() if self.last_commit_utc else None,
+        }
+
+    # --- Writer thread ---
+
+    def _loop(self):
+        stopping = False
+        while not (stopping and self._queue.empty()):
+            drained = [self._queue.get()]
+            while len(drained) < self.max_group:
+                try:
+                    drained.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stopping = stopping or any(unit is _STOP for unit in drained)
+            # Cancelled futures are skipped
+            units = [unit for unit in drained if unit is not _STOP and unit[3].set_running_or_notify_cancel()]
+
+            # Isolated units run alone, in arrival order with the grouped ones around them
+            group: List[_Unit] = []
+            for unit in units:
+                if unit[2]:
+                    if group:
+                        self._run_group(group)
+                        group = []
+                    self._run_group([unit])
+                else:
+                    group.append(unit)
+            if group:
+                self._run_group(group)
+
+    def _run_group(self, units: List[_Unit]):
+        started = time.perf_counter()
+        for _, _, _, _, enqueued in units:
+            self._wait_ms.append((started - enqueued) * 1000)
+
+        ok, outcome = self._transaction(units)
+        if ok:
+            outcomes = [(True, result) for result in outcome]
+        elif len(units) == 1:
+            outcomes = [(False, outcome)]
+        else:
+            # Find the failing unit(s): one transaction each
+            outcomes = []
+            for unit in units:
+                unit_ok, unit_outcome = self._transaction([unit])
+                outcomes.append((unit_ok, unit_outcome[0] if unit_ok else unit_outcome))
+
+        self._txn_ms.append((time.perf_counter() - started) * 1000)
+        self._group_sizes.append(len(units))
+        for (_, _, _, future, _), (unit_ok, result) in zip(units, outcomes):
+            if unit_ok:
+                future.set_result(result)
+            else:
+                future.set_exception(result)
+
+    def _transaction(self, units: List[_Unit]) -> Tuple[bool, Any]:
+        """Runs units in one transaction: (True, results) after commit, (False, error) after rollback."""
+        db = self._db = self.session_factory()
+        try:
+            results = [fn(db, *args) for fn, args, _, _, _ in units]
+            db.commit()
+            self.transactions += 1
+            self.units += len(units)
+            self.last_commit_utc = datetime.utcnow()
+            return True, results
+        except Exception as e:
+            db.rollback()
+            if len(units) == 1:
+                self.failed_units += 1
+                self.last_error = str(e)
+                logger.error(f"Single writer unit {getattr(units[0][0], '__name__', 'unit')} failed: {e}")
+            return False, e
+        finally:
+            db.close()
+            self._db = None
+
+
+def _build_default_writer() -> SingleWriter:
+    from src.database.connection import SessionLocal, engine
+    wanted = os.getenv("SQLITE_SINGLE_WRITER", "off").lower() in ("on", "1", "true")
+    if wanted and engine.dialect.name != "sqlite":
+        logger.info("SQLITE_SINGLE_WRITER ignored: the database is not SQLite")
+    return SingleWriter(
+        SessionLocal,
+        enabled=wanted and engine.dialect.name == "sqlite",
+        max_group=int(os.getenv("SQLITE_WRITER_MAX_GROUP", "256")),
+    )
+
+
+single_writer = _build_default_writer()
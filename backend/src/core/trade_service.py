@@ -1,12 +1,40 @@
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from src.database.models import Trade, Execution, Order, Side
+from src.database.models import (
+    Trade, Execution, Order, Side, TradeReconstructionState, TradeReconstructionCheckpoint
+)
 # Local imports inside methods to assume no circular deps
-from src.quantlab.metrics import MetricsEngine
+from src.quantlab.fifo import OpenLots, fifo_match, trade_columns
 from src.quantlab.regime import RegimeDetector
+from src.core.series_cache import series_cache
+from src.core import bar_store
+from src.core.bulk_writer import chunked, to_utc_naive, insert_columns
+from src.core.metrics_cache import bump_versions
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
 import pandas as pd
-import uuid
+import os
 import traceback
 
+# Executions between two reconstruction checkpoints (bounds the replay after an out-of-order arrival)
+TRADE_CHECKPOINT_EVERY = int(os.getenv("TRADE_CHECKPOINT_EVERY", "1000"))
+
+# Above this many order ids the run's orders are scanned instead of looked up in chunks
+ORDERS_SCAN_THRESHOLD = 10000
+
+
+def _uuid4_strings(count: int) -> List[str]:
+    """`count` random UUID4 strings, formatted from one block of random bytes."""
+    raw = np.frombuffer(os.urandom(16 * count), dtype=np.uint8).reshape(count, 16).copy()
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40  # version 4
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80  # RFC 4122 variant
+    h = raw.tobytes().hex()
+    return [
+        f"{h[i:i + 8]}-{h[i + 8:i + 12]}-{h[i + 12:i + 16]}-{h[i + 16:i + 20]}-{h[i + 20:i + 32]}"
+        for i in range(0, 32 * count, 32)
+    ]
+
 class TradeService:
     def __init__(self, db: Session):
         self.db = db
@@ -16,7 +44,7 @@ class TradeService:
         Helper to fetch market data and calculate regime for a run.
         """
         try:
-            from src.database.models import StrategyRun, StrategyInstance, MarketSeries, MarketBar
+            from src.database.models import StrategyRun, StrategyInstance, MarketBar
             
             # Use get() for primary key
             run = self.db.query(StrategyRun).get(run_id)
@@ -31,24 +59,17 @@ class TradeService:
             if not instance or not instance.symbol or not instance.timeframe:
                 return pd.DataFrame()
 
-            m_series = self.db.query(MarketSeries).filter(
-                MarketSeries.symbol == instance.symbol,
-                MarketSeries.timeframe == instance.timeframe
-            ).first()
+            series_id = series_cache.resolve(self.db, instance.symbol, instance.timeframe)
 
-            if not m_series:
+            if not series_id:
                 return pd.DataFrame()
             
-            # Load Bars
-            # Use statement and connection for pandas
-            stmt = self.db.query(MarketBar).filter(MarketBar.series_id == m_series.series_id).order_by(MarketBar.ts_utc.asc()).statement
-            df_bars = pd.read_sql(stmt, self.db.connection())
+            # Load Bars (memory-mapped store, else SQL rows merged with the Parquet archive)
+            df_bars = bar_store.read_frame(self.db, series_id)
             
             if df_bars.empty:
                 return pd.DataFrame()
-
-            if 'ts_utc' in df_bars.columns:
-                df_bars['ts_utc'] = pd.to_datetime(df_bars['ts_utc'])
+            df_bars['series_id'] = series_id
             
             df_regime = RegimeDetector.calculate_regime(df_bars)
             if not df_regime.empty and 'ts_utc' in df_regime.columns:
@@ -61,82 +82,272 @@ class TradeService:
             traceback.print_exc()
             return pd.DataFrame()
 
+    def _build_trades(self, run_id: str, columns: Dict[str, np.ndarray]) -> Dict[str, Any]:
+        """
+        Turns reconstructed trade columns into `trades` rows, column-wise.
+        The market regime at entry (latest regime bar at or before the entry)
+        is looked up for all trades with one searchsorted.
+        """
+        count = len(columns.get('pnl_net', ()))
+        if not count:
+            return {}
+
+        regime_trend: List[Any] = [None] * count
+        regime_volatility: List[Any] = [None] * count
+        df_regime = self._get_regime_df(run_id)
+        if not df_regime.empty and 'ts_utc' in df_regime.columns:
+            try:
+                bar_ts = df_regime['ts_utc'].to_numpy(dtype='datetime64[us]')
+                idx = np.searchsorted(bar_ts, columns['entry_time'].astype('datetime64[us]'), side='right') - 1
+                found = idx >= 0
+                for name, out in (('regime_trend', regime_trend), ('regime_volatility', regime_volatility)):
+                    if name in df_regime.columns:
+                        labels = df_regime[name].astype(object).where(df_regime[name].notna(), None).to_numpy()
+                        out[:] = np.where(found, labels[np.maximum(idx, 0)], None).tolist()
+            except Exception:
+                print(f"Warning: Failed to assign regimes for run {run_id}")
+                traceback.print_exc()
+
+        sides = {'BUY': Side.BUY, 'SELL': Side.SELL}
+        return {
+            'trade_id': _uuid4_strings(count),
+            'run_id': [run_id] * count,
+            'symbol': columns['symbol'],
+            'side': [sides[side] for side in columns['side'].tolist()],
+            'entry_time': columns['entry_time'],
+            'exit_time': columns['exit_time'],
+            'entry_price': columns['entry_price'],
+            'exit_price': columns['exit_price'],
+            'quantity': columns['quantity'],
+            'pnl_net': columns['pnl_net'],
+            'pnl_gross': columns['pnl_gross'],
+            'commission': [0.0] * count,
+            'duration_seconds': columns['duration_seconds'],
+            'regime_trend': regime_trend,
+            'regime_volatility': regime_volatility,
+            'extra_json': [{}] * count,
+        }
+
+    def _persist_trades(self, rows: Dict[str, Any]) -> int:
+        """Bulk-inserts built trade rows: chunked executemany, COPY on PostgreSQL. The caller commits."""
+        return insert_columns(self.db, Trade.__table__, rows)
+
+    # --- Incremental Reconstruction ---
+
+    def update_trades_incremental(self, run_id: str, changed_from: Optional[datetime] = None) -> int:
+        """
+        Extends the run's trades with the executions ingested since the last
+        call, using the persisted FIFO state instead of replaying the run.
+
+        Executions that arrive out of order (exec_utc before the watermark),
+        executions whose order has only now arrived, and an explicit
+        `changed_from` rewind to the latest checkpoint at or before the
+        earliest affected timestamp; only trades closed after it are rebuilt.
+        Corrections to already-processed executions are not detected on
+        their own: pass `changed_from` or use the full rebuild.
+        Returns the number of trades written.
+        """
+        if changed_from is not None:
+            changed_from = to_utc_naive(changed_from)
+        rows = self._build_trades(run_id, self._reconstruct(run_id, changed_from=changed_from))
+        trade_ids = rows.get('trade_id', [])
+
+        self._persist_trades(rows)
+        bump_versions(self.db, [run_id])
+        self.db.commit()
+
+        if trade_ids:
+            from src.services.analytics import AnalyticsRouter
+            AnalyticsRouter(self.db).calculate_run_trade_metrics(run_id, trade_ids=trade_ids)
+        return len(trade_ids)
+
+    def _reconstruct(self, run_id: str, changed_from: Optional[datetime] = None, full: bool = False) -> Dict[str, np.ndarray]:
+        """
+        Runs the FIFO reconstruction from the persisted state (or from a
+        checkpoint / the start of the run when rewinding) and returns the
+        newly closed trades as columns (see src.quantlab.fifo.trade_columns).
+        Stale trades and checkpoints are deleted and the state row is
+        updated; the caller commits.
+        """
+        state = self.db.get(TradeReconstructionState, run_id)
+        if state is None:
+            # Trades from a previous full rebuild cannot be extended: start over
+            state = TradeReconstructionState(
+                run_id=run_id, last_execution_pk=0, open_lots_json={}, orphans_json={},
+                executions_since_checkpoint=0
+            )
+            self.db.add(state)
+            full = True
+
+        rewind_from = changed_from
+        if not full:
+            # Out-of-order arrivals: new executions stamped before the watermark
+            earliest_new = self.db.query(func.min(Execution.exec_utc)).filter(
+                Execution.run_id == run_id, Execution.id > state.last_execution_pk
+            ).scalar()
+            if earliest_new is not None and state.last_exec_utc is not None and earliest_new < state.last_exec_utc:
+                rewind_from = min(rewind_from or earliest_new, earliest_new)
+
+            # Executions skipped because their order was missing, now resolvable
+            orphans = state.orphans_json or {}
+            if orphans:
+                found = self._existing_order_ids(run_id, list(orphans))
+                if found:
+                    earliest_orphan = min(datetime.fromisoformat(orphans[oid]) for oid in found)
+                    rewind_from = min(rewind_from or earliest_orphan, earliest_orphan)
+
+        exec_query = self.db.query(Execution).filter(Execution.run_id == run_id)
+        checkpoint = None
+        if not full and rewind_from is not None:
+            checkpoint = self.db.query(TradeReconstructionCheckpoint).filter(
+                TradeReconstructionCheckpoint.run_id == run_id,
+                TradeReconstructionCheckpoint.boundary_utc <= rewind_from
+            ).order_by(TradeReconstructionCheckpoint.boundary_utc.desc(), TradeReconstructionCheckpoint.id.desc()).first()
+            if checkpoint is None:
+                full = True
+
+        if full:
+            self.db.query(Trade).filter(Trade.run_id == run_id).delete(synchronize_session=False)
+            self.db.query(TradeReconstructionCheckpoint).filter(
+                TradeReconstructionCheckpoint.run_id == run_id
+            ).delete(synchronize_session=False)
+            state.last_execution_pk, state.last_exec_utc, state.last_execution_id = 0, None, None
+            open_positions, orphans = {}, {}
+            prev_utc, since_checkpoint = None, 0
+        elif checkpoint is not None:
+            boundary = checkpoint.boundary_utc
+            self.db.query(Trade).filter(
+                Trade.run_id == run_id, Trade.exit_time >= boundary
+            ).delete(synchronize_session=False)
+            self.db.query(TradeReconstructionCheckpoint).filter(
+                TradeReconstructionCheckpoint.run_id == run_id,
+                TradeReconstructionCheckpoint.boundary_utc > boundary
+            ).delete(synchronize_session=False)
+            open_positions = self._load_lots(checkpoint.open_lots_json)
+            orphans = dict(checkpoint.orphans_json or {})
+            prev_utc, since_checkpoint = None, 0
+            exec_query = exec_query.filter(Execution.exec_utc >= boundary)
+        else:
+            open_positions = self._load_lots(state.open_lots_json)
+            orphans = dict(state.orphans_json or {})
+            prev_utc, since_checkpoint = state.last_exec_utc, state.executions_since_checkpoint
+            exec_query = exec_query.filter(Execution.id > state.last_execution_pk)
+
+        # Same order as the full rebuild: exec_utc, ties in arrival order
+        executions = exec_query.with_entities(
+            Execution.id, Execution.execution_id, Execution.order_id, Execution.exec_utc,
+            Execution.price, Execution.quantity
+        ).order_by(Execution.exec_utc.asc(), Execution.id.asc()).all()
+        orders_map = self._load_orders(run_id, {e.order_id for e in executions})
+
+        # Columnar FIFO input: the carried-over lots first, then every fill with a known order
+        seeds = [(symbol, lot) for symbol, lots in open_positions.items() for lot in lots]
+        symbols = [symbol for symbol, _ in seeds]
+        is_buy = [lot['side'] == 'BUY' for _, lot in seeds]
+        quantity = [lot['quantity'] for _, lot in seeds]
+        price = [lot['price'] for _, lot in seeds]
+        times = [lot['time'] for _, lot in seeds]
+        order_ids = [lot['order_id'] for _, lot in seeds]
+
+        checkpoints = []  # (input row, boundary, orphans at the boundary)
+        for exc in executions:
+            if since_checkpoint >= TRADE_CHECKPOINT_EVERY and prev_utc is not None and exc.exec_utc > prev_utc:
+                checkpoints.append((len(symbols), exc.exec_utc, dict(orphans)))
+                since_checkpoint = 0
+
+            order = orders_map.get(exc.order_id)
+            if order is None:
+                ts = exc.exec_utc.isoformat()
+                orphans[exc.order_id] = min(orphans.get(exc.order_id, ts), ts)
+            else:
+                symbols.append(order[0])
+                is_buy.append(order[1])
+                quantity.append(exc.quantity)
+                price.append(exc.price)
+                times.append(exc.exec_utc)
+                order_ids.append(exc.order_id)
+            since_checkpoint += 1
+            prev_utc = exc.exec_utc
+
+        codes, names = pd.factorize(np.asarray(symbols, dtype=object))
+        result = fifo_match(codes, np.asarray(is_buy, dtype=bool), np.asarray(quantity, dtype="float64"),
+                            n_open=len(seeds), snapshots=[row for row, _, _ in checkpoints])
+        lot_rows = (names, order_ids, price, is_buy, times)
+        for (_, boundary, orphans_then), lots in zip(checkpoints, result.snapshots):
+            self.db.add(TradeReconstructionCheckpoint(
+                run_id=run_id, boundary_utc=boundary,
+                open_lots_json=self._dump_lots(lots, *lot_rows), orphans_json=orphans_then
+            ))
+        completed_trades = trade_columns(result, names, codes, is_buy, price, np.array(times, dtype="datetime64[us]"))
+
+        if executions:
+            last = executions[-1]
+            state.last_execution_pk = max(state.last_execution_pk or 0, max(e.id for e in executions))
+            if state.last_exec_utc is None or last.exec_utc >= state.last_exec_utc:
+                state.last_exec_utc = last.exec_utc
+                state.last_execution_id = last.execution_id
+        state.open_lots_json = self._dump_lots(result.open_lots, *lot_rows)
+        state.orphans_json = orphans
+        state.executions_since_checkpoint = since_checkpoint
+        state.updated_utc = datetime.utcnow()
+        return completed_trades
+
+    def _load_orders(self, run_id: str, order_ids: set) -> Dict[str, Tuple[str, bool]]:
+        """order_id -> (symbol, is_buy) for the given orders of the run."""
+        query = self.db.query(Order.order_id, Order.symbol, Order.side).filter(Order.run_id == run_id)
+        if len(order_ids) > ORDERS_SCAN_THRESHOLD:
+            # Rebuilds touch most of the run's orders: one scan beats hundreds of IN (...) chunks
+            rows = (row for row in query if row[0] in order_ids)
+        else:
+            rows = (row for chunk in chunked(list(order_ids)) for row in query.filter(Order.order_id.in_(chunk)))
+        return {
+            order_id: (symbol, (side.name if hasattr(side, 'name') else str(side)) == 'BUY')
+            for order_id, symbol, side in rows
+        }
+
+    def _existing_order_ids(self, run_id: str, order_ids: List[str]) -> List[str]:
+        found = []
+        for chunk in chunked(order_ids):
+            found.extend(row[0] for row in self.db.query(Order.order_id).filter(
+                Order.run_id == run_id, Order.order_id.in_(chunk)
+            ))
+        return found
+
+    @staticmethod
+    def _dump_lots(open_lots: OpenLots, names, order_ids, price, is_buy, times) -> Dict[str, List[Dict[str, Any]]]:
+        """Kernel open lots (input rows) -> the persisted {symbol: [lot, ...]} form."""
+        return {
+            names[code]: [
+                {"order_id": order_ids[i], "price": price[i], "quantity": remaining,
+                 "side": 'BUY' if is_buy[i] else 'SELL', "time": times[i].isoformat()}
+                for i, remaining in lots
+            ]
+            for code, lots in open_lots.items()
+        }
+
+    @staticmethod
+    def _load_lots(data: Optional[Dict[str, List[Dict[str, Any]]]]) -> Dict[str, List[Dict[str, Any]]]:
+        return {
+            symbol: [dict(lot, time=datetime.fromisoformat(lot['time'])) for lot in lots]
+            for symbol, lots in (data or {}).items()
+        }
+
     def rebuild_trades_for_run(self, run_id: str):
         """
         Fetches all executions/orders for a run, reconstructs trades, 
         and updates the 'trades' table. 
-        Note: This is a full rebuild (idempotency required).
+        Note: This is a full rebuild (idempotency required). It also resets
+        the incremental reconstruction state of the run.
         """
-        # 1. Fetch data
-        executions = self.db.query(Execution).filter(Execution.run_id == run_id).all()
-        orders = self.db.query(Order).filter(Order.run_id == run_id).all()
-        
-        # 2. Reconstruct (using existing MetricsEngine logic)
-        # Returns list of dicts
-        trade_dicts = MetricsEngine.reconstruct_trades(executions, orders)
-        
-        # 3. Persist
-        # Strategy: Delete existing trades for this run? Or Upsert?
-        # For simplicity in this step: Delete all run trades and re-insert.
-        self.db.query(Trade).filter(Trade.run_id == run_id).delete()
-        
-        # --- Pre-calculate Regime Data (Optimization) ---
-        df_regime = self._get_regime_df(run_id)
+        # 1-2. Fetch data and reconstruct from the start of the run
+        columns = self._reconstruct(run_id, full=True)
         
-        new_trade_objs = []
-        for t_dict in trade_dicts:
-            # t_dict has: 'entry_time', 'exit_time', 'entry_price', 'exit_price', 'quantity', 
-            # 'pnl_net', 'pnl_gross', 'side', 'commission', 'duration_seconds'
-            
-            # Map Side string/enum
-            side_val = t_dict.get('side')
-            if isinstance(side_val, str):
-                side_enum = Side[side_val] 
-            else:
-                side_enum = side_val
-
-            # Regime Lookup
-            r_trend = None
-            r_vol = None
-            if not df_regime.empty and 'ts_utc' in df_regime.columns:
-                try:
-                    # Find index where bar_time <= entry_time
-                    # searchsorted returns index where item should be inserted to maintain order. 
-                    # side='right' -> > entry_time. subtract 1 to get <= entry_time.
-                    idx = df_regime['ts_utc'].searchsorted(t_dict['entry_time'], side='right') - 1
-                    if idx >= 0:
-                        regime_row = df_regime.iloc[idx]
-                        # Check if timestamp is reasonably close? (e.g. within timeframe * 2)
-                        # For now assume if it's the latest bar before entry, it's valid context.
-                        r_trend = regime_row.get('regime_trend')
-                        r_vol = regime_row.get('regime_volatility')
-                except Exception:
-                    pass
-
-            trade = Trade(
-                trade_id=str(uuid.uuid4()),
-                run_id=run_id,
-                symbol=t_dict.get('symbol', 'UNKNOWN'), # MetricsEngine logic needs to ensure symbol is present
-                side=side_enum,
-                entry_time=t_dict['entry_time'],
-                exit_time=t_dict['exit_time'],
-                entry_price=t_dict['entry_price'],
-                exit_price=t_dict['exit_price'],
-                quantity=t_dict['quantity'],
-                pnl_net=t_dict['pnl_net'],
-                pnl_gross=t_dict.get('pnl_gross', 0.0),
-                commission=t_dict.get('commission', 0.0),
-                duration_seconds=t_dict.get('duration_seconds', 0.0),
-                regime_trend=r_trend,
-                regime_volatility=r_vol,
-                extra_json={}
-            )
-            new_trade_objs.append(trade)
-            
-        # Collect IDs before commit to ensure we have them
-        trade_ids = [t.trade_id for t in new_trade_objs]
+        # 3. Persist (existing run trades were deleted by the full reconstruction)
+        rows = self._build_trades(run_id, columns)
+        trade_ids = rows.get('trade_id', [])
         
-        self.db.add_all(new_trade_objs)
+        self._persist_trades(rows)
+        bump_versions(self.db, [run_id])
         self.db.commit()
         
         # 4. Trigger Analysis (New Architecture)
@@ -167,13 +378,9 @@ class TradeService:
             run.metrics_json = metrics
             self.db.commit()
 
-        # Optional: Trigger per-trade analysis (P2: MAE/MFE)
-        # This could be slow for thousands of trades, so maybe only do it for recent/active ones
-        # or offload to background task. For now, we'll skip or do a lightweight loop.
-        # Trigger per-trade analysis (P2: MAE/MFE)
-        # Use pre-collected IDs to avoid stale session objects
-        for tid in trade_ids:
-             router.calculate_trade_metrics(trade_id=tid, strategy_type=strategy_type)
+        # Trade-level analysis (P2: MAE/MFE): one batch over the whole run
+        if trade_ids:
+            router.calculate_run_trade_metrics(run_id, strategy_type=strategy_type)
 
-        return len(new_trade_objs)
+        return len(trade_ids)
 
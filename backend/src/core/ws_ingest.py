@@ -0,0 +1,161 @@
+"""
+WebSocket ingest channel for live / paper runs.
+
+One persistent connection per run (/api/ingest/ws/{run_id}) replaces a POST
+per order or execution. Text frames carry one message or a JSON array of
+messages:
+
+    {"seq": 17, "type": "order" | "execution" | "bar", "data": {...}}
+
+`data` follows OrderCreate / ExecutionCreate / BarCreate; `run_id` defaults
+to the run of the connection. Messages are buffered and committed together
+once the batch is `max_batch` messages or `window_ms` old, then acknowledged
+cumulatively:
+
+    {"type": "ack", "seq": 42, "count": 25}           committed up to seq 42
+    {"type": "error", "seq": 18, "error": "..."}      message rejected, not written
+    {"type": "error", "seq_from": 19, "seq_to": 42, "error": "..."}   batch failed
+
+Sequence numbers must increase; a seq at or below the last accepted one on
+the same connection is answered with a duplicate ack and skipped. A failed
+batch rewinds to the last committed seq, so its messages can be resent on
+the same connection. Seq tracking starts over with every connection: after
+a reconnect, resent messages are written again. That is harmless, since
+orders and bars are upserts and exact replays of committed executions are
+dropped by the execution replay filter (src.core.idempotency).
+"""
+import asyncio
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from src.core import ingest_log
+from src.core.sqlite_writer import single_writer
+from src.database.shards import shard_router
+from src.core.ndjson_ingest import EVENT_TYPES
+
+WS_COMMIT_WINDOW_MS = float(os.getenv("WS_INGEST_COMMIT_WINDOW_MS", "50"))
+WS_MAX_BATCH = int(os.getenv("WS_INGEST_MAX_BATCH", "1000"))
+
+
+class WebSocketIngestBuffer:
+    """
+    Message parsing and commit batching for one connection, independent of
+    the transport so it can be driven by the router (or tests).
+    """
+
+    def __init__(self, run_id: str, session_factory: Callable, window_ms: float = WS_COMMIT_WINDOW_MS,
+                 max_batch: int = WS_MAX_BATCH, enqueue: Optional[Callable] = None):
+        self.run_id = run_id
+        self.session_factory = session_factory
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.enqueue = enqueue
+
+        self.pending: List[Tuple[int, str, Any]] = []
+        self.first_pending_at: Optional[float] = None
+        self.last_seq = 0
+        self.committed_seq = 0
+        self.committed_count = 0
+        self.commits = 0
+        self.flushed_kinds: set = set()
+
+    # --- Intake ---
+
+    def accept(self, message: Any) -> Optional[Dict[str, Any]]:
+        """Buffers one decoded message. Returns a reply to send right away, if any."""
+        if not isinstance(message, dict):
+            return {"type": "error", "seq": None, "error": "message must be a JSON object"}
+        seq = message.get("seq")
+        if not isinstance(seq, int) or isinstance(seq, bool):
+            return {"type": "error", "seq": seq, "error": "seq must be an integer"}
+        if seq <= self.last_seq:
+            return {"type": "ack", "seq": seq, "duplicate": True}
+
+        event_type = message.get("type")
+        if event_type not in EVENT_TYPES:
+            return {"type": "error", "seq": seq, "error": f"unknown message type {event_type!r}"}
+        schema, kind = EVENT_TYPES[event_type]
+        data = dict(message.get("data") or {})
+        data.setdefault("run_id", self.run_id)
+        if data["run_id"] != self.run_id:
+            return {"type": "error", "seq": seq, "error": f"run_id {data['run_id']!r} does not match the channel"}
+        try:
+            item = schema.model_validate(data)
+        except ValidationError as e:
+            return {"type": "error", "seq": seq, "error": str(e.errors(include_url=False))}
+
+        self.last_seq = seq
+        if not self.pending:
+            self.first_pending_at = time.monotonic()
+        self.pending.append((seq, kind, item))
+        return None
+
+    def due(self) -> bool:
+        return bool(self.pending) and (
+            len(self.pending) >= self.max_batch or time.monotonic() - self.first_pending_at >= self.window
+        )
+
+    def seconds_until_due(self) -> Optional[float]:
+        """Receive timeout for the transport loop: None while nothing is pending."""
+        if not self.pending:
+            return None
+        return max(0.0, self.window - (time.monotonic() - self.first_pending_at))
+
+    # --- Commit ---
+
+    def _parts(self, batch: List[Tuple[int, str, Any]]) -> List[Tuple[str, List[Any]]]:
+        # Adjacent messages of the same kind become one bulk write, arrival order preserved
+        parts: List[Tuple[str, List[Any]]] = []
+        for _, kind, item in batch:
+            if parts and parts[-1][0] == kind:
+                parts[-1][1].append(item)
+            else:
+                parts.append((kind, [item]))
+        return parts
+
+    def _write(self, parts: List[Tuple[str, List[Any]]]):
+        db = self.session_factory()
+        try:
+            for kind, items in parts:
+                ingest_log.write_logged(db, kind, items)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    async def _commit(self, parts: List[Tuple[str, List[Any]]]):
+        # Shards have a writer lock each: the single writer serializes the central database only
+        if single_writer.enabled and not shard_router.enabled:
+            await single_writer.run_async(ingest_log.write_parts, parts)
+        else:
+            await asyncio.to_thread(self._write, parts)
+
+    async def flush(self) -> Optional[Dict[str, Any]]:
+        """Commits (or enqueues) the pending batch and returns the ack / error reply."""
+        if not self.pending:
+            return None
+        batch, self.pending, self.first_pending_at = self.pending, [], None
+        parts = self._parts(batch)
+        seq_from, seq_to = batch[0][0], batch[-1][0]
+        self.flushed_kinds = set()
+        try:
+            if self.enqueue is not None:
+                queue_seq = await self.enqueue(parts)
+                reply = {"type": "ack", "seq": seq_to, "count": len(batch), "queued": queue_seq}
+            else:
+                await self._commit(parts)
+                reply = {"type": "ack", "seq": seq_to, "count": len(batch)}
+        except Exception as e:
+            # Nothing of the batch was written: let the client resend it on this connection
+            self.last_seq = self.committed_seq
+            return {"type": "error", "seq_from": seq_from, "seq_to": seq_to, "error": str(e)}
+        self.committed_seq = seq_to
+        self.committed_count += len(batch)
+        self.commits += 1
+        self.flushed_kinds = {kind for kind, _ in parts}
+        return reply
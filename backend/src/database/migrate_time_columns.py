@@ -0,0 +1,170 @@
+"""
+Converts the hot time columns between DateTime and int64 epoch-microsecond
+storage (see src.database.time_columns), in place and keeping the existing
+composite indexes.
+
+    python -m src.database.migrate_time_columns --to epoch_us [--dry-run]
+    python -m src.database.migrate_time_columns --to datetime
+
+Run it with the API stopped, then start the services with the matching
+TIME_STORAGE. SQLite cannot change a column type, so each table is rebuilt
+(copy into a new table, drop, rename) in one transaction; PostgreSQL uses
+ALTER COLUMN ... TYPE ... USING. A market_bars hypertable cannot change its
+time column type: convert before enabling partitioning.
+"""
+import argparse
+import json
+import logging
+from typing import Dict, Optional
+
+from sqlalchemy import BigInteger, DateTime, MetaData, inspect
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from .models import Base
+from .time_columns import TIME_STORAGE
+
+logger = logging.getLogger(__name__)
+
+TIME_COLUMNS = {
+    "market_bars": ("ts_utc",),
+    "bars": ("ts_utc",),
+    "executions": ("exec_utc",),
+    "trades": ("entry_time", "exit_time"),
+}
+
+# SQLite: DateTime text ("YYYY-MM-DD HH:MM:SS[.ffffff]") <-> epoch microseconds
+_SQLITE_TO_EPOCH = ("(CAST(strftime('%s', {col}) AS INTEGER) * 1000000 "
+                    "+ CAST(substr({col} || '000000', 21, 6) AS INTEGER))")
+_SQLITE_TO_DATETIME = ("(strftime('%Y-%m-%d %H:%M:%S', {col} / 1000000, 'unixepoch') "
+                       "|| '.' || printf('%06d', {col} % 1000000))")
+
+_PG_TO_EPOCH = "TYPE BIGINT USING (EXTRACT(EPOCH FROM {col}) * 1000000)::bigint"
+_PG_TO_DATETIME = "TYPE TIMESTAMP WITHOUT TIME ZONE USING (TIMESTAMP 'epoch' + {col} * INTERVAL '1 microsecond')"
+
+
+def column_storage(bind, table: str, column: str) -> Optional[str]:
+    """"epoch_us" or "datetime" as the column is stored, None if the table is missing."""
+    inspector = inspect(bind)
+    if not inspector.has_table(table):
+        return None
+    for col in inspector.get_columns(table):
+        if col["name"] == column:
+            return "epoch_us" if "INT" in str(col["type"]).upper() else "datetime"
+    return None
+
+
+def check_time_storage(bind) -> bool:
+    """Logs an error when the database does not match TIME_STORAGE. Returns True if it matches."""
+    mismatched = [
+        f"{table}.{col}={storage}"
+        for table, cols in TIME_COLUMNS.items() for col in cols
+        for storage in [column_storage(bind, table, col)]
+        if storage is not None and storage != TIME_STORAGE
+    ]
+    if mismatched:
+        logger.error(f"TIME_STORAGE={TIME_STORAGE} but the database stores {', '.join(mismatched)}: "
+                     f"run python -m src.database.migrate_time_columns --to {TIME_STORAGE}")
+    return not mismatched
+
+
+def _target_table(table: str, target: str):
+    """The model table with the time columns switched to `target`, in a private MetaData."""
+    metadata = MetaData()
+    for t in Base.metadata.sorted_tables:
+        t.to_metadata(metadata)
+    copy = metadata.tables[table]
+    for col in TIME_COLUMNS[table]:
+        copy.c[col].type = BigInteger() if target == "epoch_us" else DateTime()
+    return copy
+
+
+def _rebuild_sqlite(conn, table: str, columns, target: str) -> int:
+    new = f"{table}__time_migration"
+    copy = _target_table(table, target)
+    create = str(CreateTable(copy).compile(conn)).replace(f"CREATE TABLE {table} ", f"CREATE TABLE {new} ", 1)
+    indexes = [str(CreateIndex(ix).compile(conn)).replace(f" ON {table} ", f" ON {new} ", 1)
+               for ix in copy.indexes]
+
+    # Index names are database-wide: free them before the new table takes them over
+    for (name,) in conn.exec_driver_sql(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (table,)
+    ).all():
+        conn.exec_driver_sql(f'DROP INDEX "{name}"')
+    conn.exec_driver_sql(create)
+    for ddl in indexes:
+        conn.exec_driver_sql(ddl)
+
+    convert = _SQLITE_TO_EPOCH if target == "epoch_us" else _SQLITE_TO_DATETIME
+    names = [c.name for c in copy.columns]
+    select = ", ".join(convert.format(col=name) if name in columns else name for name in names)
+    rows = conn.exec_driver_sql(f"INSERT INTO {new} ({', '.join(names)}) SELECT {select} FROM {table}").rowcount
+    conn.exec_driver_sql(f"DROP TABLE {table}")
+    conn.exec_driver_sql(f"ALTER TABLE {new} RENAME TO {table}")
+    return rows
+
+
+def _alter_postgresql(conn, table: str, columns, target: str) -> int:
+    convert = _PG_TO_EPOCH if target == "epoch_us" else _PG_TO_DATETIME
+    conn.exec_driver_sql(
+        f"ALTER TABLE {table} " + ", ".join(f"ALTER COLUMN {col} " + convert.format(col=col) for col in columns)
+    )
+    return conn.exec_driver_sql(f"SELECT count(*) FROM {table}").scalar()
+
+
+def migrate(bind, target: str, dry_run: bool = False) -> Dict[str, object]:
+    """
+    Converts every time column not yet stored as `target`. Returns, per
+    table, the number of rows converted (or "up to date" / "missing").
+    """
+    if target not in ("datetime", "epoch_us"):
+        raise ValueError(f"Unknown target storage {target!r}")
+    dialect = bind.dialect.name
+    if dialect not in ("sqlite", "postgresql"):
+        raise ValueError(f"Time column migration is not implemented for {dialect}")
+
+    results: Dict[str, object] = {}
+    for table, columns in TIME_COLUMNS.items():
+        storages = {col: column_storage(bind, table, col) for col in columns}
+        if None in storages.values():
+            results[table] = "missing"
+            continue
+        pending = [col for col, storage in storages.items() if storage != target]
+        if not pending:
+            results[table] = "up to date"
+            continue
+        if dry_run:
+            results[table] = f"would convert {', '.join(pending)}"
+            continue
+
+        with bind.connect() as conn:
+            if dialect == "sqlite":
+                # Dropping the old table must not cascade or trip foreign key checks
+                conn.exec_driver_sql("PRAGMA foreign_keys=OFF")
+                conn.commit()
+            with conn.begin():
+                if dialect == "sqlite":
+                    results[table] = _rebuild_sqlite(conn, table, pending, target)
+                else:
+                    results[table] = _alter_postgresql(conn, table, pending, target)
+            if dialect == "sqlite":
+                conn.exec_driver_sql("PRAGMA foreign_keys=ON")
+                conn.commit()
+        logger.info(f"{table}: {', '.join(pending)} converted to {target} ({results[table]} rows)")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert the hot time columns between DateTime and epoch-µs storage")
+    parser.add_argument("--to", required=True, choices=("datetime", "epoch_us"), help="Target storage")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be converted")
+    args = parser.parse_args()
+
+    from .connection import engine
+    print(json.dumps(migrate(engine, args.to, dry_run=args.dry_run), indent=2))
+    if args.to != TIME_STORAGE:
+        print(f"Start the services with TIME_STORAGE={args.to}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()
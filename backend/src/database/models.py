@@ -6,6 +6,8 @@ from sqlalchemy.orm import declarative_base, relationship
 from datetime import datetime
 import enum
 
+from .time_columns import UtcTime
+
 Base = declarative_base()
 
 # --- Enums ---
@@ -233,7 +235,7 @@ class Execution(Base):
     execution_id = Column(String, nullable=False)
     order_id = Column(String, nullable=False)
     
-    exec_utc = Column(DateTime, nullable=False)
+    exec_utc = Column(UtcTime(), nullable=False)
     
     price = Column(Float, nullable=False)
     quantity = Column(Float, nullable=False)
@@ -312,7 +314,7 @@ class Bar(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     series_id = Column(String, ForeignKey('run_series.series_id'), nullable=False)
     
-    ts_utc = Column(DateTime, nullable=False)
+    ts_utc = Column(UtcTime(), nullable=False)
     
     open = Column(Float, nullable=False)
     high = Column(Float, nullable=False)
@@ -372,7 +374,7 @@ class MarketBar(Base):
     __tablename__ = 'market_bars'
     
     series_id = Column(String, ForeignKey('market_series.series_id'), primary_key=True)
-    ts_utc = Column(DateTime, primary_key=True)
+    ts_utc = Column(UtcTime(), primary_key=True)
     
     open = Column(Float, nullable=False)
     high = Column(Float, nullable=False)
@@ -384,6 +386,38 @@ class MarketBar(Base):
     
     series = relationship("MarketSeries", back_populates="bars")
 
+class MarketRollup(Base):
+    """A derived MarketSeries holding coarser bars resampled from a base series (see src.core.rollups)."""
+    __tablename__ = 'market_rollups'
+
+    series_id = Column(String, ForeignKey('market_series.series_id'), primary_key=True)
+    base_series_id = Column(String, ForeignKey('market_series.series_id'), nullable=False)
+
+    timeframe = Column(String, nullable=False)
+    interval_seconds = Column(Integer, nullable=False)
+
+    created_utc = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('base_series_id', 'timeframe', name='uq_rollup_base_timeframe'),
+    )
+
+class MarketSeriesCoverage(Base):
+    """What a market series holds (both storage tiers), maintained by the bar writer (see src.core.coverage)."""
+    __tablename__ = 'market_series_coverage'
+
+    series_id = Column(String, ForeignKey('market_series.series_id'), primary_key=True)
+
+    first_utc = Column(DateTime, nullable=True)
+    last_utc = Column(DateTime, nullable=True)
+    bar_count = Column(Integer, default=0, nullable=False)
+
+    interval_seconds = Column(Integer, nullable=True) # Expected bar spacing, from the timeframe
+    gaps_json = Column(JSON, nullable=True) # [[after_us, before_us], ...] epoch-µs of the bars bounding each hole
+    gaps_dropped = Column(Integer, default=0, nullable=False) # Oldest gaps beyond the cap
+
+    updated_utc = Column(DateTime, default=datetime.utcnow, nullable=False)
+
 class RunSubscription(Base):
     __tablename__ = 'run_subscriptions'
     
@@ -401,8 +435,8 @@ class Trade(Base):
     symbol = Column(String, nullable=False)
     side = Column(Enum(Side), nullable=False) # LONG or SHORT
     
-    entry_time = Column(DateTime, nullable=False)
-    exit_time = Column(DateTime, nullable=False)
+    entry_time = Column(UtcTime(), nullable=False)
+    exit_time = Column(UtcTime(), nullable=False)
     
     entry_price = Column(Float, nullable=False)
     exit_price = Column(Float, nullable=False)
@@ -431,6 +465,46 @@ class Trade(Base):
         Index('idx_trades_symbol', 'symbol'),
     )
 
+class TradeReconstructionState(Base):
+    """Incremental trade reconstruction progress of a run (see TradeService.update_trades_incremental)."""
+    __tablename__ = 'trade_reconstruction_state'
+
+    run_id = Column(String, ForeignKey('strategy_runs.run_id'), primary_key=True)
+
+    # Watermark: highest executions.id and exec_utc already folded into trades
+    last_execution_pk = Column(Integer, default=0, nullable=False)
+    last_execution_id = Column(String, nullable=True)
+    last_exec_utc = Column(DateTime, nullable=True)
+
+    open_lots_json = Column(JSON, nullable=False) # {symbol: [FIFO lot, ...]}
+    orphans_json = Column(JSON, nullable=False) # {order_id: earliest exec_utc} for executions whose order is missing
+
+    executions_since_checkpoint = Column(Integer, default=0, nullable=False)
+    updated_utc = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+class TradeReconstructionCheckpoint(Base):
+    """Snapshot of the reconstruction state before every execution at or after `boundary_utc`."""
+    __tablename__ = 'trade_reconstruction_checkpoints'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    run_id = Column(String, ForeignKey('strategy_runs.run_id'), nullable=False)
+
+    boundary_utc = Column(DateTime, nullable=False)
+    open_lots_json = Column(JSON, nullable=False)
+    orphans_json = Column(JSON, nullable=False)
+
+    __table_args__ = (
+        Index('idx_trade_ckpt_run_boundary', 'run_id', 'boundary_utc'),
+    )
+
+class RunDataVersion(Base):
+    """Change counter of a run's orders, executions and trades; keys the metrics cache (see src.core.metrics_cache)."""
+    __tablename__ = 'run_data_versions'
+
+    run_id = Column(String, ForeignKey('strategy_runs.run_id'), primary_key=True)
+    version = Column(Integer, default=0, nullable=False)
+    updated_utc = Column(DateTime, default=datetime.utcnow, nullable=False)
+
 # --- ML Studio Models ---
 
 class MlRewardFunction(Base):
@@ -0,0 +1,268 @@
+"""
+Per-run SQLite shards.
+
+With one trading_data.db, parallel live runs all queue on its single WAL
+writer lock. RUN_SHARDS=run (or =instance) moves the high-volume per-run
+tables into one database file per run (or per strategy instance) under
+RUN_SHARD_DIR; catalog, market data and ML tables stay in the central
+database.
+
+Routing goes through the session: run_session(run_id) binds the sharded
+tables to the run's shard engine and everything else to the central one,
+so services keep querying one Session. Every shard connection ATTACHes the
+central database, which keeps joins such as trades -> strategy_runs working
+unchanged. Runs that already have rows in the central tables stay there
+until moved:
+
+    python -m src.database.shards --move RUN_ID [--move ...] | --move-all
+
+Cross-run reads fan out over the runs' sessions with a thread pool
+(fan_out). SQLite only; ignored on other backends.
+"""
+import argparse
+import hashlib
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, event, insert, select
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import Session
+
+from .connection import DATABASE_URL, SessionLocal, engine, make_engine
+from .models import (
+    Base, Execution, IngestEvent, Order, OrderOcoGroup, OrderOcoLink, StrategyRun, Trade,
+    TradeReconstructionCheckpoint, TradeReconstructionState,
+)
+
+logger = logging.getLogger(__name__)
+
+# "off", "run" (one file per run) or "instance" (one file per strategy instance)
+MODE = os.getenv("RUN_SHARDS", "off").lower()
+MAX_OPEN = int(os.getenv("RUN_SHARD_MAX_OPEN", "64"))
+FAN_OUT_WORKERS = int(os.getenv("RUN_SHARD_WORKERS", "8"))
+
+# Everything keyed by run_id that grows with the run's activity
+SHARDED_MODELS = (
+    Order, Execution, OrderOcoGroup, OrderOcoLink, Trade,
+    TradeReconstructionState, TradeReconstructionCheckpoint, IngestEvent,
+)
+SHARDED_TABLES = [model.__table__ for model in SHARDED_MODELS]
+
+
+def _default_root() -> str:
+    explicit = os.getenv("RUN_SHARD_DIR")
+    if explicit:
+        return explicit
+    if DATABASE_URL.startswith("sqlite:///") and DATABASE_URL != "sqlite:///:memory:":
+        return DATABASE_URL[len("sqlite:///"):] + ".shards"
+    return "run_shards"
+
+
+def _file_name(key: str) -> str:
+    safe = re.sub(r"[^A-Za-z0-9_.-]", "_", key)
+    if safe != key:
+        safe += "-" + hashlib.sha1(key.encode()).hexdigest()[:8]
+    return safe + ".db"
+
+
+class ShardRouter:
+    def __init__(self, central: Engine, mode: str = "off", root: str = "run_shards", max_open: int = 64):
+        self.central = central
+        self.mode = mode
+        self.root = root
+        self.max_open = max_open
+        self.central_path = make_url(str(central.url)).database if central.dialect.name == "sqlite" else None
+
+        self._engines: "OrderedDict[str, Engine]" = OrderedDict()
+        self._keys: Dict[str, str] = {}
+        self._placement: Dict[str, bool] = {}
+        self._lock = threading.RLock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode in ("run", "instance") and bool(self.central_path) and self.central_path != ":memory:"
+
+    # --- Placement ---
+
+    def shard_key(self, run_id: str) -> str:
+        if self.mode != "instance":
+            return run_id
+        key = self._keys.get(run_id)
+        if key is None:
+            with self.central.connect() as conn:
+                key = conn.execute(
+                    select(StrategyRun.instance_id).where(StrategyRun.run_id == run_id)
+                ).scalar()
+            if key is None:
+                # Run not registered (yet): its own file
+                return run_id
+            self._keys[run_id] = key
+        return key
+
+    def path(self, run_id: str) -> str:
+        return os.path.join(self.root, _file_name(self.shard_key(run_id)))
+
+    def is_sharded(self, run_id: str) -> bool:
+        """
+        True when the run's per-run rows belong in a shard, i.e. it has none
+        in the central tables (runs ingested before sharding stay central).
+        """
+        placed = self._placement.get(run_id)
+        if placed is None:
+            with self.central.connect() as conn:
+                placed = not any(
+                    conn.execute(select(model.run_id).where(model.run_id == run_id).limit(1)).first()
+                    for model in (Order, Execution, IngestEvent, Trade)
+                )
+            with self._lock:
+                self._placement[run_id] = placed
+        return placed
+
+    # --- Engines and sessions ---
+
+    def engine_for(self, run_id: str) -> Engine:
+        key = self.shard_key(run_id)
+        with self._lock:
+            eng = self._engines.get(key)
+            if eng is not None:
+                self._engines.move_to_end(key)
+                return eng
+            os.makedirs(self.root, exist_ok=True)
+            eng = make_engine(f"sqlite:///{os.path.join(self.root, _file_name(key))}")
+            central_path = self.central_path
+
+            @event.listens_for(eng, "connect")
+            def attach_central(dbapi_connection, connection_record):
+                # Unqualified names resolve to the shard first, then to the central tables
+                dbapi_connection.execute("ATTACH DATABASE ? AS central", (central_path,))
+
+            Base.metadata.create_all(eng, tables=SHARDED_TABLES)
+            self._engines[key] = eng
+            while len(self._engines) > self.max_open:
+                _, evicted = self._engines.popitem(last=False)
+                evicted.dispose()
+            return eng
+
+    def binds_for(self, run_id: str) -> Dict[Any, Engine]:
+        eng = self.engine_for(run_id)
+        binds: Dict[Any, Engine] = {model: eng for model in SHARDED_MODELS}
+        # Core statements (bulk writers, raw connections) are routed by table
+        binds.update({table: eng for table in SHARDED_TABLES})
+        return binds
+
+    def session(self, run_id: Optional[str], write: bool = False) -> Session:
+        """
+        Session for one run's data: its shard for the per-run tables, central
+        for the rest. Reads of a run without a shard file stay central, so
+        looking up unknown runs creates nothing.
+        """
+        if not run_id or not self.enabled or not self.is_sharded(run_id):
+            return SessionLocal()
+        if not write and self.shard_key(run_id) not in self._engines and not os.path.exists(self.path(run_id)):
+            return SessionLocal()
+        return Session(bind=self.central, binds=self.binds_for(run_id), autoflush=False)
+
+    def fan_out(self, run_ids: Iterable[str], fn: Callable[[Session, str], Any],
+                workers: int = FAN_OUT_WORKERS) -> List[Any]:
+        """fn(db, run_id) for every run, each on its own session, in parallel; results in input order."""
+        def call(run_id: str) -> Any:
+            db = self.session(run_id)
+            try:
+                return fn(db, run_id)
+            finally:
+                db.close()
+
+        run_ids = list(run_ids)
+        if len(run_ids) <= 1:
+            return [call(rid) for rid in run_ids]
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(run_ids)))) as pool:
+            return list(pool.map(call, run_ids))
+
+    def shard_run_ids(self, table) -> List[str]:
+        """Distinct run ids in one sharded table across every shard file under root."""
+        if not self.enabled or not os.path.isdir(self.root):
+            return []
+        run_ids: List[str] = []
+        for name in sorted(os.listdir(self.root)):
+            if not name.endswith(".db"):
+                continue
+            eng = make_engine(f"sqlite:///{os.path.join(self.root, name)}")
+            try:
+                with eng.connect() as conn:
+                    run_ids.extend(conn.execute(select(table.c.run_id).distinct()).scalars())
+            finally:
+                eng.dispose()
+        return list(dict.fromkeys(run_ids))
+
+    # --- Moving legacy runs ---
+
+    def move_run(self, run_id: str) -> Dict[str, int]:
+        """Copies a run's rows from the central per-run tables into its shard, then deletes them centrally."""
+        eng = self.engine_for(run_id)
+        moved: Dict[str, int] = {}
+        with self.central.begin() as src, eng.begin() as dst:
+            for table in SHARDED_TABLES:
+                rows = [dict(row._mapping) for row in src.execute(select(table).where(table.c.run_id == run_id))]
+                if rows:
+                    dst.execute(insert(table), rows)
+                moved[table.name] = len(rows)
+            for table in reversed(SHARDED_TABLES):
+                src.execute(delete(table).where(table.c.run_id == run_id))
+        with self._lock:
+            self._placement[run_id] = True
+        return moved
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode if self.enabled else "off",
+            "root": self.root,
+            "open_engines": len(self._engines),
+            "max_open": self.max_open,
+        }
+
+
+shard_router = ShardRouter(engine, mode=MODE, root=_default_root(), max_open=MAX_OPEN)
+if MODE != "off" and not shard_router.enabled:
+    logger.warning(f"RUN_SHARDS={MODE} ignored: needs a SQLite database file")
+
+
+def run_session(run_id: Optional[str], write: bool = True) -> Session:
+    return shard_router.session(run_id, write=write)
+
+
+def get_run_db(run_id: Optional[str] = None):
+    """Dependency: session routed to the run's shard (the request's run_id path or query parameter)."""
+    db = shard_router.session(run_id)
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move runs from the central database into per-run shards")
+    parser.add_argument("--move", action="append", default=[], help="Run id to move (repeatable)")
+    parser.add_argument("--move-all", action="store_true", help="Move every run with rows in the central tables")
+    args = parser.parse_args()
+
+    if not shard_router.enabled:
+        parser.error("set RUN_SHARDS=run or RUN_SHARDS=instance (SQLite database file)")
+    run_ids = list(args.move)
+    if args.move_all:
+        with engine.connect() as conn:
+            for table in SHARDED_TABLES:
+                run_ids.extend(rid for rid in conn.execute(select(table.c.run_id).distinct()).scalars()
+                               if rid not in run_ids)
+    for run_id in run_ids:
+        moved = shard_router.move_run(run_id)
+        print(f"{run_id}: {moved}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()
@@ -0,0 +1,99 @@
+"""
+Storage of the hot time columns: MarketBar.ts_utc, Bar.ts_utc,
+Execution.exec_utc, Trade.entry_time / exit_time.
+
+TIME_STORAGE=datetime (default) keeps them as DateTime, i.e. ISO text on
+SQLite that is parsed back into a Python datetime per row on every read.
+TIME_STORAGE=epoch_us stores BIGINT microseconds since the Unix epoch (UTC):
+ORM code still sees naive-UTC datetimes through `EpochMicros`, while bulk
+readers select the raw integers (`raw_time`) and turn a whole column into a
+datetime64 array at once (`time_array`). Existing databases are converted
+with `python -m src.database.migrate_time_columns --to epoch_us`.
+"""
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import BigInteger, DateTime, type_coerce
+from sqlalchemy.types import TypeDecorator
+
+TIME_STORAGE = os.getenv("TIME_STORAGE", "datetime").lower()
+if TIME_STORAGE not in ("datetime", "epoch_us"):
+    raise ValueError(f"Unknown TIME_STORAGE {TIME_STORAGE!r} (datetime | epoch_us)")
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def to_epoch_us(value: datetime) -> int:
+    """Datetime (naive = UTC) -> integer microseconds since the epoch."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    delta = value - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def from_epoch_us(value: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=int(value))
+
+
+class EpochMicros(TypeDecorator):
+    """BIGINT epoch microseconds, exposed to Python as naive-UTC datetimes."""
+    impl = BigInteger
+    cache_ok = True
+
+    @property
+    def python_type(self):
+        return datetime
+
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, int):
+            return value
+        return to_epoch_us(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else from_epoch_us(value)
+
+
+def UtcTime():
+    """Column type of the hot time columns under TIME_STORAGE."""
+    return EpochMicros() if TIME_STORAGE == "epoch_us" else DateTime()
+
+
+def is_epoch(column) -> bool:
+    return isinstance(column.type, EpochMicros)
+
+
+def raw_time(column):
+    """Selects a time column without the per-row datetime conversion (epoch ints when stored so)."""
+    return type_coerce(column, BigInteger).label(column.key) if is_epoch(column) else column
+
+
+# --- NumPy / pandas conversion ---
+
+def epoch_us_to_datetime64(values: Iterable[int]) -> np.ndarray:
+    """Epoch microseconds -> datetime64[ns] array (no Python datetimes involved)."""
+    if not isinstance(values, np.ndarray):
+        values = np.fromiter(values, dtype="int64")
+    return values.astype("int64", copy=False).astype("datetime64[us]").astype("datetime64[ns]")
+
+
+def datetime64_to_epoch_us(values) -> np.ndarray:
+    """datetime64 array (any unit, naive UTC) -> int64 epoch microseconds."""
+    return np.asarray(values).astype("datetime64[us]").view("int64")
+
+
+def time_array(values, column=None, epoch: Optional[bool] = None) -> np.ndarray:
+    """
+    Column values fetched through `raw_time` -> datetime64[ns] array.
+    Epoch storage converts the integers in one step; DateTime storage goes
+    through pandas.
+    """
+    if epoch is None:
+        epoch = column is not None and is_epoch(column)
+    if epoch:
+        return epoch_us_to_datetime64(values)
+    if isinstance(values, np.ndarray) and values.dtype.kind == "M":
+        return values.astype("datetime64[ns]", copy=False)  # already converted (e.g. by a DataFrame)
+    return pd.to_datetime(pd.Series(values, dtype=object)).to_numpy(dtype="datetime64[ns]")
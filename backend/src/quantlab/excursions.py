@@ -0,0 +1,42 @@
+import numpy as np
+from typing import Tuple
+
+
+def excursions(ts: np.ndarray, high: np.ndarray, low: np.ndarray,
+               entry_ts: np.ndarray, exit_ts: np.ndarray, entry_price: np.ndarray,
+               is_long: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    MAE / MFE of many trades against one bar series in a single pass.
+
+    `ts` holds the sorted bar times; the trade arrays are aligned with each
+    other and use the same time unit. A trade is measured over the bars with
+    entry <= ts <= exit. Returns (mae, mfe), both clipped at 0, NaN for
+    trades without a bar in their window.
+    """
+    n = len(entry_ts)
+    mae = np.full(n, np.nan)
+    mfe = np.full(n, np.nan)
+    if n == 0 or len(ts) == 0:
+        return mae, mfe
+
+    lo = np.searchsorted(ts, entry_ts, side="left")
+    hi = np.searchsorted(ts, exit_ts, side="right")
+    # Trades in window-start order keep the in-between reduceat segments short
+    sel = np.flatnonzero(hi > lo)
+    sel = sel[np.argsort(lo[sel], kind="stable")]
+    if not len(sel):
+        return mae, mfe
+
+    # reduceat over [lo0, hi0, lo1, hi1, ...]: even slots are the trade windows.
+    # The padding keeps an end bound equal to len(ts) a valid index.
+    bounds = np.empty(2 * len(sel), dtype=np.intp)
+    bounds[0::2] = lo[sel]
+    bounds[1::2] = hi[sel]
+    max_high = np.maximum.reduceat(np.append(np.asarray(high, dtype="float64"), -np.inf), bounds)[0::2]
+    min_low = np.minimum.reduceat(np.append(np.asarray(low, dtype="float64"), np.inf), bounds)[0::2]
+
+    price = np.asarray(entry_price, dtype="float64")[sel]
+    long = np.asarray(is_long, dtype=bool)[sel]
+    mfe[sel] = np.maximum(np.where(long, max_high - price, price - min_low), 0.0)
+    mae[sel] = np.maximum(np.where(long, price - min_low, max_high - price), 0.0)
+    return mae, mfe
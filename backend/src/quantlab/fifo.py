@@ -0,0 +1,165 @@
+import numpy as np
+import pandas as pd
+from array import array
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Same tolerance as MetricsEngine.apply_execution
+QTY_EPSILON = 0.0000001
+
+# Open lots per symbol code, FIFO order: [(row, remaining quantity), ...]
+OpenLots = Dict[int, List[Tuple[int, float]]]
+
+
+@dataclass
+class FifoResult:
+    """
+    Columnar FIFO matches. `entry` / `exit` index the input rows (opening
+    lot, closing fill); `quantity` is the matched size of each trade, in
+    the order MetricsEngine.reconstruct_trades would emit them.
+    """
+    entry: np.ndarray
+    exit: np.ndarray
+    quantity: np.ndarray
+    open_lots: OpenLots
+    snapshots: List[OpenLots] = field(default_factory=list)
+
+
+def fifo_match(symbol: np.ndarray, is_buy: np.ndarray, quantity: np.ndarray,
+               n_open: int = 0, snapshots: Sequence[int] = ()) -> FifoResult:
+    """
+    FIFO lot matching over columnar fills, already in processing order.
+
+    `symbol` holds integer codes (e.g. from pd.factorize). The first
+    `n_open` rows are lots carried over from an earlier pass: they are
+    queued as-is instead of matched. A lot is just its row index, with its
+    remaining size kept in one list, so no per-fill object is allocated.
+    `snapshots` lists row positions (ascending) at which to capture the
+    open lots before that row is processed, for reconstruction checkpoints.
+    """
+    sym = np.asarray(symbol).tolist()
+    buy = np.asarray(is_buy, dtype=bool).tolist()
+    rem = np.asarray(quantity, dtype="float64").tolist()
+    n = len(sym)
+
+    # Codes are small non-negative ints: one queue per code, indexed directly
+    books = [deque() for _ in range(max(sym) + 1 if sym else 0)]
+    for i in range(min(n_open, n)):
+        books[sym[i]].append(i)
+
+    entries, exits, qtys = array("q"), array("q"), array("d")
+    taken: List[OpenLots] = []
+    stops = iter(list(snapshots) + [n + 1])
+    next_stop = next(stops)
+    while next_stop < n_open:
+        taken.append(_open_lots(books, rem))
+        next_stop = next(stops)
+
+    eps = QTY_EPSILON
+    add_entry, add_exit, add_qty = entries.append, exits.append, qtys.append
+    for i in range(n_open, n):
+        while i == next_stop:
+            taken.append(_open_lots(books, rem))
+            next_stop = next(stops)
+        book = books[sym[i]]
+        remaining = rem[i]
+        side = buy[i]
+        while remaining > 0 and book:
+            top = book[0]
+            if buy[top] == side:
+                break
+            lot = rem[top]
+            matched = remaining if remaining <= lot else lot
+            add_entry(top)
+            add_exit(i)
+            add_qty(matched)
+            remaining -= matched
+            lot -= matched
+            rem[top] = lot
+            if lot <= eps:
+                book.popleft()
+        rem[i] = remaining
+        if remaining > eps:
+            book.append(i)
+    while next_stop <= n:
+        taken.append(_open_lots(books, rem))
+        next_stop = next(stops)
+
+    return FifoResult(
+        entry=np.frombuffer(entries, dtype=np.int64) if entries else np.empty(0, dtype=np.int64),
+        exit=np.frombuffer(exits, dtype=np.int64) if exits else np.empty(0, dtype=np.int64),
+        quantity=np.frombuffer(qtys, dtype=np.float64) if qtys else np.empty(0, dtype=np.float64),
+        open_lots=_open_lots(books, rem),
+        snapshots=taken,
+    )
+
+
+def _open_lots(books: List[deque], rem: List[float]) -> OpenLots:
+    return {code: [(i, rem[i]) for i in book] for code, book in enumerate(books) if book}
+
+
+def trade_columns(result: FifoResult, symbols: Sequence[Any], symbol: np.ndarray, is_buy: np.ndarray,
+                  price: np.ndarray, ts: np.ndarray, order_id: Optional[np.ndarray] = None,
+                  execution_id: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """
+    Expands matches into trade columns (the keys of the reconstruct_trades
+    dicts), ready for a bulk insert. `symbols` maps codes back to names;
+    `ts` is datetime64. trade_id is only built when both id columns are given.
+    """
+    entry, exit_ = result.entry, result.exit
+    long = np.asarray(is_buy, dtype=bool)[entry]
+    price = np.asarray(price, dtype="float64")
+    ts = np.asarray(ts, dtype="datetime64[us]")
+    entry_price, exit_price = price[entry], price[exit_]
+    entry_time, exit_time = ts[entry], ts[exit_]
+    pnl = (exit_price - entry_price) * result.quantity * np.where(long, 1.0, -1.0)
+
+    columns = {
+        "symbol": np.asarray(symbols, dtype=object)[np.asarray(symbol)[entry]],
+        "side": np.where(long, "BUY", "SELL").astype(object),
+        "entry_time": entry_time,
+        "exit_time": exit_time,
+        "entry_price": entry_price,
+        "exit_price": exit_price,
+        "pnl_net": pnl,
+        "pnl_gross": pnl,
+        "quantity": result.quantity,
+        "duration_seconds": (exit_time - entry_time).astype("int64") / 1e6,
+    }
+    if order_id is not None and execution_id is not None:
+        ids = [f"{o}_{e}" for o, e in zip(np.asarray(order_id, dtype=object)[entry].tolist(),
+                                           np.asarray(execution_id, dtype=object)[exit_].tolist())]
+        columns = {"trade_id": np.array(ids, dtype=object), **columns}
+    return columns
+
+
+def to_records(columns: Dict[str, np.ndarray]) -> List[Dict[str, Any]]:
+    """Columns back to reconstruct_trades-style dicts (datetimes as datetime objects)."""
+    lists = {
+        key: (col.astype("datetime64[us]").tolist() if col.dtype.kind == "M" else col.tolist())
+        for key, col in columns.items()
+    }
+    keys = list(lists)
+    return [dict(zip(keys, row)) for row in zip(*lists.values())]
+
+
+def reconstruct_columnar(exec_utc: np.ndarray, symbol: np.ndarray, is_buy: np.ndarray,
+                         quantity: np.ndarray, price: np.ndarray, order_id: Optional[np.ndarray] = None,
+                         execution_id: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """
+    Columnar counterpart of MetricsEngine.reconstruct_trades: fills with a
+    known order, in any order (stable-sorted by exec_utc here), to trade
+    columns.
+    """
+    exec_utc = np.asarray(exec_utc, dtype="datetime64[us]")
+    order = np.argsort(exec_utc, kind="stable")
+    codes, symbols = pd.factorize(np.asarray(symbol, dtype=object)[order])
+
+    def take(col):
+        return None if col is None else np.asarray(col)[order]
+
+    result = fifo_match(codes, take(is_buy), take(quantity))
+    return trade_columns(result, symbols, codes, take(is_buy), take(price), exec_utc[order],
+                         take(order_id), take(execution_id))
+
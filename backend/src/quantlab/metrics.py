@@ -12,8 +12,6 @@ class MetricsEngine:
         orders_map = {o.order_id: o for o in orders}
         
         # 2. Reconstruct Trades (Simplified: 1 Round Trip = Trade)
-        trades = []
-        
         # Temporary tracking
         open_positions = {} 
         
@@ -26,66 +24,75 @@ class MetricsEngine:
             order = orders_map.get(exc.order_id)
             if not order:
                 continue
-                
-            side = order.side.name if hasattr(order.side, 'name') else str(order.side)
-            symbol = order.symbol
+            MetricsEngine.apply_execution(open_positions, exc, order, completed_trades)
+        
+        return completed_trades
+
+    @staticmethod
+    def apply_execution(open_positions: Dict[str, List[Dict[str, Any]]], exc: Any, order: Any,
+                        completed_trades: List[Dict[str, Any]]):
+        """
+        FIFO step: matches one execution against the open lots of its symbol,
+        appending closed trades to `completed_trades` and any remainder as a
+        new lot. Shared by the full and the incremental reconstruction.
+        """
+        side = order.side.name if hasattr(order.side, 'name') else str(order.side)
+        symbol = order.symbol
+        
+        # FIFO Stack
+        if symbol not in open_positions:
+            open_positions[symbol] = []
             
-            # FIFO Stack
-            if symbol not in open_positions:
-                open_positions[symbol] = []
-                
-            stack = open_positions[symbol]
+        stack = open_positions[symbol]
+        
+        remaining_qty = exc.quantity
+        
+        # While we have something in stack and sides are opposite
+        while remaining_qty > 0 and stack:
+            top = stack[0] # FIFO
             
-            remaining_qty = exc.quantity
+            # Check for opposite side
+            is_opposite = (side == 'BUY' and top['side'] == 'SELL') or (side == 'SELL' and top['side'] == 'BUY')
             
-            # While we have something in stack and sides are opposite
-            while remaining_qty > 0 and stack:
-                top = stack[0] # FIFO
+            if is_opposite:
+                matched_qty = min(remaining_qty, top['quantity'])
                 
-                # Check for opposite side
-                is_opposite = (side == 'BUY' and top['side'] == 'SELL') or (side == 'SELL' and top['side'] == 'BUY')
+                entry_price = top['price']
+                exit_price = exc.price
                 
-                if is_opposite:
-                    matched_qty = min(remaining_qty, top['quantity'])
-                    
-                    entry_price = top['price']
-                    exit_price = exc.price
-                    
-                    direction = 1 if top['side'] == 'BUY' else -1
-                    pnl = (exit_price - entry_price) * matched_qty * direction
-                    
-                    completed_trades.append({
-                        "trade_id": f"{top['order_id']}_{exc.execution_id}", # Synthetic ID
-                        "symbol": symbol,
-                        "side": top['side'], 
-                        "entry_time": top['time'],
-                        "exit_time": exc.exec_utc,
-                        "entry_price": entry_price,
-                        "exit_price": exit_price,
-                        "pnl_net": pnl,
-                        "pnl_gross": pnl,
-                        "quantity": matched_qty,
-                        "duration_seconds": (exc.exec_utc - top['time']).total_seconds()
-                    })
-                    
-                    remaining_qty -= matched_qty
-                    top['quantity'] -= matched_qty
-                    
-                    if top['quantity'] <= 0.0000001:
-                        stack.pop(0) # Remove filled
-                else:
-                    break
-                    
-            if remaining_qty > 0.0000001:
-                stack.append({
-                    "order_id": exc.order_id,
-                    "price": exc.price,
-                    "quantity": remaining_qty,
-                    "side": side,
-                    "time": exc.exec_utc
+                direction = 1 if top['side'] == 'BUY' else -1
+                pnl = (exit_price - entry_price) * matched_qty * direction
+                
+                completed_trades.append({
+                    "trade_id": f"{top['order_id']}_{exc.execution_id}", # Synthetic ID
+                    "symbol": symbol,
+                    "side": top['side'], 
+                    "entry_time": top['time'],
+                    "exit_time": exc.exec_utc,
+                    "entry_price": entry_price,
+                    "exit_price": exit_price,
+                    "pnl_net": pnl,
+                    "pnl_gross": pnl,
+                    "quantity": matched_qty,
+                    "duration_seconds": (exc.exec_utc - top['time']).total_seconds()
                 })
-        
-        return completed_trades
+                
+                remaining_qty -= matched_qty
+                top['quantity'] -= matched_qty
+                
+                if top['quantity'] <= 0.0000001:
+                    stack.pop(0) # Remove filled
+            else:
+                break
+                
+        if remaining_qty > 0.0000001:
+            stack.append({
+                "order_id": exc.order_id,
+                "price": exc.price,
+                "quantity": remaining_qty,
+                "side": side,
+                "time": exc.exec_utc
+            })
 
     @staticmethod
     def reconstruct_and_calculate(executions: List[Any], orders: List[Any]) -> Dict[str, Any]:
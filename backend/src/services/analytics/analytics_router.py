@@ -34,3 +34,10 @@ class AnalyticsRouter:
         """
         handler = self.handlers.get(strategy_type, self.handlers['DEFAULT'])
         handler.calculate_mae_mfe(trade_id)
+
+    def calculate_run_trade_metrics(self, run_id: str, trade_ids: list = None, strategy_type: str = 'DEFAULT') -> int:
+        """
+        Trade-level metrics (MAE/MFE) for a whole run, or the given trades of it, in one batch.
+        """
+        handler = self.handlers.get(strategy_type, self.handlers['DEFAULT'])
+        return handler.calculate_run_mae_mfe(run_id, trade_ids=trade_ids)
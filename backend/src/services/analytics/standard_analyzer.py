@@ -1,8 +1,23 @@
+from sqlalchemy import String, select, type_coerce, update
 from sqlalchemy.orm import Session
 from src.database.models import Trade, Bar, Side, Execution, Order
+from src.database.shards import shard_router
+from src.database.time_columns import raw_time, time_array
+from src.core.metrics_cache import bump_versions
+from src.quantlab.excursions import excursions
 import pandas as pd
 import numpy as np
 
+# Trade columns read by calculate_portfolio_metrics
+TRADE_COLUMNS = ["pnl_net", "exit_time", "side", "entry_price", "exit_price", "quantity", "commission", "mae", "mfe"]
+TRADE_DTYPES = {c: "float64" for c in TRADE_COLUMNS if c not in ("exit_time", "side")}
+
+
+def _fetch(db: Session, stmt, model) -> list:
+    """Rows of a column select, run on the model's connection (Core rows, no ORM result processing)."""
+    return db.connection(bind_arguments={"clause": model.__table__}).execute(stmt).all()
+
+
 class StandardAnalyzer:
     def __init__(self, db_session: Session):
         self.db = db_session
@@ -12,188 +27,159 @@ class StandardAnalyzer:
         Calculates MAE and MFE for a single trade based on bar data.
         Phase 4 (Execution Analysis) - prioritized for individual trade context.
         """
-        trade = self.db.query(Trade).filter(Trade.trade_id == trade_id).first()
+        trade = self.db.query(Trade.run_id).filter(Trade.trade_id == trade_id).first()
         if not trade:
             return
+        self.calculate_run_mae_mfe(trade.run_id, trade_ids=[trade_id])
 
-        # Fetch bars covering the trade duration
-        # Bar does not have symbol directly, it is on RunSeries
-        from src.database.models import RunSeries
-        
-        bars = self.db.query(Bar).join(RunSeries, Bar.series_id == RunSeries.series_id).filter(
-            RunSeries.run_id == trade.run_id,
-            RunSeries.symbol == trade.symbol,
-            Bar.ts_utc >= trade.entry_time,
-            Bar.ts_utc <= trade.exit_time
-        ).all()
-
-        if not bars:
-            # Not enough data to calculate MAE/MFE
-            return
+    def calculate_run_mae_mfe(self, run_id: str, trade_ids: list = None) -> int:
+        """
+        MAE / MFE for all trades of a run (or the given subset) in one batch:
+        one bar load per symbol, a vectorized window reduction and a single
+        bulk UPDATE + commit. Trades without bars in their window are left
+        untouched. Returns the number of trades updated.
+        """
+        query = self.db.query(
+            Trade.trade_id, Trade.symbol, Trade.side, Trade.entry_time, Trade.exit_time, Trade.entry_price
+        ).filter(Trade.run_id == run_id)
+        if trade_ids is not None:
+            if not trade_ids:
+                return 0
+            query = query.filter(Trade.trade_id.in_(trade_ids))
+        trades = pd.DataFrame(query.all(), columns=["trade_id", "symbol", "side", "entry_time", "exit_time", "entry_price"])
+        if trades.empty:
+            return 0
 
-        highs = [b.high for b in bars]
-        lows = [b.low for b in bars]
-        
-        max_price = max(highs)
-        min_price = min(lows)
+        updates = []
+        for symbol, group in trades.groupby("symbol", sort=False):
+            entry = group["entry_time"].to_numpy(dtype="datetime64[ns]")
+            exit_ = group["exit_time"].to_numpy(dtype="datetime64[ns]")
+            bars = self._excursion_bars(run_id, symbol, entry.min(), exit_.max())
+            if bars is None:
+                continue
+            mae, mfe = excursions(bars[0], bars[1], bars[2], entry, exit_,
+                                  group["entry_price"].to_numpy(dtype="float64"),
+                                  (group["side"] == Side.BUY).to_numpy())
+            found = ~np.isnan(mae)
+            updates.extend(
+                {"trade_id": tid, "mae": float(a), "mfe": float(f)}
+                for tid, a, f in zip(group["trade_id"].to_numpy()[found], mae[found], mfe[found])
+            )
 
-        if trade.side == Side.BUY:
-            mfe = max_price - trade.entry_price
-            mae = trade.entry_price - min_price
-        else:
-            mfe = trade.entry_price - min_price
-            mae = max_price - trade.entry_price
+        if updates:
+            self.db.execute(update(Trade), updates)  # ORM bulk update by primary key
+            bump_versions(self.db, [run_id])
+            self.db.commit()
+        return len(updates)
 
-        trade.mae = max(0.0, mae)
-        trade.mfe = max(0.0, mfe)
-        
-        self.db.commit()
+    def _excursion_bars(self, run_id: str, symbol: str, start, end):
+        """
+        (ts, high, low) arrays of the bars a run's trades on `symbol` are
+        measured against: the finest market series the run subscribes to,
+        else the run instance's symbol/timeframe, else legacy run bars.
+        """
+        from src.core import bar_store
+        from src.core.rollups import timeframe_seconds
+        from src.core.series_cache import series_cache
+        from src.database.models import MarketSeries, RunSeries, RunSubscription, StrategyInstance, StrategyRun
+
+        subscribed = self.db.query(MarketSeries.series_id, MarketSeries.timeframe).join(
+            RunSubscription, RunSubscription.series_id == MarketSeries.series_id
+        ).filter(RunSubscription.run_id == run_id, MarketSeries.symbol == symbol).all()
+        series_ids = [sid for sid, tf in sorted(subscribed, key=lambda r: timeframe_seconds(r[1]) or float("inf"))]
+        if not series_ids:
+            timeframe = self.db.query(StrategyInstance.timeframe).join(
+                StrategyRun, StrategyRun.instance_id == StrategyInstance.instance_id
+            ).filter(StrategyRun.run_id == run_id).scalar()
+            series_id = series_cache.resolve(self.db, symbol, timeframe) if timeframe else None
+            series_ids = [series_id] if series_id else []
+
+        for series_id in series_ids:
+            frame = bar_store.read_frame(self.db, series_id, pd.Timestamp(start).to_pydatetime(),
+                                         pd.Timestamp(end).to_pydatetime())
+            if not frame.empty:
+                return (frame["ts_utc"].to_numpy(dtype="datetime64[ns]"),
+                        frame["high"].to_numpy(dtype="float64"), frame["low"].to_numpy(dtype="float64"))
+
+        rows = self.db.query(Bar.ts_utc, Bar.high, Bar.low).join(
+            RunSeries, Bar.series_id == RunSeries.series_id
+        ).filter(RunSeries.run_id == run_id, RunSeries.symbol == symbol).order_by(Bar.ts_utc).all()
+        if not rows:
+            return None
+        ts, high, low = zip(*rows)
+        return (np.array(ts, dtype="datetime64[ns]"), np.array(high, dtype="float64"), np.array(low, dtype="float64"))
 
     def calculate_portfolio_metrics(self, strategy_id: str = None, run_id: str = None) -> dict:
         """
         Calculates aggregate metrics for a strategy or run.
         Includes Phase 1 (Core) and Phase 2 (Risk) metrics.
-        """
-        # Join with StrategyRun to filter by strategy_id if needed, or just filter by run_id
-        from src.database.models import StrategyRun
-        query = self.db.query(Trade).join(StrategyRun, Trade.run_id == StrategyRun.run_id)
-        
-        if strategy_id:
-            # Check strategy_id via the StrategyRun -> StrategyInstance link?
-            # Or assume run.strategy_id if it existed (it doesn't).
-            # We need to join StrategyInstance too?
-            # Let's check how runs are linked. Run -> Instance -> Strategy.
-            from src.database.models import StrategyInstance
-            query = query.join(StrategyInstance, StrategyRun.instance_id == StrategyInstance.instance_id)\
-                         .filter(StrategyInstance.strategy_id == strategy_id)
-        
-        if run_id:
-            query = query.filter(Trade.run_id == run_id)
-            
-        trades = query.all()
 
-        # [NEW] Fetch Executions for Fee/Volume Analysis (if run_id provided)
-        executions = []
-        if run_id:
-             executions = self.db.query(Execution).filter(Execution.run_id == run_id).all()
-        
-        if not trades and not executions:
+        Trades, executions and orders are selected column-wise into frames
+        (no ORM objects) and every metric is computed on whole columns.
+        """
+        df = self._trade_frame(strategy_id=strategy_id, run_id=run_id)
+        if df.empty:
             return self._empty_metrics()
 
-        # Convert to DataFrame
-        trade_dicts = []
-        for t in trades:
-            d = t.__dict__.copy()
-            d.pop('_sa_instance_state', None)
-            if 'side' in d and hasattr(d['side'], 'name'):
-                d['side'] = d['side'].name
-            trade_dicts.append(d)
-        
-        df = pd.DataFrame(trade_dicts)
-        if df.empty:
-             return self._empty_metrics()
+        # Fee/volume and execution quality need the run's fills
+        if run_id:
+            executions = self._execution_frame(run_id)
+            orders = self._order_frame(run_id)
+        else:
+            executions = orders = None
 
         # --- Phase 1: Core Metrics (P0) ---
         total_trades = len(df)
-        winning_trades = df[df['pnl_net'] > 0]
-        losing_trades = df[df['pnl_net'] <= 0]
+        pnl = df['pnl_net']
+        winning = pnl[pnl > 0]
+        losing = pnl[pnl <= 0]
+
+        win_rate = len(winning) / total_trades
+
+        gross_profit = winning.sum()
+        gross_loss = abs(losing.sum())
 
-        win_rate = len(winning_trades) / total_trades
-        
-        gross_profit = winning_trades['pnl_net'].sum()
-        gross_loss = abs(losing_trades['pnl_net'].sum())
-        
         profit_factor = gross_profit / gross_loss if gross_loss > 0 else (gross_profit if gross_profit > 0 else 0.0)
-        
-        avg_trade = df['pnl_net'].mean()
-        net_profit = df['pnl_net'].sum()
+
+        avg_trade = pnl.mean()
+        net_profit = pnl.sum()
 
         # --- Phase 2: Risk Metrics (P1) ---
-        
-        # Drawdown Analysis
-        df = df.sort_values('exit_time')
-        df['cumulative_pnl'] = df['pnl_net'].cumsum()
-        df['peak'] = df['cumulative_pnl'].cummax()
-        df['drawdown'] = df['cumulative_pnl'] - df['peak']
-        
-        max_drawdown = df['drawdown'].min() # Negative value
-        
-        # Drawdown Duration (Time spent in drawdown)
-        # Simple approximation: streaks of days/time between peaks
-        # For now, we can measure consecutive trades in drawdown? 
-        # Or time difference. Let's stick to simple scalar metrics for now.
-        
+
+        # Drawdown Analysis (ties keep their load order)
+        df = df.sort_values('exit_time', kind='stable', ignore_index=True)
+        cumulative = df['pnl_net'].cumsum().to_numpy()
+        max_drawdown = (cumulative - np.maximum.accumulate(cumulative)).min()  # Negative value
+
         # Expectancy = (Win % * Avg Win) - (Loss % * Avg Loss)
-        avg_win = winning_trades['pnl_net'].mean() if not winning_trades.empty else 0
-        avg_loss = abs(losing_trades['pnl_net'].mean()) if not losing_trades.empty else 0
+        avg_win = winning.mean() if not winning.empty else 0
+        avg_loss = abs(losing.mean()) if not losing.empty else 0
         loss_rate = 1.0 - win_rate
         expectancy = (win_rate * avg_win) - (loss_rate * avg_loss)
 
-        # Consecutive Wins/Losses
-        # Create a boolean series for wins (True) and losses (False)
-        is_win = df['pnl_net'] > 0
-        # Group by consecutive values
-        # (is_win != is_win.shift()).cumsum() creates a group ID for each streak
-        streaks = is_win.groupby((is_win != is_win.shift()).cumsum()).count()
-        
-        # Filter strictly for wins and losses to get max streaks
-        # We need to map back to whether it was a win or loss streak
-        streak_types = is_win.groupby((is_win != is_win.shift()).cumsum()).first()
-        
-        max_consecutive_wins = streaks[streak_types == True].max() if not streaks[streak_types == True].empty else 0
-        max_consecutive_losses = streaks[streak_types == False].max() if not streaks[streak_types == False].empty else 0
+        # Consecutive Wins/Losses: lengths of the runs of equal win flags
+        is_win = df['pnl_net'].to_numpy() > 0
+        starts = np.flatnonzero(np.r_[True, is_win[1:] != is_win[:-1]])
+        lengths = np.diff(np.r_[starts, len(is_win)])
+        win_streaks = lengths[is_win[starts]]
+        loss_streaks = lengths[~is_win[starts]]
+        max_consecutive_wins = win_streaks.max() if win_streaks.size else 0
+        max_consecutive_losses = loss_streaks.max() if loss_streaks.size else 0
 
         # [NEW] Fee & Volume Analysis
         # Fallback to Trade data if Executions are missing (common in ML/Backtest)
-        if executions:
-            total_fees = sum([e.fee for e in executions])
-            total_volume = sum([e.price * e.quantity for e in executions])
+        if executions is not None and not executions.empty:
+            total_fees = executions['fee'].sum()
+            total_volume = (executions['price'] * executions['quantity']).sum()
         else:
-            # Estimate from Trades
-            total_fees = df['commission'].sum() if 'commission' in df.columns else 0.0
-            # Volume = Entry Volume + Exit Volume (roughly 2x notional?)
-            # Usually Volume is sum of separate executions. 
-            # If we only have trade summary: (EntryPrice * Qty) + (ExitPrice * Qty)
-            entry_vol = (df['entry_price'] * df['quantity']).sum() if ('entry_price' in df.columns and 'quantity' in df.columns) else 0.0
-            exit_vol = (df['exit_price'] * df['quantity']).sum() if ('exit_price' in df.columns and 'quantity' in df.columns) else 0.0
-            total_volume = entry_vol + exit_vol
+            # Estimate from Trades: (EntryPrice * Qty) + (ExitPrice * Qty)
+            total_fees = df['commission'].sum()
+            total_volume = (df['entry_price'] * df['quantity']).sum() + (df['exit_price'] * df['quantity']).sum()
 
         # [NEW] Execution Metrics (Level 5)
-        # We need Orders to compare against
-        orders = []
-        if run_id:
-             orders = self.db.query(Order).filter(Order.run_id == run_id).all()
-        
-        # Calculate Latency & Fill Ratio
-        latencies = []
-        ordered_qty = 0.0
-        executed_qty = 0.0
-        
-        # Create a map of orders for fast lookup
-        order_map = {o.order_id: o for o in orders}
-        
-        for e in executions:
-            executed_qty += e.quantity
-            if e.order_id in order_map:
-                o = order_map[e.order_id]
-                # Latency
-                if o.submit_utc and e.exec_utc:
-                    latency = (e.exec_utc - o.submit_utc).total_seconds()
-                    # Only positive latencies make sense, but clock skew might happen
-                    if latency >= 0:
-                        latencies.append(latency)
-        
-        # Sum ordered quantity
-        # Be careful not to double count if we have partial fills?
-        # Actually simplest is sum of all generic orders quantity vs sum of all executions quantity
-        # But for fill ratio, we usually want (Filled / Requested).
-        ordered_qty = sum([o.quantity for o in orders]) if orders else 0.0
-        
-        avg_fill_latency = np.mean(latencies) if latencies else 0.0
-        fill_ratio = (executed_qty / ordered_qty) if ordered_qty > 0 else 0.0
+        avg_fill_latency, fill_ratio = self._execution_quality(executions, orders)
 
-        # [NEW] Equity Curve Generation
-        equity_curve = self._generate_equity_curve(df)
+        stats = self._calculate_distribution_stats(df)
 
         return {
             # P0
@@ -201,36 +187,111 @@ class StandardAnalyzer:
             "total_fees": self._safe_float(total_fees),
             "total_volume": self._safe_float(total_volume),
             # Level 5
-            "avg_fill_latency": self._safe_float(avg_fill_latency, 3), 
-            "fill_ratio": self._safe_float(fill_ratio, 2), 
+            "avg_fill_latency": self._safe_float(avg_fill_latency, 3),
+            "fill_ratio": self._safe_float(fill_ratio, 2),
             "win_rate": self._safe_float(win_rate * 100, 2),
             "profit_factor": self._safe_float(profit_factor, 2),
             "average_trade": self._safe_float(avg_trade, 2),
             "net_profit": self._safe_float(net_profit, 2),
-            
+
             # P1
             "max_drawdown": self._safe_float(max_drawdown, 2),
             "expectancy": self._safe_float(expectancy, 2),
             "max_consecutive_wins": int(max_consecutive_wins),
             "max_consecutive_losses": int(max_consecutive_losses),
-            
+
             # P2 (Performance Ratios)
             "sharpe_ratio": self._safe_float(self._calculate_sharpe(df['pnl_net'], annualized=True), 2),
             "sortino_ratio": self._safe_float(self._calculate_sortino(df['pnl_net'], annualized=True), 2),
             "calmar_ratio": self._safe_float(self._calculate_calmar(net_profit, max_drawdown), 2),
-            
+
             # [NEW] Equity Curve Data (Simplified for storage/api)
-            "equity_curve": equity_curve, 
-            
+            "equity_curve": self._generate_equity_curve(df),
+
             # P2 (Execution Analysis)
-            "avg_mae": self._safe_float(df['mae'].mean(), 2) if 'mae' in df else 0.0,
-            "avg_mfe": self._safe_float(df['mfe'].mean(), 2) if 'mfe' in df else 0.0,
+            "avg_mae": self._safe_float(df['mae'].mean(), 2),
+            "avg_mfe": self._safe_float(df['mfe'].mean(), 2),
             "efficiency_ratio": self._safe_float(self._calculate_efficiency(df), 2),
             "stability_r2": self._safe_float(self._calculate_stability(df), 2),
-            "pnl_skew": self._safe_float(self._calculate_distribution_stats(df)['skew'], 2),
-            "pnl_kurtosis": self._safe_float(self._calculate_distribution_stats(df)['kurtosis'], 2)
+            "pnl_skew": self._safe_float(stats['skew'], 2),
+            "pnl_kurtosis": self._safe_float(stats['kurtosis'], 2)
         }
 
+    def _execution_quality(self, executions, orders):
+        """
+        (average submit -> fill latency in seconds, executed / ordered quantity).
+        Latencies are matched through order_id; negative ones (clock skew) are dropped.
+        """
+        if executions is None or executions.empty:
+            return 0.0, 0.0
+        executed_qty = executions['quantity'].sum()
+        ordered_qty = orders['quantity'].sum() if not orders.empty else 0.0
+
+        avg_fill_latency = 0.0
+        if not orders.empty:
+            submit = executions['order_id'].map(orders.set_index('order_id')['submit_utc'])
+            latency = (executions['exec_utc'] - submit).to_numpy() / np.timedelta64(1, 's')
+            latency = latency[latency >= 0]  # NaN (unknown order) compares False
+            if latency.size:
+                avg_fill_latency = latency.mean()
+        fill_ratio = (executed_qty / ordered_qty) if ordered_qty > 0 else 0.0
+        return avg_fill_latency, fill_ratio
+
+    # --- Column loads ---
+
+    def _trade_frame(self, strategy_id: str = None, run_id: str = None) -> pd.DataFrame:
+        """The trade columns the metrics read, one row per trade of the run / strategy."""
+        from src.database.models import StrategyInstance, StrategyRun
+
+        if run_id or not shard_router.enabled:
+            stmt = self._trade_select().join(StrategyRun, Trade.run_id == StrategyRun.run_id)
+            if strategy_id:
+                stmt = stmt.join(StrategyInstance, StrategyRun.instance_id == StrategyInstance.instance_id)\
+                           .where(StrategyInstance.strategy_id == strategy_id)
+            if run_id:
+                stmt = stmt.where(Trade.run_id == run_id)
+            return self._trades_from_rows(_fetch(self.db, stmt, Trade))
+
+        # Strategy-wide: the runs' trades live in their shards
+        runs = select(StrategyRun.run_id)
+        if strategy_id:
+            runs = runs.join(StrategyInstance, StrategyRun.instance_id == StrategyInstance.instance_id)\
+                       .where(StrategyInstance.strategy_id == strategy_id)
+        chunks = shard_router.fan_out(
+            self.db.execute(runs).scalars().all(),
+            lambda run_db, rid: _fetch(run_db, self._trade_select().where(Trade.run_id == rid), Trade)
+        )
+        return self._trades_from_rows([row for chunk in chunks for row in chunk])
+
+    @staticmethod
+    def _trade_select():
+        return select(
+            Trade.pnl_net, raw_time(Trade.exit_time), type_coerce(Trade.side, String).label("side"),
+            Trade.entry_price, Trade.exit_price, Trade.quantity, Trade.commission, Trade.mae, Trade.mfe
+        )
+
+    @staticmethod
+    def _trades_from_rows(rows) -> pd.DataFrame:
+        df = pd.DataFrame(rows, columns=TRADE_COLUMNS)
+        df['exit_time'] = time_array(df['exit_time'].to_numpy(), Trade.exit_time)
+        return df.astype(TRADE_DTYPES)
+
+    def _execution_frame(self, run_id: str) -> pd.DataFrame:
+        rows = _fetch(self.db, select(
+            Execution.order_id, raw_time(Execution.exec_utc), Execution.price, Execution.quantity, Execution.fee
+        ).where(Execution.run_id == run_id), Execution)
+        df = pd.DataFrame(rows, columns=["order_id", "exec_utc", "price", "quantity", "fee"])
+        df['exec_utc'] = time_array(df['exec_utc'].to_numpy(), Execution.exec_utc)
+        return df.astype({"price": "float64", "quantity": "float64", "fee": "float64"})
+
+    def _order_frame(self, run_id: str) -> pd.DataFrame:
+        rows = _fetch(self.db, select(
+            Order.order_id, Order.quantity, Order.submit_utc
+        ).where(Order.run_id == run_id), Order)
+        df = pd.DataFrame(rows, columns=["order_id", "quantity", "submit_utc"])
+        df['submit_utc'] = time_array(df['submit_utc'].to_numpy(), Order.submit_utc)
+        return df.astype({"quantity": "float64"})
+
     def _safe_float(self, val, precision=2) -> float:
         try:
             val = float(val)
@@ -284,37 +345,23 @@ class StandardAnalyzer:
         if 'mfe' not in df or 'quantity' not in df or 'entry_price' not in df or 'exit_price' not in df:
             return 0.0
 
-        total_captured = 0.0
-        total_potential = 0.0
-        
-        for _, t in df.iterrows():
-            mfe = t.get('mfe', 0.0)
-            if pd.isna(mfe) or mfe <= 0:
-                continue
-                
-            qty = t.get('quantity', 0.0)
-            if qty <= 0:
-                continue
+        mfe = df['mfe'].to_numpy(dtype="float64")
+        qty = df['quantity'].to_numpy(dtype="float64")
+        entry = df['entry_price'].to_numpy(dtype="float64")
+        exit_p = df['exit_price'].to_numpy(dtype="float64")
+
+        # Only trades with a favorable excursion and a size (NaN MFE compares False)
+        counted = (mfe > 0) & (qty > 0)
+
+        # Captured Price Delta; the potential delta (MFE) is already measured from entry
+        captured_delta = np.where(df['side'].astype(str).to_numpy() == 'BUY', exit_p - entry, entry - exit_p)
+
+        total_captured = (captured_delta * qty)[counted].sum()
+        total_potential = (mfe * qty)[counted].sum()
 
-            entry = t.get('entry_price', 0.0)
-            exit_p = t.get('exit_price', 0.0)
-            side = str(t.get('side', 'BUY'))
-            
-            # Calculate Captured Price Delta
-            if side == 'BUY':
-                captured_delta = exit_p - entry
-            else:
-                captured_delta = entry - exit_p
-            
-            # Potential Price Delta (MFE) is already max favorable excursion from entry
-            potential_delta = mfe
-            
-            total_captured += captured_delta * qty
-            total_potential += potential_delta * qty
-            
         if total_potential == 0:
             return 0.0
-            
+
         return total_captured / total_potential
 
     def _calculate_stability(self, df: pd.DataFrame) -> float:
@@ -381,29 +428,17 @@ class StandardAnalyzer:
     def _generate_equity_curve(self, df: pd.DataFrame) -> list:
         """
         Generates a time-series equity curve with drawdown info.
-        Expects df to have 'exit_time' and 'pnl_net'.
+        Expects df sorted by 'exit_time', with 'exit_time' and 'pnl_net'.
+        The peak starts at 0 (flat account), so early losses show as drawdown.
         """
         if df.empty:
             return []
-            
-        # Ensure sorted
-        df = df.sort_values('exit_time')
-        
-        cumulative = 0
-        peak = 0
-        curve = []
-        
-        for index, row in df.iterrows():
-            pnl = row['pnl_net']
-            cumulative += pnl
-            if cumulative > peak:
-                peak = cumulative
-            drawdown = cumulative - peak
-            
-            curve.append({
-                "time": row['exit_time'].isoformat() if hasattr(row['exit_time'], 'isoformat') else str(row['exit_time']),
-                "pnl": round(cumulative, 2),
-                "drawdown": round(drawdown, 2)
-            })
-            
-        return curve
+
+        cumulative = df['pnl_net'].cumsum().to_numpy()
+        drawdown = cumulative - np.maximum.accumulate(np.maximum(cumulative, 0.0))
+        times = df['exit_time'].to_numpy(dtype="datetime64[us]").tolist()
+
+        return [
+            {"time": t.isoformat(), "pnl": round(c, 2), "drawdown": round(d, 2)}
+            for t, c, d in zip(times, cumulative.tolist(), drawdown.tolist())
+        ]
@@ -5,6 +5,7 @@ import numpy as np
 from typing import List, Dict, Any, Callable
 from sqlalchemy.orm import Session
 from src.database.models import Dataset, Bar, RunSeries, MlRewardFunction, MarketSeries, MarketBar
+from src.core import bar_store, rollups
 
 # Try importing tensorflow, but don't crash if missing (allows server to list files etc)
 try:
@@ -63,7 +64,17 @@ def load_dataset_as_dataframe(db: Session, dataset_id: str) -> pd.DataFrame:
              ).first()
              
              if m_series:
-                 bars_found = db.query(MarketBar).filter(MarketBar.series_id == m_series.series_id).order_by(MarketBar.ts_utc).all()
+                 # Memory-mapped store (or SQL plus the Parquet archive), already a frame
+                 df = bar_store.read_frame(db, m_series.series_id)
+                 if not df.empty:
+                     all_dfs.append(df)
+                 continue
+
+             # Coarser timeframe than anything stored: nearest rollup, resampled
+             df = rollups.read_timeframe(db, symbol, timeframe)
+             if df is not None and not df.empty:
+                 all_dfs.append(df[["ts_utc", "open", "high", "low", "close", "volume"]])
+                 continue
 
         if not bars_found:
             continue
@@ -49,7 +49,14 @@ def client():
         # We just need to ensure init_db is called.
         from src.database.connection import init_db
         init_db()
-        with TestClient(app) as c:
-            yield c
+        # test_ml_api installs a module-level get_db override at import time;
+        # keep it from leaking into tests that expect the shared file DB.
+        saved_overrides = dict(app.dependency_overrides)
+        app.dependency_overrides.clear()
+        try:
+            with TestClient(app) as c:
+                yield c
+        finally:
+            app.dependency_overrides.update(saved_overrides)
     else:
         yield None
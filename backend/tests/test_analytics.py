@@ -4,8 +4,7 @@ from unittest.mock import MagicMock
 from datetime import datetime, timedelta
 import pandas as pd
 import numpy as np
-from src.services.analytics.standard_analyzer import StandardAnalyzer
-from src.database.models import Trade, Execution
+from src.services.analytics.standard_analyzer import TRADE_COLUMNS, StandardAnalyzer
 
 # Mock structures equivalent to database models
 class MockTrade:
@@ -42,25 +41,21 @@ def analyzer(mock_db_session):
     return StandardAnalyzer(mock_db_session)
 
 @pytest.fixture
-def setup_query_mock(mock_db_session):
+def setup_query_mock(analyzer, monkeypatch):
     def _setup(trades=None, executions=None):
-        trades = trades or []
-        executions = executions or []
-        
-        def query_side_effect(model):
-            mock = MagicMock()
-            mock.join.return_value = mock
-            mock.filter.return_value = mock
-            
-            if model == Trade:
-                mock.all.return_value = trades
-            elif model == Execution:
-                mock.all.return_value = executions
-            else:
-                mock.all.return_value = []
-            return mock
-            
-        mock_db_session.query.side_effect = query_side_effect
+        trade_frame = pd.DataFrame([
+            (t.pnl_net, t.exit_time, t.side.name, t.entry_price, t.exit_price, t.quantity, t.commission, t.mae, t.mfe)
+            for t in trades or []
+        ], columns=TRADE_COLUMNS)
+        execution_frame = pd.DataFrame(
+            [(e.order_id, e.exec_utc, e.price, e.quantity, e.fee) for e in executions or []],
+            columns=["order_id", "exec_utc", "price", "quantity", "fee"]
+        )
+        order_frame = pd.DataFrame(columns=["order_id", "quantity", "submit_utc"])
+
+        monkeypatch.setattr(analyzer, "_trade_frame", lambda strategy_id=None, run_id=None: trade_frame)
+        monkeypatch.setattr(analyzer, "_execution_frame", lambda run_id: execution_frame)
+        monkeypatch.setattr(analyzer, "_order_frame", lambda run_id: order_frame)
     return _setup
 
 def test_calculate_metrics_basic(analyzer, setup_query_mock):
@@ -0,0 +1,86 @@
+import asyncio
+import json
+import uuid
+
+from src.api.schemas import ExecutionCreate
+from src.core import ingest_log
+from src.database.connection import AsyncSessionLocal
+from src.database.models import Execution
+
+
+def test_async_session_runs_bulk_writers(db_session):
+    run_id = str(uuid.uuid4())
+    items = [ExecutionCreate(run_id=run_id, execution_id=f"A{i}", order_id="O1",
+                             exec_utc=f"2024-01-01T00:0{i}:00", price=1.0, quantity=1.0) for i in range(3)]
+
+    async def write():
+        async with AsyncSessionLocal() as db:
+            result = await db.run_sync(ingest_log.write_logged, "executions", items)
+            await db.commit()
+            return result
+
+    assert asyncio.run(write())["inserted"] == 3
+    assert db_session.query(Execution).filter(Execution.run_id == run_id).count() == 3
+
+
+def test_batch_ingest_through_async_endpoint(client, db_session):
+    run_id = str(uuid.uuid4())
+    for batch in range(4):
+        resp = client.post("/api/ingest/batch/executions", json=[
+            {"run_id": run_id, "execution_id": f"C{batch}_{i}", "order_id": "O1",
+             "exec_utc": "2024-01-01T00:00:00", "price": 1.0, "quantity": 1.0} for i in range(5)
+        ])
+        assert resp.status_code == 200, resp.text
+    assert db_session.query(Execution).filter(Execution.run_id == run_id).count() == 20
+
+
+def test_inline_ingest_writes_off_the_event_loop(client, db_session, monkeypatch):
+    write_logged, on_loop = ingest_log.write_logged, []
+
+    def recording(db, kind, items):
+        try:
+            asyncio.get_running_loop()
+            on_loop.append(kind)
+        except RuntimeError:
+            pass
+        return write_logged(db, kind, items)
+
+    monkeypatch.setattr(ingest_log, "write_logged", recording)
+    run_id = str(uuid.uuid4())
+    resp = client.post("/api/ingest/batch/executions", json=[
+        {"run_id": run_id, "execution_id": "L1", "order_id": "O1",
+         "exec_utc": "2024-01-01T00:00:00", "price": 1.0, "quantity": 1.0}
+    ])
+    assert resp.status_code == 200, resp.text
+    resp = client.post("/api/ingest/stream/ndjson", content=json.dumps({"type": "execution", "data": {
+        "run_id": run_id, "execution_id": "L2", "order_id": "O1", "exec_utc": "2024-01-01T00:00:01",
+        "price": 1.0, "quantity": 1.0}}).encode(), headers={"Content-Type": "application/x-ndjson"})
+    assert resp.json()["status"] == "ok", resp.text
+    assert db_session.query(Execution).filter(Execution.run_id == run_id).count() == 2
+    assert on_loop == []
+
+
+def test_training_status_uses_async_session(client):
+    assert client.get("/api/training/status/missing-job").status_code == 404
+
+
+def test_async_endpoints_fall_back_to_sync_sessions(client, db_session, monkeypatch):
+    from src.database import connection
+
+    monkeypatch.setattr(connection, "AsyncSessionLocal", None)
+    run_id = str(uuid.uuid4())
+    resp = client.post("/api/ingest/batch/executions", json=[
+        {"run_id": run_id, "execution_id": f"S{i}", "order_id": "O1",
+         "exec_utc": "2024-01-01T00:00:00", "price": 1.0, "quantity": 1.0} for i in range(3)
+    ])
+    assert resp.status_code == 200, resp.text
+    assert db_session.query(Execution).filter(Execution.run_id == run_id).count() == 3
+    assert client.get("/api/training/status/missing-job").status_code == 404
+
+
+def test_postgresql_urls_use_psycopg_for_async():
+    from src.database.connection import async_url
+
+    assert async_url("postgresql://u:p@db/trading") == "postgresql+psycopg://u:p@db/trading"
+    assert async_url("postgresql+psycopg://u:p@db/trading") == "postgresql+psycopg://u:p@db/trading"
+    assert async_url("sqlite:///trading.db") == "sqlite+aiosqlite:///trading.db"
@@ -0,0 +1,107 @@
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.api.schemas import BarCreate
+from src.core import bar_archive, bulk_writer
+from src.database.models import MarketBar, MarketSeriesCoverage
+
+pytest.importorskip("pyarrow")
+
+
+def _bars(symbol, start, count, close=1.5):
+    return [BarCreate(run_id="ARCHIVE_RUN", symbol=symbol, timeframe="1h", ts_utc=start + timedelta(hours=6 * i),
+                      open=1, high=2, low=0.5, close=close, volume=i) for i in range(count)]
+
+
+@pytest.fixture
+def archive_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(bar_archive, "ARCHIVE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_closed_months_move_to_parquet_and_reads_merge_tiers(client, db_session, archive_root):
+    symbol = f"ARC_{uuid.uuid4().hex[:8]}"
+    bars = _bars(symbol, datetime(2024, 1, 1), 4 * 80)  # Jan 1 .. Mar 20
+    bulk_writer.upsert_bars(db_session, bars)
+    db_session.commit()
+    series_id = bulk_writer.market_series_id(symbol, "1h", "Unknown", "Unknown")
+    before = bar_archive.read_series(db_session, series_id)
+
+    results = bar_archive.archive_closed_months(db_session, hot_months=1, now=datetime(2024, 3, 15), series_ids=[series_id])
+    assert set(results[0]["months"]) == {"2024-01", "2024-02"}
+    assert bar_archive.archived_months(series_id) == [(2024, 1), (2024, 2)]
+    hot_left = db_session.query(MarketBar).filter(MarketBar.series_id == series_id)
+    assert hot_left.count() == len(before) - results[0]["rows"]
+    assert hot_left.order_by(MarketBar.ts_utc).first().ts_utc >= datetime(2024, 3, 1)
+
+    after = bar_archive.read_series(db_session, series_id)
+    assert after[["ts_utc", "close", "volume"]].equals(before[["ts_utc", "close", "volume"]])
+
+    # Time range inside the archive only touches February
+    feb = bar_archive.read_series(db_session, series_id, datetime(2024, 2, 10), datetime(2024, 2, 12))
+    assert len(feb) == 9 and feb["ts_utc"].min() == datetime(2024, 2, 10)
+
+    # A bar re-ingested into an archived month wins until the next tiering run folds it in
+    bulk_writer.upsert_bars(db_session, _bars(symbol, datetime(2024, 2, 10), 1, close=9.0))
+    db_session.commit()
+    assert bar_archive.read_series(db_session, series_id, datetime(2024, 2, 10), datetime(2024, 2, 10))["close"].tolist() == [9.0]
+    bar_archive.archive_closed_months(db_session, hot_months=1, now=datetime(2024, 3, 15), series_ids=[series_id])
+    assert bar_archive.read_cold(series_id, datetime(2024, 2, 10), datetime(2024, 2, 10))["close"].tolist() == [9.0]
+
+    resp = client.get("/api/bars/", params={"run_id": "none", "symbol": symbol, "timeframe": "1h",
+                                            "start_utc": "2024-01-31T00:00:00", "limit": 10})
+    assert resp.status_code == 200
+    body = resp.json()
+    assert len(body) == 10 and body[0]["ts_utc"].startswith("2024-01-31") and body[-1]["ts_utc"].startswith("2024-02-02")
+
+
+def test_reingesting_an_archived_month_does_not_inflate_coverage(db_session, archive_root):
+    from src.core import coverage
+
+    symbol = f"ARC_{uuid.uuid4().hex[:8]}"
+    bulk_writer.upsert_bars(db_session, _bars(symbol, datetime(2024, 1, 1), 4 * 40))  # Jan 1 .. Feb 9
+    db_session.commit()
+    series_id = bulk_writer.market_series_id(symbol, "1h", "Unknown", "Unknown")
+    bar_archive.archive_month(db_session, series_id, 2024, 1)
+    count = db_session.get(MarketSeriesCoverage, series_id).bar_count
+    assert count == 160
+
+    # Replaying January (archived) plus the last February bar and one new bar
+    result = bulk_writer.upsert_bars(db_session, _bars(symbol, datetime(2024, 1, 1), 4 * 40 + 1, close=2.0))
+    db_session.commit()
+    assert (result["inserted"], result["updated"]) == (1, 160)
+    assert db_session.get(MarketSeriesCoverage, series_id).bar_count == count + 1
+    assert coverage.rebuild(db_session, series_id).bar_count == count + 1
+
+
+def test_bars_upserted_while_archiving_stay_hot(db_session, archive_root, monkeypatch):
+    symbol = f"ARC_{uuid.uuid4().hex[:8]}"
+    bulk_writer.upsert_bars(db_session, _bars(symbol, datetime(2024, 1, 1), 8))
+    db_session.commit()
+    series_id = bulk_writer.market_series_id(symbol, "1h", "Unknown", "Unknown")
+    late = _bars(symbol, datetime(2024, 1, 20), 1, close=7.0)
+
+    read_hot = bar_archive.read_hot
+
+    def read_then_ingest(*args, **kwargs):
+        frame = read_hot(*args, **kwargs)
+        bulk_writer.upsert_bars(db_session, late)  # lands after the read, before the delete
+        return frame
+
+    monkeypatch.setattr(bar_archive, "read_hot", read_then_ingest)
+    assert bar_archive.archive_month(db_session, series_id, 2024, 1) == 8
+    monkeypatch.setattr(bar_archive, "read_hot", read_hot)
+
+    hot = db_session.query(MarketBar).filter(MarketBar.series_id == series_id).all()
+    assert [bar.ts_utc for bar in hot] == [datetime(2024, 1, 20)]
+    assert len(bar_archive.read_series(db_session, series_id)) == 9
+
+
+def test_archive_defaults_next_to_the_database_file(monkeypatch):
+    monkeypatch.delenv("BAR_ARCHIVE_DIR", raising=False)
+    monkeypatch.setattr(bar_archive, "DATABASE_URL", "sqlite:////data/trading_data.db")
+    assert bar_archive._default_root() == "/data/trading_data.db.archive"
+    monkeypatch.setenv("BAR_ARCHIVE_DIR", "/cold")
+    assert bar_archive._default_root() == "/cold"
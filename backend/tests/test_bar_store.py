@@ -0,0 +1,123 @@
+import os
+import uuid
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from src.api.schemas import BarCreate
+from src.core import bar_store as bar_store_module, bulk_writer
+from src.core.bar_store import BarStore
+
+
+def _bars(symbol, start, count, close=1.5):
+    return [BarCreate(run_id="STORE_RUN", symbol=symbol, timeframe="1m", ts_utc=start + timedelta(minutes=i),
+                      open=1, high=2, low=0.5, close=close + i, volume=i) for i in range(count)]
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = BarStore(str(tmp_path))
+    monkeypatch.setattr(bar_store_module, "bar_store", store)
+    monkeypatch.setattr(bulk_writer, "bar_store", store)
+    return store
+
+
+def _ingest(db, bars):
+    bulk_writer.upsert_bars(db, bars)
+    db.commit()
+
+
+def test_build_and_range_views(db_session, store):
+    symbol = f"MM_{uuid.uuid4().hex[:8]}"
+    start = datetime(2024, 1, 1)
+    _ingest(db_session, _bars(symbol, start, 100))
+    series_id = bulk_writer.market_series_id(symbol, "1m", "Unknown", "Unknown")
+
+    assert store.read(series_id) is None
+    view = store.load(db_session, series_id, start + timedelta(minutes=10), start + timedelta(minutes=19))
+    assert len(view) == 10
+    assert isinstance(view.ts.base, np.memmap) or isinstance(view.ts, np.memmap)
+    assert view["close"].tolist() == [1.5 + i for i in range(10, 20)]
+    assert view.to_frame()["ts_utc"].iloc[0] == start + timedelta(minutes=10)
+
+    # A second store over the same directory (another worker) sees the same data
+    assert len(BarStore(store.root).read(series_id)) == 100
+
+
+def test_ingest_appends_and_merges_after_commit(db_session, store):
+    symbol = f"MM_{uuid.uuid4().hex[:8]}"
+    start = datetime(2024, 1, 1)
+    _ingest(db_session, _bars(symbol, start, 50))
+    series_id = bulk_writer.market_series_id(symbol, "1m", "Unknown", "Unknown")
+    store.load(db_session, series_id)
+    generation = store._read_meta(series_id)["generation"]
+
+    # Newer bars: appended to the current generation
+    _ingest(db_session, _bars(symbol, start + timedelta(minutes=50), 10))
+    assert store._read_meta(series_id) == {"generation": generation, "count": 60}
+
+    # Rolled back writes never reach the store
+    bulk_writer.upsert_bars(db_session, _bars(symbol, start + timedelta(minutes=60), 10))
+    db_session.rollback()
+    assert len(store.read(series_id)) == 60
+
+    # Corrections inside the stored range: merged into a new generation, last write wins
+    _ingest(db_session, _bars(symbol, start + timedelta(minutes=5), 2, close=100.0))
+    meta = store._read_meta(series_id)
+    assert meta == {"generation": generation + 1, "count": 60}
+    view = store.read(series_id)
+    assert view["close"][5:7].tolist() == [100.0, 101.0]
+    assert np.all(np.diff(view.ts) > 0)
+
+    frame = bar_store_module.read_frame(db_session, series_id)
+    assert frame["close"].tolist() == view["close"].tolist()
+
+
+def test_tail_append_cuts_orphan_bytes_and_sweeps_generations(db_session, store):
+    symbol = f"MM_{uuid.uuid4().hex[:8]}"
+    start = datetime(2024, 1, 1)
+    _ingest(db_session, _bars(symbol, start, 20))
+    series_id = bulk_writer.market_series_id(symbol, "1m", "Unknown", "Unknown")
+    store.load(db_session, series_id)
+    meta = store._read_meta(series_id)
+
+    # An append that crashed before publishing its count left bytes behind
+    gen_dir = store._gen_dir(series_id, meta["generation"])
+    for name in ("ts", *bar_store_module.FIELDS):
+        with open(os.path.join(gen_dir, f"{name}.bin"), "ab") as f:
+            f.write(np.full(3, 7, dtype="int64").tobytes())
+
+    _ingest(db_session, _bars(symbol, start + timedelta(minutes=20), 5))
+    view = store.read(series_id)
+    assert len(view) == 25 and np.all(np.diff(view.ts) > 0)
+    assert view["close"][20:].tolist() == [1.5 + i for i in range(5)]
+
+    # A generation left behind (still mapped elsewhere) is removed by the next replace
+    stale = store._gen_dir(series_id, meta["generation"] - 1)
+    os.makedirs(stale, exist_ok=True)
+    _ingest(db_session, _bars(symbol, start, 1, close=9.0))
+    generation = store._read_meta(series_id)["generation"]
+    assert sorted(os.listdir(store._series_dir(series_id))) == [".lock", f"g{generation}", "meta.json"]
+
+
+def test_build_sees_commits_newer_than_the_callers_snapshot(db_session, store):
+    from src.database.connection import SessionLocal
+    from src.database.models import MarketBar
+
+    symbol = f"MM_{uuid.uuid4().hex[:8]}"
+    start = datetime(2024, 1, 1)
+    _ingest(db_session, _bars(symbol, start, 10))
+    series_id = bulk_writer.market_series_id(symbol, "1m", "Unknown", "Unknown")
+
+    # The caller's read transaction pins a snapshot with 10 bars (pysqlite only begins one on writes)
+    db_session.connection().exec_driver_sql("BEGIN")
+    assert db_session.query(MarketBar).filter(MarketBar.series_id == series_id).count() == 10
+    other = SessionLocal()
+    try:
+        _ingest(other, _bars(symbol, start + timedelta(minutes=10), 5))  # no store yet: nothing appended
+    finally:
+        other.close()
+
+    assert len(store.load(db_session, series_id)) == 15
+    db_session.rollback()
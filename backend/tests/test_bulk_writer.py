@@ -0,0 +1,129 @@
+import uuid
+from datetime import datetime, timedelta
+
+from src.api.schemas import BarCreate, OrderCreate, ExecutionCreate
+from src.core import bulk_writer
+from src.database.models import MarketSeries, MarketBar, RunSubscription, Order, Execution, OrderStatus, PositionImpactType
+
+
+def _bars(run_id, symbol, start, count, price=100.0):
+    return [
+        BarCreate(
+            run_id=run_id, symbol=symbol, timeframe="1m",
+            venue="TestVenue", provider="TestProvider",
+            ts_utc=start + timedelta(minutes=i),
+            open=price, high=price + 1, low=price - 1, close=price + 0.5, volume=10.0
+        )
+        for i in range(count)
+    ]
+
+
+def test_upsert_bars_inserts_then_updates(db_session):
+    run_id = str(uuid.uuid4())
+    symbol = f"SYM_{uuid.uuid4().hex[:8]}"
+    start = datetime(2024, 1, 1)
+
+    result = bulk_writer.upsert_bars(db_session, _bars(run_id, symbol, start, 100))
+    db_session.commit()
+    assert result == {"inserted": 100, "updated": 0, "series": 1}
+
+    # Overlapping batch: 50 existing bars re-sent with new prices, 50 new ones
+    result = bulk_writer.upsert_bars(db_session, _bars(run_id, symbol, start + timedelta(minutes=50), 100, price=200.0))
+    db_session.commit()
+    assert result == {"inserted": 50, "updated": 50, "series": 1}
+
+    series_id = bulk_writer.market_series_id(symbol, "1m", "TestVenue", "TestProvider")
+    assert db_session.query(MarketSeries).filter(MarketSeries.series_id == series_id).count() == 1
+    assert db_session.query(RunSubscription).filter(RunSubscription.run_id == run_id).count() == 1
+    assert db_session.query(MarketBar).filter(MarketBar.series_id == series_id).count() == 150
+
+    bar = db_session.query(MarketBar).filter(
+        MarketBar.series_id == series_id, MarketBar.ts_utc == start + timedelta(minutes=60)
+    ).one()
+    assert bar.open == 200.0
+
+
+def test_upsert_bars_last_write_wins_within_batch(db_session):
+    run_id = str(uuid.uuid4())
+    symbol = f"SYM_{uuid.uuid4().hex[:8]}"
+    start = datetime(2024, 1, 1)
+    batch = _bars(run_id, symbol, start, 1, price=1.0) + _bars(run_id, symbol, start, 1, price=2.0)
+
+    result = bulk_writer.upsert_bars(db_session, batch)
+    db_session.commit()
+    assert result["inserted"] == 1 and result["updated"] == 0
+
+    series_id = bulk_writer.market_series_id(symbol, "1m", "TestVenue", "TestProvider")
+    bar = db_session.query(MarketBar).filter(MarketBar.series_id == series_id).one()
+    assert bar.open == 2.0
+
+
+def test_batch_bars_endpoint_reports_counts(client):
+    run_id = str(uuid.uuid4())
+    symbol = f"SYM_{uuid.uuid4().hex[:8]}"
+    payload = [b.model_dump(mode="json") for b in _bars(run_id, symbol, datetime(2024, 1, 1), 20)]
+
+    resp = client.post("/api/ingest/batch/bars", json=payload)
+    assert resp.status_code == 200
+    assert resp.json() == {"status": "ok", "count": 20, "inserted": 20, "updated": 0}
+
+    resp = client.post("/api/ingest/batch/bars", json=payload)
+    assert resp.json()["updated"] == 20
+
+
+def _order(run_id, order_id, status="NEW", quantity=1.0, impact="OPEN", submit_utc=None):
+    return OrderCreate(
+        run_id=run_id, order_id=order_id, symbol="EURUSD", side="BUY", order_type="LIMIT",
+        quantity=quantity, price=1.1, status=status, position_impact=impact,
+        submit_utc=submit_utc or datetime(2024, 1, 1)
+    )
+
+
+def _execution(run_id, execution_id, price=1.1, impact="OPEN"):
+    return ExecutionCreate(
+        run_id=run_id, execution_id=execution_id, order_id="O1",
+        exec_utc=datetime(2024, 1, 1, 0, 1), price=price, quantity=1.0, position_impact=impact
+    )
+
+
+def test_upsert_orders_folds_duplicates_in_arrival_order(db_session):
+    run_id = str(uuid.uuid4())
+    result = bulk_writer.upsert_orders(db_session, [
+        _order(run_id, "O1", status="NEW"),
+        _order(run_id, "O2"),
+        _order(run_id, "O1", status="FILLED", quantity=2.0, submit_utc=datetime(2024, 1, 1, 0, 5)),
+    ])
+    db_session.commit()
+    assert result == {"inserted": 2, "updated": 0}
+
+    o1 = db_session.query(Order).filter(Order.run_id == run_id, Order.order_id == "O1").one()
+    assert o1.status == OrderStatus.FILLED
+    assert o1.quantity == 2.0
+    # Insert fields come from the first occurrence, update_utc from the later one
+    assert o1.submit_utc == datetime(2024, 1, 1)
+    assert o1.update_utc == datetime(2024, 1, 1, 0, 5)
+
+    # Existing order without position_impact keeps the stored value
+    result = bulk_writer.upsert_orders(db_session, [_order(run_id, "O1", status="CANCELED", impact=None)])
+    db_session.commit()
+    assert result == {"inserted": 0, "updated": 1}
+    db_session.refresh(o1)
+    assert o1.status == OrderStatus.CANCELED
+    assert o1.position_impact == PositionImpactType.OPEN
+
+
+def test_upsert_executions_splits_inserts_and_updates(db_session):
+    run_id = str(uuid.uuid4())
+    bulk_writer.upsert_executions(db_session, [_execution(run_id, "E1"), _execution(run_id, "E2")])
+    db_session.commit()
+
+    result = bulk_writer.upsert_executions(db_session, [
+        _execution(run_id, "E2", price=1.2),
+        _execution(run_id, "E3"),
+        _execution(run_id, "E2", price=1.3),
+    ])
+    db_session.commit()
+    assert result == {"inserted": 1, "updated": 1}
+
+    prices = dict(db_session.query(Execution.execution_id, Execution.price).filter(Execution.run_id == run_id).all())
+    assert prices == {"E1": 1.1, "E2": 1.3, "E3": 1.1}
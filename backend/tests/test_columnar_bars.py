@@ -0,0 +1,78 @@
+import uuid
+
+import numpy as np
+import pytest
+
+from src.core import bulk_writer
+from src.core.columnar_bars import (
+    BAR_DTYPE, NUMPY_CONTENT_TYPE, ARROW_CONTENT_TYPE,
+    encode_numpy_bars, decode_bars, ColumnarBarError
+)
+from src.database.models import MarketBar
+
+
+def _array(count, start="2024-01-01T00:00", price=100.0):
+    bars = np.zeros(count, dtype=BAR_DTYPE)
+    bars["ts"] = (np.datetime64(start, "ns") + np.arange(count) * np.timedelta64(1, "m")).view("int64")
+    bars["open"] = price
+    bars["high"] = price + 1
+    bars["low"] = price - 1
+    bars["close"] = price + 0.5
+    bars["volume"] = 10.0
+    return bars
+
+
+def _header(symbol):
+    return {"run_id": str(uuid.uuid4()), "symbol": symbol, "timeframe": "1m", "venue": "V", "provider": "P"}
+
+
+def test_numpy_payload_roundtrip_and_dedup(client, db_session):
+    symbol = f"COL_{uuid.uuid4().hex[:8]}"
+    bars = np.concatenate([_array(100), _array(1, price=200.0)])  # last bar repeats ts 0 with new prices
+
+    resp = client.post(
+        "/api/ingest/batch/bars/columnar",
+        content=encode_numpy_bars(_header(symbol), bars),
+        headers={"Content-Type": NUMPY_CONTENT_TYPE}
+    )
+    assert resp.status_code == 200, resp.text
+    assert resp.json()["inserted"] == 100
+
+    series_id = bulk_writer.market_series_id(symbol, "1m", "V", "P")
+    rows = db_session.query(MarketBar).filter(MarketBar.series_id == series_id).order_by(MarketBar.ts_utc).all()
+    assert len(rows) == 100
+    assert rows[0].open == 200.0
+    assert str(rows[1].ts_utc) == "2024-01-01 00:01:00"
+
+
+def test_arrow_payload(client, db_session):
+    pa = pytest.importorskip("pyarrow")
+    symbol = f"COL_{uuid.uuid4().hex[:8]}"
+    bars = _array(10)
+    table = pa.table(
+        {"ts": pa.array(bars["ts"].view("datetime64[ns]")), **{f: bars[f] for f in ("open", "high", "low", "close", "volume")}}
+    ).replace_schema_metadata(_header(symbol))
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+
+    resp = client.post(
+        "/api/ingest/batch/bars/columnar",
+        content=sink.getvalue().to_pybytes(),
+        headers={"Content-Type": ARROW_CONTENT_TYPE}
+    )
+    assert resp.status_code == 200, resp.text
+    assert resp.json()["inserted"] == 10
+
+
+def test_validation_is_reported_per_rule():
+    bars = _array(5)
+    bars["high"][2] = 0.0
+    bars["volume"][3] = -1.0
+    with pytest.raises(ColumnarBarError) as exc:
+        decode_bars(encode_numpy_bars(_header("X"), bars), NUMPY_CONTENT_TYPE)
+    assert "high_below_open_close_low" in str(exc.value)
+    assert "negative_volume" in str(exc.value)
+
+    with pytest.raises(ColumnarBarError):
+        decode_bars(b"garbage", "text/plain")
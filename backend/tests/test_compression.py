@@ -0,0 +1,92 @@
+import gzip
+import json
+import uuid
+
+import pytest
+
+from src.api import compression
+from src.database.models import Order
+
+
+def _orders(run_id, count):
+    return [
+        {"run_id": run_id, "order_id": f"O{i}", "symbol": "EURUSD", "side": "BUY", "order_type": "MARKET",
+         "quantity": 1.0, "status": "FILLED", "submit_utc": "2024-01-01T00:00:00"}
+        for i in range(count)
+    ]
+
+
+def test_negotiate_encoding():
+    assert compression.negotiate_encoding("gzip, deflate") == "gzip"
+    assert compression.negotiate_encoding("gzip;q=0") is None
+    assert compression.negotiate_encoding("br") is None
+    assert compression.negotiate_encoding("*") == compression.supported_encodings()[0]
+
+
+def test_gzip_request_body_is_decoded(client, db_session):
+    run_id = str(uuid.uuid4())
+    body = gzip.compress(json.dumps(_orders(run_id, 50)).encode())
+    resp = client.post("/api/ingest/batch/orders", content=body,
+                       headers={"Content-Type": "application/json", "Content-Encoding": "gzip"})
+    assert resp.status_code == 200, resp.text
+    assert resp.json()["inserted"] == 50
+    assert db_session.query(Order).filter(Order.run_id == run_id).count() == 50
+    assert client.get("/api/compression/stats").json()["requests"]["gzip"]["count"] >= 1
+
+
+def test_bad_request_encodings(client):
+    resp = client.post("/api/ingest/batch/orders", content=b"xx",
+                       headers={"Content-Type": "application/json", "Content-Encoding": "br"})
+    assert resp.status_code == 415
+
+    resp = client.post("/api/ingest/batch/orders", content=b"not gzip",
+                       headers={"Content-Type": "application/json", "Content-Encoding": "gzip"})
+    assert resp.status_code == 400
+
+    truncated = gzip.compress(json.dumps(_orders("r", 5)).encode())[:-10]
+    resp = client.post("/api/ingest/batch/orders", content=truncated,
+                       headers={"Content-Type": "application/json", "Content-Encoding": "gzip"})
+    assert resp.status_code == 400
+
+
+def test_zstd_request_body_is_decoded(client):
+    zstandard = pytest.importorskip("zstandard")
+    body = zstandard.ZstdCompressor().compress(json.dumps(_orders(str(uuid.uuid4()), 3)).encode())
+    resp = client.post("/api/ingest/batch/orders", content=body,
+                       headers={"Content-Type": "application/json", "Content-Encoding": "zstd"})
+    assert resp.status_code == 200, resp.text
+
+
+def test_compression_bombs_are_rejected_in_bounded_steps(client):
+    plain = bytes(96 << 20)  # above the 64 MiB default cap
+    bomb = gzip.compress(plain, compresslevel=9)
+    pieces = list(compression.make_decoder("gzip").decompress(bomb))
+    assert sum(map(len, pieces)) == len(plain)
+    assert max(map(len, pieces)) <= compression.DECODE_STEP_BYTES
+
+    resp = client.post("/api/ingest/batch/orders", content=bomb,
+                       headers={"Content-Type": "application/json", "Content-Encoding": "gzip"})
+    assert resp.status_code == 413
+
+    zstandard = pytest.importorskip("zstandard")
+    bomb = zstandard.ZstdCompressor(level=19).compress(plain)
+    pieces = list(compression.make_decoder("zstd").decompress(bomb))
+    assert sum(map(len, pieces)) == len(plain)
+    assert max(map(len, pieces)) <= (compression.ZSTD_INPUT_STEP // 4 + 1) * (128 << 10)
+
+
+def test_response_compression_respects_threshold(client):
+    small = client.get("/health", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+
+    large = client.get("/openapi.json", headers={"Accept-Encoding": "gzip"})
+    assert large.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in large.headers["vary"]
+    assert large.json()["info"]["title"]
+
+    plain = client.get("/openapi.json", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+
+    stats = client.get("/api/compression/stats").json()
+    assert stats["responses"]["gzip"]["ratio"] > 1
+    assert stats["responses_below_threshold"] >= 1
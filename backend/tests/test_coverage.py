@@ -0,0 +1,68 @@
+import uuid
+from datetime import datetime, timedelta
+
+from src.api.schemas import BarCreate
+from src.core import bulk_writer, coverage
+from src.database.models import (
+    Execution, MarketSeriesCoverage, RunType, Strategy, StrategyInstance, StrategyRun
+)
+
+
+def _bars(symbol, start, minutes):
+    return [BarCreate(run_id="COVERAGE_RUN", symbol=symbol, timeframe="1m", ts_utc=start + timedelta(minutes=m),
+                      open=1, high=2, low=0.5, close=1.5, volume=1) for m in minutes]
+
+
+def _ingest(db, bars):
+    bulk_writer.upsert_bars(db, bars)
+    db.commit()
+
+
+def test_catalog_tracks_bounds_count_and_gaps(client, db_session):
+    symbol = f"COV_{uuid.uuid4().hex[:8]}"
+    t0 = datetime(2024, 1, 1)
+    _ingest(db_session, _bars(symbol, t0, list(range(10)) + list(range(20, 30))))
+    series_id = bulk_writer.market_series_id(symbol, "1m", "Unknown", "Unknown")
+    row = db_session.get(MarketSeriesCoverage, series_id)
+    assert (row.first_utc, row.last_utc, row.bar_count, row.interval_seconds) == \
+        (t0, t0 + timedelta(minutes=29), 20, 60)
+    assert [(g["from_utc"], g["to_utc"]) for g in coverage.as_dict(row)["gaps"]] == \
+        [(t0 + timedelta(minutes=9), t0 + timedelta(minutes=20))]
+
+    # Re-sent bars do not count twice; a partial fill splits the hole; appends after a pause open a new one
+    _ingest(db_session, _bars(symbol, t0, [5, 6, 14, 15, 40]))
+    db_session.refresh(row)
+    assert row.bar_count == 23
+    assert row.gaps_json == [
+        [coverage.to_epoch_us(t0 + timedelta(minutes=a)), coverage.to_epoch_us(t0 + timedelta(minutes=b))]
+        for a, b in [(9, 14), (15, 20), (29, 40)]
+    ]
+    _ingest(db_session, _bars(symbol, t0 - timedelta(minutes=3), [0, 1, 2]))
+    db_session.refresh(row)
+    assert (row.first_utc, row.bar_count, len(row.gaps_json)) == (t0 - timedelta(minutes=3), 26, 3)
+
+    # The rebuild from the bars agrees with the incremental catalog
+    incremental = (row.first_utc, row.last_utc, row.bar_count, list(row.gaps_json))
+    coverage.rebuild(db_session, series_id)
+    db_session.commit()
+    assert (row.first_utc, row.last_utc, row.bar_count, row.gaps_json) == incremental
+
+    strategy_id, instance_id, run_id = (str(uuid.uuid4()) for _ in range(3))
+    db_session.add(Strategy(strategy_id=strategy_id, name="Coverage"))
+    db_session.add(StrategyInstance(instance_id=instance_id, strategy_id=strategy_id, parameters_json={}))
+    db_session.add(StrategyRun(run_id=run_id, instance_id=instance_id, run_type=RunType.BACKTEST))
+    db_session.add_all([Execution(run_id=run_id, execution_id=f"E{m}", order_id=f"O{m}", price=1, quantity=1,
+                                  exec_utc=t0 + timedelta(minutes=m)) for m in (20, 27)])
+    db_session.commit()
+
+    resp = client.get("/api/market/coverage", params={"symbol": symbol, "run_id": run_id})
+    assert resp.status_code == 200
+    (entry,) = resp.json()
+    assert entry["series_id"] == series_id and entry["bar_count"] == 26 and entry["timeframe"] == "1m"
+    assert entry["covers_run"] is True and len(entry["gaps"]) == 3
+
+    db_session.query(Execution).filter(Execution.run_id == run_id, Execution.execution_id == "E27").update(
+        {Execution.exec_utc: t0 + timedelta(minutes=35)})
+    db_session.commit()
+    (entry,) = client.get("/api/market/coverage", params={"series_id": series_id, "run_id": run_id}).json()
+    assert entry["covers_run"] is False
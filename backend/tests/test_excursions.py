@@ -0,0 +1,91 @@
+import uuid
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from sqlalchemy import event
+
+from src.api.schemas import BarCreate
+from src.core import bulk_writer
+from src.database.connection import engine
+from src.database.models import RunType, Strategy, StrategyInstance, StrategyRun, Trade
+from src.quantlab.excursions import excursions
+
+
+def _naive(ts, high, low, entry, exit_, price, is_long):
+    mae, mfe = [], []
+    for e, x, p, long in zip(entry, exit_, price, is_long):
+        window = (ts >= e) & (ts <= x)
+        if not window.any():
+            mae.append(np.nan)
+            mfe.append(np.nan)
+            continue
+        top, bottom = high[window].max(), low[window].min()
+        mfe.append(max(0.0, top - p if long else p - bottom))
+        mae.append(max(0.0, p - bottom if long else top - p))
+    return np.array(mae), np.array(mfe)
+
+
+def test_kernel_matches_per_trade_windows():
+    rng = np.random.default_rng(7)
+    ts = np.sort(rng.choice(10_000, size=2_000, replace=False)).astype("int64")
+    close = 100 + np.cumsum(rng.normal(size=len(ts)))
+    high, low = close + rng.random(len(ts)), close - rng.random(len(ts))
+
+    # Overlapping, nested, empty and out-of-range windows, in no particular order
+    entry = rng.integers(-500, 10_500, size=500)
+    exit_ = entry + rng.integers(0, 800, size=500)
+    price = 100 + rng.normal(size=500) * 5
+    is_long = rng.random(500) < 0.5
+    entry[:3], exit_[:3] = [ts[-1], ts[0], ts[5] + 1], [ts[-1], ts[0], ts[5] + 1]
+
+    mae, mfe = excursions(ts, high, low, entry, exit_, price, is_long)
+    expected_mae, expected_mfe = _naive(ts, high, low, entry, exit_, price, is_long)
+    np.testing.assert_allclose(mae, expected_mae, equal_nan=True)
+    np.testing.assert_allclose(mfe, expected_mfe, equal_nan=True)
+    assert not np.isnan(mae[0]) and not np.isnan(mae[1])
+
+
+def test_rebuild_fills_mae_mfe_from_market_bars_in_one_update(client, db_session):
+    strategy_id, instance_id, run_id = (str(uuid.uuid4()) for _ in range(3))
+    symbol = f"EXC_{run_id[:8]}"
+    db_session.add(Strategy(strategy_id=strategy_id, name="Excursions"))
+    db_session.add(StrategyInstance(instance_id=instance_id, strategy_id=strategy_id, parameters_json={}))
+    db_session.add(StrategyRun(run_id=run_id, instance_id=instance_id, run_type=RunType.BACKTEST))
+    db_session.commit()
+
+    t0 = datetime(2024, 1, 1)
+    bulk_writer.upsert_bars(db_session, [
+        BarCreate(run_id=run_id, symbol=symbol, timeframe="1m", ts_utc=t0 + timedelta(minutes=m),
+                  open=100 + m, high=101 + m, low=99 + m - (5 if m == 3 else 0), close=100 + m, volume=1)
+        for m in range(10)
+    ])
+    db_session.commit()
+
+    # Long 1 -> 4 at 101 and short 5 -> 8 at 105
+    fills = [("L", "BUY", 1, 101.0), ("LX", "SELL", 4, 104.0), ("S", "SELL", 5, 105.0), ("SX", "BUY", 8, 108.0)]
+    orders = [{"run_id": run_id, "order_id": oid, "symbol": symbol, "side": side, "order_type": "MARKET",
+               "quantity": 1.0, "status": "FILLED", "submit_utc": (t0 + timedelta(minutes=m)).isoformat()}
+              for oid, side, m, _ in fills]
+    executions = [{"run_id": run_id, "execution_id": f"E_{oid}", "order_id": oid,
+                   "exec_utc": (t0 + timedelta(minutes=m)).isoformat(), "price": price, "quantity": 1.0}
+                  for oid, _, m, price in fills]
+    assert client.post("/api/ingest/stream", json={"orders": orders, "executions": executions}).status_code == 200
+
+    statements = []
+    def count(conn, cursor, statement, *args):
+        if statement.startswith("UPDATE trades"):
+            statements.append(statement)
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        assert client.post(f"/api/trades/rebuild/{run_id}").json()["count"] == 2
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    assert len(statements) == 1
+
+    db_session.expire_all()
+    trades = {t.side.name: t for t in db_session.query(Trade).filter(Trade.run_id == run_id)}
+    # Long: bars 1..4, highs up to 105, lows down to 97 (bar 3)
+    assert (trades["BUY"].mfe, trades["BUY"].mae) == pytest.approx((4.0, 4.0))
+    # Short: bars 5..8, highs up to 109, lows down to 104
+    assert (trades["SELL"].mfe, trades["SELL"].mae) == pytest.approx((1.0, 4.0))
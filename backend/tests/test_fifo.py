@@ -0,0 +1,86 @@
+import random
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from src.database.models import Side
+from src.quantlab.fifo import fifo_match, reconstruct_columnar, to_records
+from src.quantlab.metrics import MetricsEngine
+
+
+def _fills(count, seed, symbols=("EURUSD", "GBPUSD", "USDJPY")):
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    orders, executions = [], []
+    for i in range(count // 3):
+        orders.append(SimpleNamespace(order_id=f"O{i}", side=rng.choice([Side.BUY, Side.SELL]),
+                                      symbol=rng.choice(symbols)))
+    for i in range(count):
+        executions.append(SimpleNamespace(
+            execution_id=f"E{i}", order_id=f"O{rng.randrange(len(orders) + 5)}",  # a few without an order
+            # Coarse timestamps: plenty of ties, which must keep arrival order
+            exec_utc=start + timedelta(seconds=rng.randint(0, count // 2), microseconds=rng.choice([0, 250])),
+            price=round(rng.uniform(90, 110), 5),
+            # Partial fills whose sums leave floating-point dust around the lot tolerance
+            quantity=rng.choice([0.1, 0.2, 0.3, 0.7, 1.0, 2.5, 1e-8]),
+        ))
+    return executions, orders
+
+
+def _columnar(executions, orders):
+    by_id = {o.order_id: o for o in orders}
+    known = [e for e in executions if e.order_id in by_id]
+    return reconstruct_columnar(
+        exec_utc=np.array([e.exec_utc for e in known], dtype="datetime64[us]"),
+        symbol=[by_id[e.order_id].symbol for e in known],
+        is_buy=[by_id[e.order_id].side == Side.BUY for e in known],
+        quantity=[e.quantity for e in known],
+        price=[e.price for e in known],
+        order_id=[e.order_id for e in known],
+        execution_id=[e.execution_id for e in known],
+    )
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3, 4])
+def test_kernel_matches_reference_reconstruction(seed):
+    executions, orders = _fills(3000, seed)
+    expected = MetricsEngine.reconstruct_trades(executions, orders)
+    actual = to_records(_columnar(executions, orders))
+
+    assert len(expected) > 500
+    assert actual == expected
+
+
+def test_empty_and_one_sided_input():
+    assert to_records(_columnar([], [])) == []
+    executions, orders = _fills(200, 5)
+    for o in orders:
+        o.side = Side.BUY
+    assert to_records(_columnar(executions, orders)) == MetricsEngine.reconstruct_trades(executions, orders) == []
+
+
+def test_carried_over_lots_and_snapshots_match_one_pass():
+    rng = np.random.default_rng(11)
+    n = 5000
+    symbol = rng.integers(0, 3, size=n)
+    is_buy = rng.random(n) < 0.5
+    quantity = rng.choice([0.5, 1.0, 1.5, 3.0], size=n)
+    whole = fifo_match(symbol, is_buy, quantity, snapshots=[0, 1200, 1200, 4000, n])
+    assert len(whole.snapshots) == 5 and whole.snapshots[0] == {} and whole.snapshots[-1] == whole.open_lots
+
+    # Resume from the snapshot taken before row 1200: its lots are the seed rows of the second pass
+    split = 1200
+    lots = [lot for code_lots in whole.snapshots[1].values() for lot in code_lots]
+    rows = np.array([i for i, _ in lots] + list(range(split, n)))
+    seeded_qty = np.concatenate([[q for _, q in lots], quantity[split:]])
+    resumed = fifo_match(symbol[rows], is_buy[rows], seeded_qty, n_open=len(lots))
+
+    first = np.flatnonzero(whole.exit < split)
+    assert first.size and (np.diff(whole.exit) >= 0).all()
+    tail = slice(first.size, None)
+    np.testing.assert_array_equal(rows[resumed.entry], whole.entry[tail])
+    np.testing.assert_array_equal(rows[resumed.exit], whole.exit[tail])
+    np.testing.assert_array_equal(resumed.quantity, whole.quantity[tail])
+    assert {c: [(rows[i], q) for i, q in l] for c, l in resumed.open_lots.items()} == whole.open_lots
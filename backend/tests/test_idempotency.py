@@ -0,0 +1,59 @@
+import uuid
+
+from src.core.idempotency import idempotency_filter
+from src.database.connection import SessionLocal
+from src.database.models import Execution, IngestEvent
+
+
+def _executions(run_id, count, price=1.1):
+    return [{"run_id": run_id, "execution_id": f"E{i}", "order_id": "O1", "exec_utc": f"2024-01-01T00:0{i}:00",
+             "price": price, "quantity": 1.0} for i in range(count)]
+
+
+def test_replayed_execution_batch_skips_database(client, db_session):
+    run_id = str(uuid.uuid4())
+    first = client.post("/api/ingest/batch/executions", json=_executions(run_id, 3))
+    assert first.json()["inserted"] == 3
+
+    replay = client.post("/api/ingest/batch/executions", json=_executions(run_id, 4))
+    assert replay.json() == {"status": "ok", "count": 4, "inserted": 1, "updated": 0, "duplicates": 3}
+
+    # Changed payloads are not duplicates
+    changed = client.post("/api/ingest/batch/executions", json=_executions(run_id, 2, price=1.2))
+    assert changed.json()["updated"] == 2 and changed.json()["duplicates"] == 0
+
+    assert db_session.query(Execution).filter(Execution.run_id == run_id).count() == 4
+    assert db_session.query(IngestEvent).filter(IngestEvent.run_id == run_id).count() == 6
+
+    stats = client.get("/api/ingest/idempotency/status").json()["executions"]
+    run_stats = next(r for r in stats["runs"] if r["run_id"] == run_id)
+    assert run_stats["seen"] == 9 and run_stats["duplicates"] == 3
+
+
+def test_filter_seeds_from_existing_rows_and_ignores_rollbacks(client, db_session):
+    run_id = str(uuid.uuid4())
+    client.post("/api/ingest/batch/executions", json=_executions(run_id, 2))
+    idempotency_filter.forget(db_session, run_id)
+
+    from src.api.schemas import ExecutionCreate
+    items = [ExecutionCreate(**e) for e in _executions(run_id, 3)]
+    db = SessionLocal()
+    try:
+        fresh, dropped = idempotency_filter.filter_executions(db, items)
+        assert dropped == 2 and [e.execution_id for e in fresh] == ["E2"]
+        db.rollback()
+        # E2 never committed, so it is still new
+        fresh, dropped = idempotency_filter.filter_executions(db, items)
+        assert [e.execution_id for e in fresh] == ["E2"]
+    finally:
+        db.close()
+
+
+def test_idempotency_key_returns_cached_response(client):
+    run_id = str(uuid.uuid4())
+    headers = {"Idempotency-Key": f"batch-{run_id}"}
+    first = client.post("/api/ingest/batch/executions", json=_executions(run_id, 2), headers=headers)
+    retry = client.post("/api/ingest/batch/executions", json=_executions(run_id, 2), headers=headers)
+    assert retry.json() == first.json()
+    assert retry.headers["Idempotent-Replay"] == "true"
+    assert client.get("/api/ingest/idempotency/status").json()["batch_keys"]["replays"] >= 1
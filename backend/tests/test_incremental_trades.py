@@ -0,0 +1,106 @@
+import random
+import uuid
+from datetime import datetime, timedelta
+
+from src.core import trade_service as trade_service_module
+from src.core.trade_service import TradeService
+from src.database.models import (
+    Trade, Execution, Order, StrategyRun, StrategyInstance, TradeReconstructionState,
+    TradeReconstructionCheckpoint, Side, OrderType, OrderStatus, RunType
+)
+
+
+def _setup_run(db):
+    run_id = str(uuid.uuid4())
+    instance_id = str(uuid.uuid4())
+    db.add(StrategyInstance(instance_id=instance_id, strategy_id="INC_STRAT", parameters_json={}))
+    db.add(StrategyRun(run_id=run_id, instance_id=instance_id, run_type=RunType.BACKTEST))
+    db.commit()
+    return run_id
+
+
+def _order(run_id, order_id, side, symbol="EURUSD"):
+    return Order(run_id=run_id, order_id=order_id, symbol=symbol, side=side, order_type=OrderType.MARKET,
+                 quantity=1.0, status=OrderStatus.FILLED)
+
+
+def _fills(count, seed):
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    return [
+        (f"O{i}", rng.choice([Side.BUY, Side.SELL]), rng.choice(["EURUSD", "GBPUSD"]),
+         start + timedelta(minutes=rng.randint(0, 120)), round(rng.uniform(1, 2), 4), rng.choice([1.0, 2.0, 0.5]))
+        for i in range(count)
+    ]
+
+
+def _trade_rows(db, run_id):
+    return sorted(
+        (t.symbol, t.side.name, t.entry_time, t.exit_time, t.entry_price, t.exit_price, round(t.quantity, 9))
+        for t in db.query(Trade).filter(Trade.run_id == run_id)
+    )
+
+
+def test_incremental_matches_full_rebuild_with_late_and_out_of_order_fills(db_session, monkeypatch):
+    monkeypatch.setattr(trade_service_module, "TRADE_CHECKPOINT_EVERY", 5)
+    run_id = _setup_run(db_session)
+    service = TradeService(db_session)
+    fills = _fills(60, seed=7)
+
+    # Arrive in shuffled batches; some orders only show up a batch after their fill
+    order = list(range(len(fills)))
+    random.Random(3).shuffle(order)
+    late_orders = []
+    for start in range(0, len(order), 12):
+        for oid, side, symbol, _, _, _ in late_orders:
+            db_session.add(_order(run_id, oid, side, symbol))
+        late_orders = []
+        for i in order[start:start + 12]:
+            oid, side, symbol, ts, price, qty = fills[i]
+            if i % 7 == 0:
+                late_orders.append(fills[i])
+            else:
+                db_session.add(_order(run_id, oid, side, symbol))
+            db_session.add(Execution(run_id=run_id, execution_id=f"E{i}", order_id=oid,
+                                     exec_utc=ts, price=price, quantity=qty))
+        db_session.commit()
+        service.update_trades_incremental(run_id)
+    for oid, side, symbol, _, _, _ in late_orders:
+        db_session.add(_order(run_id, oid, side, symbol))
+    db_session.commit()
+    service.update_trades_incremental(run_id)
+
+    incremental = _trade_rows(db_session, run_id)
+    assert db_session.query(TradeReconstructionCheckpoint).filter_by(run_id=run_id).count() > 0
+
+    service.rebuild_trades_for_run(run_id)
+    assert incremental == _trade_rows(db_session, run_id)
+    assert len(incremental) > 0
+
+
+def test_in_order_fills_only_append(db_session):
+    run_id = _setup_run(db_session)
+    service = TradeService(db_session)
+    t0 = datetime(2024, 1, 1)
+    db_session.add_all([_order(run_id, "B1", Side.BUY), _order(run_id, "S1", Side.SELL)])
+    db_session.add(Execution(run_id=run_id, execution_id="E1", order_id="B1", exec_utc=t0, price=1.0, quantity=2.0))
+    db_session.commit()
+    assert service.update_trades_incremental(run_id) == 0
+
+    state = db_session.get(TradeReconstructionState, run_id)
+    assert state.open_lots_json["EURUSD"][0]["quantity"] == 2.0
+
+    db_session.add(Execution(run_id=run_id, execution_id="E2", order_id="S1",
+                             exec_utc=t0 + timedelta(minutes=1), price=1.5, quantity=1.0))
+    db_session.commit()
+    assert service.update_trades_incremental(run_id) == 1
+
+    db_session.add(Execution(run_id=run_id, execution_id="E3", order_id="S1",
+                             exec_utc=t0 + timedelta(minutes=2), price=1.2, quantity=1.0))
+    db_session.commit()
+    first_trade = db_session.query(Trade.trade_id).filter_by(run_id=run_id).scalar()
+    assert service.update_trades_incremental(run_id) == 1
+
+    trade_ids = {row[0] for row in db_session.query(Trade.trade_id).filter_by(run_id=run_id)}
+    assert first_trade in trade_ids and len(trade_ids) == 2
+    assert db_session.get(TradeReconstructionState, run_id).open_lots_json == {}
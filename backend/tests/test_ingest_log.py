@@ -0,0 +1,67 @@
+import uuid
+
+import numpy as np
+
+from src.core.columnar_bars import BAR_DTYPE, NUMPY_CONTENT_TYPE, encode_numpy_bars
+from src.core.ingest_log import replay_runs
+from src.database.connection import SessionLocal
+from src.database.models import (
+    IngestEvent, Order, Execution, Trade, StrategyRun, StrategyInstance, RunType
+)
+
+
+def _ingest_run(client, db_session, symbol):
+    run_id = str(uuid.uuid4())
+    instance_id = str(uuid.uuid4())
+    db_session.add(StrategyInstance(instance_id=instance_id, strategy_id="LOG_STRAT", parameters_json={}))
+    db_session.add(StrategyRun(run_id=run_id, instance_id=instance_id, run_type=RunType.BACKTEST))
+    db_session.commit()
+
+    orders = [
+        {"run_id": run_id, "order_id": oid, "symbol": symbol, "side": side, "order_type": "MARKET",
+         "quantity": 1.0, "status": "FILLED", "submit_utc": f"2024-01-01T00:0{i}:00"}
+        for i, (oid, side) in enumerate([("B1", "BUY"), ("S1", "SELL")])
+    ]
+    executions = [
+        {"run_id": run_id, "execution_id": f"E{i}", "order_id": oid,
+         "exec_utc": f"2024-01-01T00:0{i}:00", "price": price, "quantity": 1.0}
+        for i, (oid, price) in enumerate([("B1", 1.0), ("S1", 1.5)])
+    ]
+    assert client.post("/api/ingest/stream", json={"orders": orders, "executions": executions}).status_code == 200
+    # Re-sent execution with a corrected price: replay must end with the last value
+    executions[1]["price"] = 1.7
+    assert client.post("/api/ingest/batch/executions", json=[executions[1]]).status_code == 200
+
+    bars = np.zeros(3, dtype=BAR_DTYPE)
+    bars["ts"] = (np.datetime64("2024-01-01T00:00", "ns") + np.arange(3) * np.timedelta64(1, "m")).view("int64")
+    bars["open"], bars["high"], bars["low"], bars["close"], bars["volume"] = 1.0, 2.0, 0.5, 1.5, 1.0
+    header = {"run_id": run_id, "symbol": symbol, "timeframe": "1m"}
+    resp = client.post("/api/ingest/batch/bars/columnar", content=encode_numpy_bars(header, bars),
+                       headers={"Content-Type": NUMPY_CONTENT_TYPE})
+    assert resp.status_code == 200
+    return run_id
+
+
+def test_ingest_appends_to_log_and_replay_restores_runs(client, db_session):
+    run_ids = [_ingest_run(client, db_session, f"LOG_{uuid.uuid4().hex[:6]}") for _ in range(2)]
+    events = db_session.query(IngestEvent).filter(IngestEvent.run_id == run_ids[0]).order_by(IngestEvent.id).all()
+    assert [e.event_type for e in events] == ["order", "order", "execution", "execution", "execution", "bar_columns"]
+
+    # Corrupt both runs
+    for run_id in run_ids:
+        db_session.query(Execution).filter(Execution.run_id == run_id).delete()
+        db_session.query(Order).filter(Order.run_id == run_id, Order.order_id == "S1").delete()
+    db_session.commit()
+
+    results = replay_runs(run_ids, SessionLocal, workers=2)
+    assert sorted(r["run_id"] for r in results) == sorted(run_ids)
+    assert all("error" not in r for r in results)
+
+    db_session.expire_all()
+    for run_id in run_ids:
+        assert db_session.query(Order).filter(Order.run_id == run_id).count() == 2
+        prices = {e.execution_id: e.price for e in db_session.query(Execution).filter(Execution.run_id == run_id)}
+        assert prices == {"E0": 1.0, "E1": 1.7}
+        trades = db_session.query(Trade).filter(Trade.run_id == run_id).all()
+        assert len(trades) == 1 and trades[0].exit_price == 1.7
+    assert results[0]["replayed"]["bar_columns"] == 3
@@ -0,0 +1,87 @@
+import threading
+import uuid
+
+import pytest
+
+from src.core.metrics_cache import metrics_cache, run_version
+from src.database.models import RunType, Strategy, StrategyInstance, StrategyRun
+from src.services.analytics import AnalyticsRouter
+
+
+def _fills(run_id, start, exit_price):
+    orders = [{"run_id": run_id, "order_id": f"{side}{start}", "symbol": "MCACHE", "side": side,
+               "order_type": "MARKET", "quantity": 1.0, "status": "FILLED",
+               "submit_utc": f"2024-01-01T00:{start + i:02d}:00"} for i, side in enumerate(("BUY", "SELL"))]
+    executions = [{"run_id": run_id, "execution_id": f"E{side}{start}", "order_id": f"{side}{start}",
+                   "exec_utc": f"2024-01-01T00:{start + i:02d}:00", "price": price, "quantity": 1.0}
+                  for i, (side, price) in enumerate((("BUY", 1.0), ("SELL", exit_price)))]
+    return {"orders": orders, "executions": executions}
+
+
+@pytest.fixture
+def analyses(monkeypatch):
+    """Counts route_analysis calls; background refreshes wait for the returned gate."""
+    monkeypatch.setattr(metrics_cache, "enabled", True)
+    calls, gate = [], threading.Event()
+    original = AnalyticsRouter.route_analysis
+
+    def counted(self, *args, **kwargs):
+        if threading.current_thread().name.startswith("metrics-cache"):
+            assert gate.wait(5)
+        calls.append(kwargs.get("run_id"))
+        return original(self, *args, **kwargs)
+
+    monkeypatch.setattr(AnalyticsRouter, "route_analysis", counted)
+    yield calls, gate
+    gate.set()
+    metrics_cache.join(5)
+
+
+def test_reads_are_cached_until_the_run_data_changes(client, db_session, analyses):
+    calls, gate = analyses
+    strategy_id, instance_id, run_id = (str(uuid.uuid4()) for _ in range(3))
+    db_session.add(Strategy(strategy_id=strategy_id, name="MetricsCache"))
+    db_session.add(StrategyInstance(instance_id=instance_id, strategy_id=strategy_id, parameters_json={}))
+    db_session.add(StrategyRun(run_id=run_id, instance_id=instance_id, run_type=RunType.BACKTEST))
+    db_session.commit()
+
+    assert client.post("/api/ingest/stream", json=_fills(run_id, 0, 2.0)).status_code == 200
+    assert run_version(db_session, run_id) > 0
+    assert client.post(f"/api/trades/rebuild/{run_id}").json()["count"] == 1
+    calls.clear()
+
+    first = client.get(f"/api/runs/{run_id}").json()["metrics_json"]
+    assert first["total_trades"] == 1
+    assert client.get(f"/api/runs/{run_id}").json()["metrics_json"] == first
+    stats = client.get("/api/trades/stats", params={"strategy_id": strategy_id}).json()
+    assert client.get("/api/trades/stats", params={"strategy_id": strategy_id}).json() == stats
+    assert len(calls) == 2  # one per key, none for the repeated reads
+    db_session.expire_all()
+    assert db_session.get(StrategyRun, run_id).metrics_json == first
+
+    # New fills and a rebuild bump the version: stale metrics are served while one refresh runs
+    before = run_version(db_session, run_id)
+    assert client.post("/api/ingest/stream", json=_fills(run_id, 10, 3.0)).status_code == 200
+    assert client.post(f"/api/trades/rebuild/{run_id}").json()["count"] == 2
+    assert run_version(db_session, run_id) > before
+    calls.clear()
+
+    for _ in range(3):
+        assert client.get(f"/api/runs/{run_id}").json()["metrics_json"] == first
+    gate.set()
+    metrics_cache.join(5)
+    assert calls == [run_id]
+    assert client.get(f"/api/runs/{run_id}").json()["metrics_json"]["total_trades"] == 2
+
+    # Strategy-wide stats follow every run of the strategy, including new ones
+    client.get("/api/trades/stats", params={"strategy_id": strategy_id})
+    metrics_cache.join(5)
+    assert client.get("/api/trades/stats", params={"strategy_id": strategy_id}).json()["total_trades"] == 2
+    other_run = str(uuid.uuid4())
+    db_session.add(StrategyRun(run_id=other_run, instance_id=instance_id, run_type=RunType.BACKTEST))
+    db_session.commit()
+    assert client.post("/api/ingest/stream", json=_fills(other_run, 20, 1.5)).status_code == 200
+    assert client.post(f"/api/trades/rebuild/{other_run}").json()["count"] == 1
+    client.get("/api/trades/stats", params={"strategy_id": strategy_id})
+    metrics_cache.join(5)
+    assert client.get("/api/trades/stats", params={"strategy_id": strategy_id}).json()["total_trades"] == 3
@@ -0,0 +1,67 @@
+import asyncio
+import json
+import uuid
+
+from src.core.ndjson_ingest import iter_lines
+from src.database.models import Order, Execution, MarketBar
+
+
+def _events(run_id):
+    yield {"type": "order", "data": {"run_id": run_id, "order_id": "O1", "symbol": "EURUSD", "side": "BUY",
+                                     "order_type": "MARKET", "quantity": 1.0, "status": "FILLED",
+                                     "submit_utc": "2024-01-01T00:00:00"}}
+    for i in range(5):
+        yield {"type": "execution", "data": {"run_id": run_id, "execution_id": f"E{i}", "order_id": "O1",
+                                             "exec_utc": f"2024-01-01T00:0{i}:00", "price": 1.1, "quantity": 1.0}}
+    yield {"type": "bar", "data": {"run_id": run_id, "symbol": f"ND_{run_id[:8]}", "timeframe": "1m",
+                                   "ts_utc": "2024-01-01T00:00:00", "open": 1, "high": 2, "low": 0.5, "close": 1.5, "volume": 3}}
+
+
+def test_iter_lines_handles_split_and_oversized_lines():
+    async def stream():
+        for piece in (b'{"a":', b' 1}\n', b"x" * 20, b"y\nlast"):
+            yield piece
+
+    async def collect():
+        return [item async for item in iter_lines(stream(), max_line_bytes=10)]
+
+    assert asyncio.run(collect()) == [(1, b'{"a": 1}'), (2, None), (3, b"last")]
+
+
+def test_iter_lines_splits_many_lines_from_one_piece():
+    lines = [b'{"n": %d}' % i for i in range(20000)]
+
+    async def stream():
+        yield b"\n".join(lines[:15000]) + b"\n" + lines[15000][:4]
+        yield lines[15000][4:] + b"\n" + b"\n".join(lines[15001:])
+
+    async def collect():
+        return [item async for item in iter_lines(stream())]
+
+    assert asyncio.run(collect()) == list(enumerate(lines, start=1))
+
+
+def test_ndjson_stream_commits_per_chunk_and_reports_bad_lines(client, db_session):
+    run_id = str(uuid.uuid4())
+    lines = [json.dumps(e) for e in _events(run_id)]
+    lines.insert(3, "not json")
+    lines.insert(5, json.dumps({"type": "trade", "data": {}}))
+    lines.insert(6, json.dumps({"type": "execution", "data": {"run_id": run_id}}))
+    body = ("\n".join(lines) + "\n").encode()
+
+    resp = client.post("/api/ingest/stream/ndjson?chunk_lines=3", content=body,
+                       headers={"Content-Type": "application/x-ndjson"})
+    assert resp.status_code == 200, resp.text
+    report = resp.json()
+
+    assert report["status"] == "partial"
+    assert report["lines"] == 10
+    assert [f["line"] for f in report["failed_lines"]] == [4, 6, 7]
+    assert [c["status"] for c in report["chunks"]] == ["ok", "ok", "ok"]
+    assert [c["first_line"] for c in report["chunks"]] == [1, 5, 10]
+    assert sum(c["executions"] for c in report["chunks"]) == 5
+    assert sum(c["inserted"] for c in report["chunks"]) == 7
+
+    assert db_session.query(Order).filter(Order.run_id == run_id).count() == 1
+    assert db_session.query(Execution).filter(Execution.run_id == run_id).count() == 5
+    assert db_session.query(MarketBar).count() >= 1
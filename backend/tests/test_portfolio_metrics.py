@@ -0,0 +1,154 @@
+import uuid
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from src.database.models import (
+    Execution, Order, OrderStatus, OrderType, RunType, Side, Strategy, StrategyInstance, StrategyRun, Trade
+)
+from src.services.analytics.standard_analyzer import StandardAnalyzer
+
+
+def _reference_metrics(analyzer, trades, executions, orders):
+    """The previous row-by-row implementation, over ORM objects."""
+    rows = []
+    for t in trades:
+        d = t.__dict__.copy()
+        d.pop('_sa_instance_state', None)
+        d['side'] = d['side'].name
+        rows.append(d)
+    df = pd.DataFrame(rows)
+
+    winning, losing = df[df['pnl_net'] > 0], df[df['pnl_net'] <= 0]
+    win_rate = len(winning) / len(df)
+    gross_profit, gross_loss = winning['pnl_net'].sum(), abs(losing['pnl_net'].sum())
+    profit_factor = gross_profit / gross_loss if gross_loss > 0 else (gross_profit if gross_profit > 0 else 0.0)
+    net_profit = df['pnl_net'].sum()
+
+    df = df.sort_values('exit_time')
+    cumulative = df['pnl_net'].cumsum()
+    max_drawdown = (cumulative - cumulative.cummax()).min()
+    avg_win = winning['pnl_net'].mean() if not winning.empty else 0
+    avg_loss = abs(losing['pnl_net'].mean()) if not losing.empty else 0
+    expectancy = win_rate * avg_win - (1.0 - win_rate) * avg_loss
+    is_win = df['pnl_net'] > 0
+    groups = (is_win != is_win.shift()).cumsum()
+    streaks, kinds = is_win.groupby(groups).count(), is_win.groupby(groups).first()
+
+    if executions:
+        total_fees = sum([e.fee for e in executions])
+        total_volume = sum([e.price * e.quantity for e in executions])
+    else:
+        total_fees = df['commission'].sum()
+        total_volume = (df['entry_price'] * df['quantity']).sum() + (df['exit_price'] * df['quantity']).sum()
+    order_map = {o.order_id: o for o in orders}
+    latencies = []
+    for e in executions:
+        if e.order_id in order_map:
+            latency = (e.exec_utc - order_map[e.order_id].submit_utc).total_seconds()
+            if latency >= 0:
+                latencies.append(latency)
+    executed_qty = sum(e.quantity for e in executions)
+    ordered_qty = sum([o.quantity for o in orders]) if orders else 0.0
+
+    curve, running, peak = [], 0, 0
+    captured = potential = 0.0
+    for _, row in df.iterrows():
+        running += row['pnl_net']
+        peak = max(peak, running)
+        curve.append({"time": row['exit_time'].isoformat(), "pnl": round(running, 2),
+                      "drawdown": round(running - peak, 2)})
+        if not pd.isna(row['mfe']) and row['mfe'] > 0 and row['quantity'] > 0:
+            delta = row['exit_price'] - row['entry_price']
+            if row['side'] != 'BUY':
+                delta = -delta
+            captured += delta * row['quantity']
+            potential += row['mfe'] * row['quantity']
+
+    safe = analyzer._safe_float
+    return {
+        "total_trades": len(df),
+        "total_fees": safe(total_fees),
+        "total_volume": safe(total_volume),
+        "avg_fill_latency": safe(np.mean(latencies) if latencies else 0.0, 3),
+        "fill_ratio": safe(executed_qty / ordered_qty if ordered_qty > 0 else 0.0),
+        "win_rate": safe(win_rate * 100),
+        "profit_factor": safe(profit_factor),
+        "average_trade": safe(df['pnl_net'].mean()),
+        "net_profit": safe(net_profit),
+        "max_drawdown": safe(max_drawdown),
+        "expectancy": safe(expectancy),
+        "max_consecutive_wins": int(streaks[kinds].max()),
+        "max_consecutive_losses": int(streaks[~kinds].max()),
+        "sharpe_ratio": safe(analyzer._calculate_sharpe(df['pnl_net'], annualized=True)),
+        "sortino_ratio": safe(analyzer._calculate_sortino(df['pnl_net'], annualized=True)),
+        "calmar_ratio": safe(analyzer._calculate_calmar(net_profit, max_drawdown)),
+        "equity_curve": curve,
+        "avg_mae": safe(df['mae'].mean()),
+        "avg_mfe": safe(df['mfe'].mean()),
+        "efficiency_ratio": safe(captured / potential if potential else 0.0),
+        "stability_r2": safe(np.corrcoef(np.arange(len(df)), cumulative.values)[0, 1] ** 2),
+        "pnl_skew": safe(round(df['pnl_net'].skew(), 2)),
+        "pnl_kurtosis": safe(round(df['pnl_net'].kurtosis(), 2)),
+    }
+
+
+def _seed_run(db, instance_id, rng, trades, start):
+    run_id = str(uuid.uuid4())
+    db.add(StrategyRun(run_id=run_id, instance_id=instance_id, run_type=RunType.BACKTEST))
+    db.commit()
+    # Shuffled exit times (distinct), MFE missing on some trades, fractional seconds on some
+    offsets = rng.permutation(trades) * 3600 + rng.choice([0, 0.25, 0.5], size=trades)
+    for i in range(trades):
+        exit_time = start + timedelta(seconds=float(offsets[i]))
+        entry_price = float(np.round(100 + rng.normal(0, 5), 2))
+        db.add(Trade(
+            trade_id=str(uuid.uuid4()), run_id=run_id, symbol="PM", side=Side.BUY if rng.random() < 0.6 else Side.SELL,
+            entry_time=exit_time - timedelta(minutes=30), exit_time=exit_time, entry_price=entry_price,
+            exit_price=float(np.round(entry_price + rng.normal(0, 2), 2)), quantity=float(rng.choice([1.0, 2.5])),
+            pnl_net=float(np.round(rng.normal(3, 40), 4)), commission=float(rng.choice([0.0, 1.25])),
+            mae=float(rng.uniform(0, 4)), mfe=None if i % 7 == 0 else float(rng.uniform(-1, 6)),
+        ))
+    for i in range(2 * trades):
+        submit = start + timedelta(seconds=60 * i)
+        db.add(Order(run_id=run_id, order_id=f"O{i}", symbol="PM", side=Side.BUY, order_type=OrderType.MARKET,
+                     quantity=float(rng.choice([1.0, 2.0])), status=OrderStatus.FILLED, submit_utc=submit))
+        # Unknown orders and fills "before" their submission (clock skew) are left out of the latency
+        order_id = f"O{i}" if i % 11 else f"X{i}"
+        delay = float(rng.uniform(-2, 30)) if i % 5 else -1.0
+        db.add(Execution(run_id=run_id, execution_id=f"E{i}", order_id=order_id,
+                         exec_utc=submit + timedelta(seconds=delay), price=float(rng.uniform(90, 110)), quantity=1.0,
+                         fee=float(rng.choice([0.5, 1.0]))))
+    db.commit()
+    return run_id
+
+
+def test_metrics_match_the_row_by_row_implementation(db_session):
+    rng = np.random.default_rng(7)
+    strategy_id, instance_id = str(uuid.uuid4()), str(uuid.uuid4())
+    db_session.add(Strategy(strategy_id=strategy_id, name="PortfolioMetrics"))
+    db_session.add(StrategyInstance(instance_id=instance_id, strategy_id=strategy_id, parameters_json={}))
+    db_session.commit()
+    run_ids = [_seed_run(db_session, instance_id, rng, 120, datetime(2024, 1, 1)),
+               _seed_run(db_session, instance_id, rng, 80, datetime(2024, 3, 1, 0, 0, 1))]
+
+    analyzer = StandardAnalyzer(db_session)
+    for run_id in run_ids:
+        trades = db_session.query(Trade).filter(Trade.run_id == run_id).all()
+        executions = db_session.query(Execution).filter(Execution.run_id == run_id).all()
+        orders = db_session.query(Order).filter(Order.run_id == run_id).all()
+        expected = _reference_metrics(analyzer, trades, executions, orders)
+        assert expected["avg_fill_latency"] > 0
+        assert analyzer.calculate_portfolio_metrics(run_id=run_id) == expected
+
+    # Strategy-wide: no executions, fees and volume come from the trades
+    trades = db_session.query(Trade).filter(Trade.run_id.in_(run_ids)).all()
+    expected = _reference_metrics(analyzer, trades, [], [])
+    assert analyzer.calculate_portfolio_metrics(strategy_id=strategy_id) == expected
+    assert expected["total_trades"] == 200 and expected["total_fees"] > 0
+
+
+def test_empty_run_has_empty_metrics(db_session):
+    analyzer = StandardAnalyzer(db_session)
+    assert analyzer.calculate_portfolio_metrics(run_id=str(uuid.uuid4())) == analyzer._empty_metrics()
@@ -0,0 +1,131 @@
+"""
+Server-database mode against a disposable PostgreSQL instance: POSTGRES_TEST_URL
+(postgresql+psycopg://...) or a throwaway local server started through the
+`pgserver` package. Skipped when neither is available.
+"""
+import os
+import tempfile
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from src.api.schemas import BarCreate, ExecutionCreate
+from src.core import bulk_writer
+from src.core.trade_service import TradeService
+from src.database.connection import make_engine, setup_partitioning
+from src.database.models import (
+    Base, Strategy, StrategyInstance, StrategyRun, Execution, MarketBar, Trade, RunType, Side
+)
+
+psycopg = pytest.importorskip("psycopg")
+
+
+@pytest.fixture(scope="module")
+def pg_engine():
+    url = os.getenv("POSTGRES_TEST_URL")
+    server = None
+    if not url:
+        pgserver = pytest.importorskip("pgserver")
+        server = pgserver.get_server(tempfile.mkdtemp(), cleanup_mode="delete")
+        url = server.get_uri().replace("postgresql://", "postgresql+psycopg://", 1)
+    engine = make_engine(url)
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    Base.metadata.drop_all(bind=engine)
+    engine.dispose()
+    if server is not None:
+        server.cleanup()
+
+
+@pytest.fixture
+def pg_session(pg_engine):
+    session = sessionmaker(bind=pg_engine, autoflush=False)()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def copy_calls(monkeypatch):
+    monkeypatch.setattr(bulk_writer, "COPY_MIN_ROWS", 100)
+    calls = []
+    original = bulk_writer._copy
+
+    def spy(db, target, columns, tuples):
+        calls.append(target)
+        return original(db, target, columns, tuples)
+
+    monkeypatch.setattr(bulk_writer, "_copy", spy)
+    return calls
+
+
+def _run(db):
+    run_id, instance_id, strategy_id = (str(uuid.uuid4()) for _ in range(3))
+    db.add(Strategy(strategy_id=strategy_id, name="PG"))
+    db.add(StrategyInstance(instance_id=instance_id, strategy_id=strategy_id, parameters_json={}))
+    db.add(StrategyRun(run_id=run_id, instance_id=instance_id, run_type=RunType.BACKTEST))
+    db.commit()
+    return run_id
+
+
+def test_server_engine_is_pooled_with_statement_timeout(pg_engine):
+    assert pg_engine.pool.size() >= 1
+    with pg_engine.connect() as conn:
+        assert conn.exec_driver_sql("SHOW statement_timeout").scalar() != "0"
+
+
+def test_copy_upsert_executions(pg_session, copy_calls):
+    run_id = _run(pg_session)
+    start = datetime(2024, 1, 1)
+    items = [ExecutionCreate(run_id=run_id, execution_id=f"E{i}", order_id=f"O{i}", exec_utc=start + timedelta(seconds=i),
+                             price=1.0, quantity=1.0, extra_json={"i": i}) for i in range(500)]
+    assert bulk_writer.upsert_executions(pg_session, items) == {"inserted": 500, "updated": 0}
+    pg_session.commit()
+    assert copy_calls == ["_copy_executions"]
+
+    more = [ExecutionCreate(run_id=run_id, execution_id=f"E{i}", order_id=f"O{i}", exec_utc=start + timedelta(seconds=i),
+                            price=2.0, quantity=1.0) for i in range(400, 700)]
+    assert bulk_writer.upsert_executions(pg_session, more) == {"inserted": 200, "updated": 100}
+    pg_session.commit()
+
+    rows = pg_session.query(Execution).filter(Execution.run_id == run_id)
+    assert rows.count() == 700
+    assert rows.filter(Execution.price == 2.0).count() == 300
+    assert rows.filter(Execution.execution_id == "E3").one().extra_json == {"i": 3}
+
+
+def test_copy_upsert_market_bars_and_partitioning(pg_session, pg_engine, copy_calls):
+    run_id = _run(pg_session)
+    start = datetime(2024, 1, 1)
+    bars = [BarCreate(run_id=run_id, symbol="PGBAR", timeframe="1m", ts_utc=start + timedelta(minutes=i),
+                      open=1, high=2, low=0.5, close=1.5, volume=10) for i in range(300)]
+    assert bulk_writer.upsert_bars(pg_session, bars)["inserted"] == 300
+    bars = [b.model_copy(update={"close": 9.0}) for b in bars[200:]] + [
+        BarCreate(run_id=run_id, symbol="PGBAR", timeframe="1m", ts_utc=start + timedelta(minutes=300 + i),
+                  open=1, high=2, low=0.5, close=1.5, volume=10) for i in range(50)]
+    result = bulk_writer.upsert_bars(pg_session, bars)
+    pg_session.commit()
+    assert (result["inserted"], result["updated"]) == (50, 100)
+    assert copy_calls == ["_copy_market_bars", "_copy_market_bars"]
+    assert pg_session.query(MarketBar).filter(MarketBar.close == 9.0).count() == 100
+
+    # No timescaledb extension on a stock server: the plain table stays usable
+    assert setup_partitioning(pg_engine, "timescale") in (True, False)
+
+
+def test_trades_are_copied(pg_session, copy_calls):
+    run_id = _run(pg_session)
+    t0 = datetime(2024, 1, 1)
+    trades = {
+        "trade_id": [str(uuid.uuid4()) for _ in range(150)], "run_id": [run_id] * 150, "symbol": ["PG"] * 150,
+        "side": [Side.BUY] * 150, "entry_time": [t0] * 150,
+        "exit_time": [t0 + timedelta(minutes=i) for i in range(150)], "entry_price": [1.0] * 150,
+        "exit_price": [1.1] * 150, "quantity": [1.0] * 150, "pnl_net": [0.1] * 150, "extra_json": [{}] * 150,
+    }
+    TradeService(pg_session)._persist_trades(trades)
+    pg_session.commit()
+    assert copy_calls == ["trades"]
+    assert pg_session.query(Trade).filter(Trade.run_id == run_id).count() == 150
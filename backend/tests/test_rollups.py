@@ -0,0 +1,90 @@
+import uuid
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from src.api.schemas import BarCreate
+from src.core import bulk_writer, rollups
+from src.database.models import MarketBar, MarketRollup, MarketSeries
+
+
+def _bars(symbol, start, count, offset=0):
+    return [BarCreate(run_id="ROLLUP_RUN", symbol=symbol, timeframe="1m", ts_utc=start + timedelta(minutes=i),
+                      open=100 + i + offset, high=101 + i + offset, low=99 + i + offset, close=100.5 + i + offset,
+                      volume=1) for i in range(count)]
+
+
+def _stored(db, series_id):
+    return db.query(MarketBar).filter(MarketBar.series_id == series_id).order_by(MarketBar.ts_utc).all()
+
+
+def test_timeframe_parsing_and_resample():
+    assert [rollups.timeframe_seconds(tf) for tf in ("1m", "15m", "1h", "1d", "M5", "H4", "1min", "N/A")] == \
+        [60, 900, 3600, 86400, 300, 14400, 60, None]
+
+    ts = pd.date_range("2024-01-01 00:03", periods=10, freq="1min")
+    frame = pd.DataFrame({"ts_utc": ts, "open": np.arange(10.0), "high": np.arange(10.0) + 1,
+                          "low": np.arange(10.0) - 1, "close": np.arange(10.0) + 0.5, "volume": np.ones(10)})
+    out = rollups.resample(frame, 300)
+    assert out["ts_utc"].tolist() == [pd.Timestamp("2024-01-01 00:00"), pd.Timestamp("2024-01-01 00:05"),
+                                      pd.Timestamp("2024-01-01 00:10")]
+    assert out["open"].tolist() == [0.0, 2.0, 7.0]
+    assert out["close"].tolist() == [1.5, 6.5, 9.5]
+    assert out["high"].tolist() == [2.0, 7.0, 10.0]
+    assert out["low"].tolist() == [-1.0, 1.0, 6.0]
+    assert out["volume"].tolist() == [2.0, 5.0, 3.0]
+
+
+def test_rollups_build_refresh_and_serve(client, db_session):
+    symbol = f"RU_{uuid.uuid4().hex[:8]}"
+    start = datetime(2024, 1, 1)
+    bulk_writer.upsert_bars(db_session, _bars(symbol, start, 120))
+    db_session.commit()
+    base_id = bulk_writer.market_series_id(symbol, "1m", "Unknown", "Unknown")
+
+    resp = client.post("/api/bars/rollups", params={"symbol": symbol, "timeframe": "1m", "targets": ["5m", "1h"]})
+    assert resp.status_code == 200
+    assert resp.json()["bars"] == {"5m": 24, "1h": 2}
+    hourly_id = db_session.query(MarketRollup.series_id).filter(
+        MarketRollup.base_series_id == base_id, MarketRollup.timeframe == "1h").scalar()
+    hourly = _stored(db_session, hourly_id)
+    assert [(b.open, b.close, b.volume) for b in hourly] == [(100, 159.5, 60), (160, 219.5, 60)]
+
+    # New base bars re-aggregate the touched buckets in the same transaction
+    bulk_writer.upsert_bars(db_session, _bars(symbol, start + timedelta(minutes=120), 30, offset=120))
+    bulk_writer.upsert_bars(db_session, _bars(symbol, start + timedelta(minutes=10), 1, offset=1000))
+    db_session.commit()
+    hourly = _stored(db_session, hourly_id)
+    assert [(b.close, b.volume) for b in hourly] == [(159.5, 60), (219.5, 60), (249.5, 30)]
+    assert hourly[0].high == 1101
+
+    # Exact rollup timeframe, and a coarser one resampled from the nearest rollup
+    resp = client.get("/api/bars/", params={"run_id": "none", "symbol": symbol, "timeframe": "5m", "limit": 3})
+    assert [b["open"] for b in resp.json()] == [100, 105, 1100]
+    resp = client.get("/api/bars/", params={"run_id": "none", "symbol": symbol, "timeframe": "2h",
+                                            "start_utc": "2024-01-01T00:30:00"})
+    body = resp.json()
+    assert len(body) == 2 and body[0]["ts_utc"].startswith("2024-01-01T00:00") and body[0]["volume"] == 120
+    assert body[1]["close"] == 249.5
+
+
+def test_writes_right_after_another_process_creates_a_rollup_refresh_it(db_session, test_engine):
+    symbol = f"RU_{uuid.uuid4().hex[:8]}"
+    start = datetime(2024, 1, 1)
+    bulk_writer.upsert_bars(db_session, _bars(symbol, start, 10))
+    db_session.commit()
+    base_id = bulk_writer.market_series_id(symbol, "1m", "Unknown", "Unknown")
+
+    # Another process builds a 5m rollup (plain inserts, nothing shared in memory with this one)
+    rollup_id = bulk_writer.market_series_id(symbol, "5m", "Unknown", "rollup:Unknown")
+    with test_engine.begin() as conn:
+        conn.execute(MarketSeries.__table__.insert(), {"series_id": rollup_id, "symbol": symbol, "timeframe": "5m",
+                                                       "venue": "Unknown", "provider": "rollup:Unknown"})
+        conn.execute(MarketRollup.__table__.insert(), {"series_id": rollup_id, "base_series_id": base_id,
+                                                       "timeframe": "5m", "interval_seconds": 300,
+                                                       "created_utc": datetime.utcnow()})
+
+    bulk_writer.upsert_bars(db_session, _bars(symbol, start + timedelta(minutes=10), 2, offset=10))
+    db_session.commit()
+    assert [(b.ts_utc, b.open, b.volume) for b in _stored(db_session, rollup_id)] == [(start + timedelta(minutes=10), 110, 2)]
@@ -0,0 +1,55 @@
+import uuid
+from datetime import datetime
+
+from src.api.schemas import BarCreate
+from src.core import bulk_writer
+from src.core.series_cache import LRUCache, series_cache
+from src.database.models import MarketSeries
+
+
+def _bar(run_id, symbol, minute=0):
+    return BarCreate(run_id=run_id, symbol=symbol, timeframe="1m", ts_utc=datetime(2024, 1, 1, 0, minute),
+                     open=1, high=2, low=0.5, close=1.5, volume=1)
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert "b" not in cache
+    assert cache.stats()["hits"] == 1
+
+
+def test_series_known_only_after_commit(db_session):
+    symbol = f"SC_{uuid.uuid4().hex[:8]}"
+    run_id = str(uuid.uuid4())
+    series_id = bulk_writer.market_series_id(symbol, "1m", "Unknown", "Unknown")
+
+    bulk_writer.upsert_bars(db_session, [_bar(run_id, symbol)])
+    db_session.rollback()
+    assert series_cache.unknown_series(db_session, [series_id]) == [series_id]
+    assert db_session.query(MarketSeries).filter(MarketSeries.series_id == series_id).count() == 0
+
+    bulk_writer.upsert_bars(db_session, [_bar(run_id, symbol)])
+    db_session.commit()
+    assert series_cache.unknown_series(db_session, [series_id]) == []
+    assert series_cache.unknown_subscriptions(db_session, [(run_id, series_id)]) == []
+
+
+def test_read_paths_share_the_cache(client, db_session):
+    symbol = f"SC_{uuid.uuid4().hex[:8]}"
+    run_id = str(uuid.uuid4())
+    bulk_writer.upsert_bars(db_session, [_bar(run_id, symbol, m) for m in range(3)])
+    db_session.commit()
+
+    hits = series_cache.lookups.hits
+    for _ in range(2):
+        resp = client.get("/api/bars/", params={"run_id": run_id, "symbol": symbol, "timeframe": "1m"})
+        assert len(resp.json()) == 3
+    assert series_cache.lookups.hits == hits + 1
+
+    stats = client.get("/api/ingest/series-cache/status").json()
+    assert stats["lookups"]["hits"] >= 1
+    assert stats["known_series"]["size"] >= 1
@@ -0,0 +1,121 @@
+import os
+import uuid
+
+import pytest
+
+from src.database.models import (
+    Execution, IngestEvent, Order, OrderType, RunType, Side, Strategy, StrategyInstance, StrategyRun, Trade
+)
+from src.database.shards import shard_router
+
+
+@pytest.fixture
+def sharded(monkeypatch, tmp_path):
+    monkeypatch.setattr(shard_router, "mode", "run")
+    monkeypatch.setattr(shard_router, "root", str(tmp_path))
+    yield shard_router
+    for eng in shard_router._engines.values():
+        eng.dispose()
+    shard_router._engines.clear()
+    shard_router._placement.clear()
+
+
+def _run(db, strategy_id):
+    instance_id, run_id = str(uuid.uuid4()), str(uuid.uuid4())
+    db.add(StrategyInstance(instance_id=instance_id, strategy_id=strategy_id, parameters_json={}))
+    db.add(StrategyRun(run_id=run_id, instance_id=instance_id, run_type=RunType.BACKTEST))
+    db.commit()
+    return run_id
+
+
+def _payload(run_id, exit_price):
+    orders = [
+        {"run_id": run_id, "order_id": oid, "symbol": "SHARD", "side": side, "order_type": "MARKET",
+         "quantity": 1.0, "status": "FILLED", "submit_utc": f"2024-01-01T00:0{i}:00"}
+        for i, (oid, side) in enumerate([("B1", "BUY"), ("S1", "SELL")])
+    ]
+    executions = [
+        {"run_id": run_id, "execution_id": f"E{i}", "order_id": oid,
+         "exec_utc": f"2024-01-01T00:0{i}:00", "price": price, "quantity": 1.0}
+        for i, (oid, price) in enumerate([("B1", 1.0), ("S1", exit_price)])
+    ]
+    return {"orders": orders, "executions": executions}
+
+
+def test_run_tables_are_routed_to_shards(client, db_session, sharded):
+    strategy_id = f"SHARD_{uuid.uuid4().hex[:8]}"
+    db_session.add(Strategy(strategy_id=strategy_id, name="Shards"))
+    db_session.commit()
+    new_run, legacy_run = _run(db_session, strategy_id), _run(db_session, strategy_id)
+
+    # A run with rows in the central tables before sharding stays there
+    db_session.add(Order(run_id=legacy_run, order_id="L1", symbol="SHARD", side=Side.BUY,
+                         order_type=OrderType.LIMIT, quantity=1))
+    db_session.commit()
+    assert not sharded.is_sharded(legacy_run)
+
+    # Ingest for a new run lands in its own file; the central tables never see it
+    assert client.post("/api/ingest/stream", json=_payload(new_run, 1.5)).status_code == 200
+    assert os.path.exists(sharded.path(new_run))
+    assert db_session.query(Execution).filter(Execution.run_id == new_run).count() == 0
+    assert len(client.get(f"/api/executions/run/{new_run}").json()) == 2
+
+    assert client.post(f"/api/trades/rebuild/{new_run}").json()["count"] == 1
+    assert db_session.query(Trade).filter(Trade.run_id == new_run).count() == 0
+    (trade,) = client.get(f"/api/runs/{new_run}/trades").json()
+    assert trade["pnl_net"] == pytest.approx(0.5)
+    assert client.get(f"/api/trades/{trade['trade_id']}").json()["run_id"] == new_run
+
+    # Joins against central tables still work inside a shard session
+    assert client.get(f"/api/metrics/run/{new_run}").json()["total_trades"] == 1
+
+    # Moving the legacy run, then ingesting more of it
+    moved = sharded.move_run(legacy_run)
+    assert moved["orders"] == 1
+    assert db_session.query(Order).filter(Order.run_id == legacy_run).count() == 0
+    assert client.post("/api/ingest/stream", json=_payload(legacy_run, 0.8)).status_code == 200
+    assert client.post(f"/api/trades/rebuild/{legacy_run}").json()["count"] == 1
+
+    # Cross-run reads fan out over the shards
+    compared = client.post("/api/metrics/compare", json={"run_ids": [new_run, legacy_run]}).json()
+    assert [(m["run_id"], round(m["net_profit"], 6)) for m in compared] == [(new_run, 0.5), (legacy_run, -0.2)]
+    trades = client.get("/api/trades/", params={"strategy_id": strategy_id}).json()
+    assert sorted(t["run_id"] for t in trades) == sorted([new_run, legacy_run])
+
+
+def test_coverage_reads_the_runs_executions_from_its_shard(client, db_session, sharded):
+    from datetime import datetime, timedelta
+
+    from src.api.schemas import BarCreate
+    from src.core import bulk_writer
+
+    strategy_id = f"SHARD_{uuid.uuid4().hex[:8]}"
+    db_session.add(Strategy(strategy_id=strategy_id, name="ShardCoverage"))
+    db_session.commit()
+    run_id = _run(db_session, strategy_id)
+    assert client.post("/api/ingest/stream", json=_payload(run_id, 1.5)).status_code == 200
+
+    symbol = f"SHCOV_{uuid.uuid4().hex[:6]}"
+    bulk_writer.upsert_bars(db_session, [
+        BarCreate(run_id=run_id, symbol=symbol, timeframe="1m", ts_utc=datetime(2024, 1, 1) + timedelta(minutes=m),
+                  open=1, high=2, low=0.5, close=1.5, volume=1) for m in range(5)
+    ])
+    db_session.commit()
+    (entry,) = client.get("/api/market/coverage", params={"symbol": symbol, "run_id": run_id}).json()
+    assert entry["covers_run"] is True
+
+
+def test_logged_run_ids_include_sharded_runs(client, db_session, sharded):
+    from src.core import ingest_log
+
+    strategy_id = f"SHARD_{uuid.uuid4().hex[:8]}"
+    db_session.add(Strategy(strategy_id=strategy_id, name="ShardReplay"))
+    db_session.commit()
+    run_id = _run(db_session, strategy_id)
+    assert client.post("/api/ingest/stream", json=_payload(run_id, 1.5)).status_code == 200
+    assert db_session.query(IngestEvent).filter(IngestEvent.run_id == run_id).count() == 0
+
+    assert run_id in ingest_log.logged_run_ids(db_session)
+    (result,) = ingest_log.replay_runs([run_id], lambda: None, workers=1)
+    assert "error" not in result
+    assert len(client.get(f"/api/executions/run/{run_id}").json()) == 2
@@ -0,0 +1,82 @@
+import threading
+import uuid
+from datetime import datetime
+
+import pytest
+
+from src.core.sqlite_writer import SingleWriter, single_writer
+from src.database.connection import SessionLocal
+from src.database.models import RunType, Strategy, StrategyInstance, StrategyRun
+
+
+def _add_strategy(db, strategy_id):
+    db.add(Strategy(strategy_id=strategy_id, name="SingleWriter"))
+    db.flush()
+    return strategy_id
+
+
+def _held(writer):
+    """Keeps the writer thread busy until the returned event is set, so units queue up behind it."""
+    running, gate = threading.Event(), threading.Event()
+    writer.submit(lambda db: running.set() or gate.wait(5))
+    assert running.wait(5)
+    return gate
+
+
+def test_units_are_grouped_and_failures_isolated(test_engine, db_session):
+    writer = SingleWriter(SessionLocal, enabled=True)
+    prefix = uuid.uuid4().hex[:8]
+    try:
+        gate = _held(writer)
+        ok = [writer.submit(_add_strategy, f"{prefix}_{i}") for i in range(20)]
+        gate.set()
+        assert [f.result(5) for f in ok] == [f"{prefix}_{i}" for i in range(20)]
+        # The holding unit, then all twenty in one transaction
+        assert (writer.status()["transactions"], writer.status()["units"]) == (2, 21)
+
+        gate = _held(writer)
+        good = writer.submit(_add_strategy, f"{prefix}_20")
+        bad = writer.submit(_add_strategy, f"{prefix}_0")  # duplicate primary key
+        isolated = writer.submit(lambda db: db.query(Strategy).filter(Strategy.strategy_id.like(f"{prefix}_%")).count(),
+                                 isolated=True)
+        gate.set()
+        assert good.result(5) == f"{prefix}_20"
+        with pytest.raises(Exception):
+            bad.result(5)
+        assert isolated.result(5) == 21
+        assert db_session.query(Strategy).filter(Strategy.strategy_id.like(f"{prefix}_%")).count() == 21
+
+        status = writer.status()
+        assert status["failed_units"] == 1 and status["units"] == 24
+        assert status["queue_wait_ms"]["max"] is not None and status["depth"] == 0
+    finally:
+        writer.stop()
+    assert not writer.running
+
+
+def test_endpoints_write_through_the_writer(client, db_session, monkeypatch):
+    monkeypatch.setattr(single_writer, "enabled", True)
+    try:
+        strategy_id, instance_id, run_id = (str(uuid.uuid4()) for _ in range(3))
+        db_session.add(Strategy(strategy_id=strategy_id, name="SingleWriter"))
+        db_session.add(StrategyInstance(instance_id=instance_id, strategy_id=strategy_id, parameters_json={}))
+        db_session.add(StrategyRun(run_id=run_id, instance_id=instance_id, run_type=RunType.BACKTEST))
+        db_session.commit()
+
+        before = single_writer.status()["units"]
+        bars = [{"run_id": run_id, "symbol": f"SW_{run_id[:6]}", "timeframe": "1m",
+                 "ts_utc": datetime(2024, 1, 1, 0, m).isoformat(), "open": 1, "high": 2, "low": 0.5, "close": 1.5,
+                 "volume": 1} for m in range(5)]
+        resp = client.post("/api/ingest/batch/bars", json=bars)
+        assert resp.status_code == 200 and resp.json()["inserted"] == 5
+
+        resp = client.get(f"/api/runs/{run_id}")
+        assert resp.status_code == 200
+        db_session.expire_all()
+        assert db_session.get(StrategyRun, run_id).metrics_json == resp.json()["metrics_json"]
+
+        status = client.get("/api/ingest/writer/status").json()
+        assert status["mode"] == "single_writer" and status["running"]
+        assert status["units"] == before + 2 and status["failed_units"] == 0
+    finally:
+        single_writer.stop()
@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from sqlalchemy import Column, Integer, MetaData, Table, create_engine, inspect, select
+from sqlalchemy.orm import sessionmaker
+
+from src.database.connection import make_engine
+from src.database.migrate_time_columns import check_time_storage, column_storage, migrate
+from src.database.models import Base, MarketBar, MarketSeries
+from src.database.time_columns import (
+    TIME_STORAGE, EpochMicros, datetime64_to_epoch_us, epoch_us_to_datetime64,
+    from_epoch_us, raw_time, time_array, to_epoch_us
+)
+
+
+def test_conversion_helpers():
+    ts = datetime(2024, 3, 1, 12, 30, 5, 123456)
+    assert from_epoch_us(to_epoch_us(ts)) == ts
+    assert to_epoch_us(ts.replace(tzinfo=timezone.utc) + timedelta(hours=2)) == to_epoch_us(ts) + 7200 * 10**6
+    assert to_epoch_us(ts.replace(tzinfo=timezone(timedelta(hours=2)))) == to_epoch_us(ts) - 7200 * 10**6
+
+    us = np.array([to_epoch_us(ts), to_epoch_us(ts) + 1], dtype="int64")
+    arr = epoch_us_to_datetime64(us)
+    assert arr.dtype == np.dtype("datetime64[ns]") and arr[0] == np.datetime64(ts)
+    assert datetime64_to_epoch_us(arr).tolist() == us.tolist()
+    assert time_array([ts.isoformat(sep=" ")], epoch=False)[0] == np.datetime64(ts)
+
+
+def test_epoch_column_round_trip():
+    engine = create_engine("sqlite://")
+    table = Table("t", MetaData(), Column("id", Integer, primary_key=True), Column("ts", EpochMicros()))
+    table.metadata.create_all(engine)
+    ts = datetime(2024, 1, 2, 3, 4, 5, 6)
+    with engine.begin() as conn:
+        conn.execute(table.insert(), [{"id": 1, "ts": ts}, {"id": 2, "ts": ts + timedelta(days=1)}])
+        assert conn.execute(select(table.c.ts).where(table.c.ts > ts)).scalar() == ts + timedelta(days=1)
+        raw = conn.execute(select(raw_time(table.c.ts)).order_by(table.c.id)).scalars().all()
+    assert raw[0] == to_epoch_us(ts)
+    assert time_array(raw, table.c.ts)[1] == np.datetime64(ts + timedelta(days=1))
+
+
+def test_sqlite_migration_round_trip(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path / 'migrate.db'}")
+    Base.metadata.create_all(engine)
+    start = datetime(2024, 5, 1, 9, 30, 0, 250000)
+    with sessionmaker(bind=engine)() as db:
+        db.add(MarketSeries(series_id="S", symbol="MIG", timeframe="1m"))
+        db.add_all([MarketBar(series_id="S", ts_utc=start + timedelta(minutes=i), open=1, high=2, low=0.5,
+                              close=1.5 + i, volume=i) for i in range(5)])
+        db.commit()
+    assert check_time_storage(engine)
+    indexes = {ix["name"] for ix in inspect(engine).get_indexes("executions")}
+
+    other = "datetime" if TIME_STORAGE == "epoch_us" else "epoch_us"
+    result = migrate(engine, other)
+    assert result["market_bars"] == 5 and result["trades"] == 0
+    assert column_storage(engine, "market_bars", "ts_utc") == other
+    assert not check_time_storage(engine)
+    assert {ix["name"] for ix in inspect(engine).get_indexes("executions")} == indexes
+    with engine.connect() as conn:
+        stored = conn.exec_driver_sql("SELECT ts_utc, close FROM market_bars ORDER BY ts_utc").all()
+    expected = [to_epoch_us(start + timedelta(minutes=i)) for i in range(5)]
+    if other == "epoch_us":
+        assert [row[0] for row in stored] == expected
+    assert [row[1] for row in stored] == [1.5 + i for i in range(5)]
+
+    assert migrate(engine, TIME_STORAGE)["market_bars"] == 5
+    assert migrate(engine, TIME_STORAGE)["market_bars"] == "up to date"
+    with sessionmaker(bind=engine)() as db:
+        bars = db.query(MarketBar).order_by(MarketBar.ts_utc).all()
+        assert [b.ts_utc for b in bars] == [start + timedelta(minutes=i) for i in range(5)]
@@ -0,0 +1,74 @@
+import uuid
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import event
+
+from src.api.schemas import BarCreate
+from src.core import bulk_writer
+from src.core.trade_service import TradeService
+from src.database.connection import engine
+from src.database.models import (
+    Execution, Order, OrderStatus, OrderType, RunType, Side, Strategy, StrategyInstance, StrategyRun, Trade
+)
+
+
+def _setup(db, symbol, bars, trades):
+    strategy_id, instance_id, run_id = (str(uuid.uuid4()) for _ in range(3))
+    db.add(Strategy(strategy_id=strategy_id, name="Persistence"))
+    db.add(StrategyInstance(instance_id=instance_id, strategy_id=strategy_id, symbol=symbol, timeframe="1m",
+                            parameters_json={}))
+    db.add(StrategyRun(run_id=run_id, instance_id=instance_id, run_type=RunType.BACKTEST))
+    db.commit()
+
+    t0 = datetime(2024, 1, 1)
+    # Trend up, down, then chop: enough bars for every regime label
+    close = 100 + np.concatenate([np.linspace(0, 30, bars // 3), np.linspace(30, 0, bars // 3),
+                                  np.sin(np.arange(bars - 2 * (bars // 3)))])
+    bulk_writer.upsert_bars(db, [
+        BarCreate(run_id=run_id, symbol=symbol, timeframe="1m", ts_utc=t0 + timedelta(minutes=i),
+                  open=c, high=c + 0.5, low=c - 0.5, close=c, volume=1.0)
+        for i, c in enumerate(close.tolist())
+    ])
+    # Entries start before the first bar (no regime) and run past the last one
+    step = timedelta(minutes=bars + 20) / (2 * trades)
+    start = t0 - timedelta(minutes=10)
+    for i in range(2 * trades):
+        db.add(Order(run_id=run_id, order_id=f"O{i}", symbol=symbol, side=Side.BUY if i % 2 == 0 else Side.SELL,
+                     order_type=OrderType.MARKET, quantity=1.0, status=OrderStatus.FILLED))
+        db.add(Execution(run_id=run_id, execution_id=f"E{i}", order_id=f"O{i}", exec_utc=start + step * i,
+                         price=100.0 + i % 5, quantity=1.0))
+    db.commit()
+    return run_id
+
+
+def test_rebuild_inserts_in_chunks_with_regimes_at_entry(db_session, monkeypatch):
+    monkeypatch.setattr(bulk_writer, "INSERT_CHUNK_SIZE", 40)
+    run_id = _setup(db_session, f"PERSIST_{uuid.uuid4().hex[:6]}", bars=900, trades=100)
+
+    statements = []
+    def count(conn, cursor, statement, *args):
+        if statement.startswith("INSERT INTO trades"):
+            statements.append(statement)
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        assert TradeService(db_session).rebuild_trades_for_run(run_id) == 100
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    assert len(statements) == 3  # 40 + 40 + 20 rows
+
+    # Same labels as a per-trade lookup of the latest regime bar at or before the entry
+    regime = TradeService(db_session)._get_regime_df(run_id)
+    trades = db_session.query(Trade).filter(Trade.run_id == run_id).order_by(Trade.entry_time).all()
+    labels = set()
+    for t in trades:
+        before = regime[regime["ts_utc"] <= t.entry_time]
+        expected = (None, None) if before.empty else tuple(before.iloc[-1][["regime_trend", "regime_volatility"]])
+        assert (t.regime_trend, t.regime_volatility) == expected
+        labels.add(t.regime_trend)
+    assert None in labels and {"BULL", "BEAR", "RANGE"} <= labels
+
+    first = trades[0]
+    assert (first.side, first.commission, first.extra_json, first.quantity) == (Side.BUY, 0.0, {}, 1.0)
+    assert first.duration_seconds == (first.exit_time - first.entry_time).total_seconds()
+    assert len({t.trade_id for t in trades}) == 100
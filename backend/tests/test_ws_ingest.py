@@ -0,0 +1,92 @@
+import asyncio
+import uuid
+
+from src.core.ws_ingest import WebSocketIngestBuffer
+from src.database.connection import SessionLocal
+from src.database.models import Order, Execution
+
+
+def _order(seq, order_id="O1"):
+    return {"seq": seq, "type": "order", "data": {"order_id": order_id, "symbol": "EURUSD", "side": "BUY",
+                                                  "order_type": "MARKET", "quantity": 1.0, "status": "FILLED",
+                                                  "submit_utc": "2024-01-01T00:00:00"}}
+
+
+def _execution(seq, execution_id, order_id="O1"):
+    return {"seq": seq, "type": "execution", "data": {"execution_id": execution_id, "order_id": order_id,
+                                                      "exec_utc": "2024-01-01T00:01:00", "price": 1.1, "quantity": 1.0}}
+
+
+def test_websocket_ingest_acks_by_seq_and_commits(client, db_session):
+    run_id = str(uuid.uuid4())
+    with client.websocket_connect(f"/api/ingest/ws/{run_id}") as ws:
+        ws.send_json(_order(1))
+        ws.send_json([_execution(2, "E1"), _execution(3, "E2"), _execution(4, "E3")])
+        ws.send_json({"seq": 5, "type": "execution", "data": {"execution_id": "BAD"}})
+        ws.send_json(_execution(3, "E2"))
+        ws.send_json({"seq": 6, "type": "execution", "data": {"run_id": "other", "execution_id": "E9"}})
+
+        replies = []
+        def seen(kind, seq):
+            return any(r["type"] == kind and r["seq"] == seq and not r.get("duplicate") for r in replies)
+        while not (seen("ack", 4) and seen("error", 6)):
+            replies.append(ws.receive_json())
+
+    errors = {r["seq"]: r for r in replies if r["type"] == "error"}
+    assert set(errors) == {5, 6}
+    assert "does not match" in errors[6]["error"]
+    assert {"type": "ack", "seq": 3, "duplicate": True} in replies
+    commits = [r for r in replies if r["type"] == "ack" and "count" in r]
+    assert commits[-1]["seq"] == 4 and sum(r["count"] for r in commits) == 4
+
+    assert db_session.query(Order).filter(Order.run_id == run_id).count() == 1
+    assert db_session.query(Execution).filter(Execution.run_id == run_id).count() == 3
+
+
+def test_buffer_flushes_on_size_window():
+    run_id = str(uuid.uuid4())
+    buffer = WebSocketIngestBuffer(run_id, SessionLocal, window_ms=60000, max_batch=2)
+    assert buffer.accept(_order(1, "S1")) is None
+    assert not buffer.due()
+    assert buffer.accept(_execution(2, "SE1", "S1")) is None
+    assert buffer.due()
+
+    reply = asyncio.run(buffer.flush())
+    assert reply == {"type": "ack", "seq": 2, "count": 2}
+    assert buffer.flushed_kinds == {"orders", "executions"}
+    assert buffer.seconds_until_due() is None
+    assert buffer.accept({"seq": 2, "type": "order", "data": {}}) == {"type": "ack", "seq": 2, "duplicate": True}
+
+
+def test_failed_batch_can_be_resent(db_session):
+    run_id = str(uuid.uuid4())
+    buffer = WebSocketIngestBuffer(run_id, SessionLocal, window_ms=60000)
+    assert buffer.accept(_order(1, "F1")) is None
+    assert asyncio.run(buffer.flush())["seq"] == 1
+
+    async def failing(parts):
+        raise RuntimeError("database is locked")
+    buffer._commit = failing
+    assert buffer.accept(_execution(2, "FE1", "F1")) is None
+    assert buffer.accept(_execution(3, "FE2", "F1")) is None
+    reply = asyncio.run(buffer.flush())
+    assert (reply["type"], reply["seq_from"], reply["seq_to"]) == ("error", 2, 3)
+
+    del buffer._commit
+    assert buffer.accept(_execution(2, "FE1", "F1")) is None  # not a duplicate: nothing was written
+    assert buffer.accept(_execution(3, "FE2", "F1")) is None
+    assert asyncio.run(buffer.flush()) == {"type": "ack", "seq": 3, "count": 2}
+    assert db_session.query(Execution).filter(Execution.run_id == run_id).count() == 2
+
+
+def test_resend_after_reconnect_is_written_again_without_duplicates(client, db_session):
+    run_id = str(uuid.uuid4())
+    for _ in range(2):
+        with client.websocket_connect(f"/api/ingest/ws/{run_id}") as ws:
+            ws.send_json([_order(1), _execution(2, "R1"), _execution(3, "R2")])
+            reply = ws.receive_json()
+            # A new connection does not know the seqs of the previous one
+            assert reply == {"type": "ack", "seq": 3, "count": 3}
+
+    assert db_session.query(Order).filter(Order.run_id == run_id).count() == 1
+    assert db_session.query(Execution).filter(Execution.run_id == run_id).count() == 2
@@ -1,7 +1,11 @@
 #nullable enable
 using System;
 using System.Collections.Generic;
+using System.IO;
+using System.IO.Compression;
+using System.Net;
 using System.Net.Http;
+using System.Net.Http.Headers;
 using System.Net.Http.Json;
 using System.Text.Json;
 using System.Threading.Tasks;
@@ -11,17 +15,25 @@ namespace StrategyExporter.Services
 {
     public class HttpExporter : IExporter
     {
+        private static readonly JsonSerializerOptions JsonOptions = new JsonSerializerOptions(JsonSerializerDefaults.Web);
+
         private readonly HttpClient _client;
         private readonly string _baseUrl;
+        private readonly bool _compressRequests;
 
         // Caches to avoid resending static data if needed, though interfaces are stateless-ish
         private string? _activeStrategyId;
         private string? _activeRunId;
 
-        public HttpExporter(string baseUrl = "http://localhost:8000")
+        /// <param name="compressRequests">Gzip batch bodies (Content-Encoding: gzip) for bandwidth-limited nodes.</param>
+        public HttpExporter(string baseUrl = "http://localhost:8000", bool compressRequests = false)
         {
             _baseUrl = baseUrl.TrimEnd('/');
-            _client = new HttpClient
+            _compressRequests = compressRequests;
+            _client = new HttpClient(new HttpClientHandler
+            {
+                AutomaticDecompression = DecompressionMethods.GZip
+            })
             {
                 Timeout = TimeSpan.FromSeconds(5) // Fast fail for trading systems
             };
@@ -31,10 +43,27 @@ namespace StrategyExporter.Services
 
         public async Task SendAsync<T>(string uri, T payload)
         {
-            var response = await _client.PostAsJsonAsync($"{_baseUrl}/{uri}", payload);
+            using var response = await PostJsonAsync($"{_baseUrl}/{uri}", payload);
             response.EnsureSuccessStatusCode();
         }
 
+        private async Task<HttpResponseMessage> PostJsonAsync<T>(string url, T payload)
+        {
+            if (!_compressRequests)
+                return await _client.PostAsJsonAsync(url, payload);
+
+            using var buffer = new MemoryStream();
+            using (var gzip = new GZipStream(buffer, CompressionLevel.Fastest, leaveOpen: true))
+            {
+                await JsonSerializer.SerializeAsync(gzip, payload, JsonOptions);
+            }
+
+            using var content = new ByteArrayContent(buffer.ToArray());
+            content.Headers.ContentType = new MediaTypeHeaderValue("application/json");
+            content.Headers.ContentEncoding.Add("gzip");
+            return await _client.PostAsync(url, content);
+        }
+
         public async Task<string> StartRunAsync(RunRegistrationDto runInfo)
         {
             this._activeStrategyId = runInfo.StrategyId;
@@ -52,7 +81,7 @@ namespace StrategyExporter.Services
 
         public async Task ExportBarsAsync(IEnumerable<BarDto> bars)
         {
-            using var response = await _client.PostAsJsonAsync($"{_baseUrl}/api/ingest/batch/bars", bars);
+            using var response = await PostJsonAsync($"{_baseUrl}/api/ingest/batch/bars", bars);
             response.EnsureSuccessStatusCode();
         }
 
@@ -62,7 +91,7 @@ namespace StrategyExporter.Services
             {
                 OverrideRunId(order);
             }
-            using var response = await _client.PostAsJsonAsync($"{_baseUrl}/api/ingest/batch/orders", orders);
+            using var response = await PostJsonAsync($"{_baseUrl}/api/ingest/batch/orders", orders);
             response.EnsureSuccessStatusCode();
         }
 
@@ -72,7 +101,7 @@ namespace StrategyExporter.Services
             {
                 OverrideRunId(trade);
             }
-            using var response = await _client.PostAsJsonAsync($"{_baseUrl}/api/ingest/batch/executions", trades);
+            using var response = await PostJsonAsync($"{_baseUrl}/api/ingest/batch/executions", trades);
             response.EnsureSuccessStatusCode();
         }
 